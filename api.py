@@ -0,0 +1,554 @@
+"""Read-only JSON API over the data-access layer, for consumers other than the dashboard.
+
+    uvicorn api:app --workers 4
+    DASHBOARD_SNAPSHOT=snapshots uvicorn api:app   # catalog reads from a snapshot
+
+An ASGI app on Starlette, which Streamlit already depends on. Every
+endpoint calls the same functions as the dashboard (so it shares their
+query cache, snapshot serving and metrics), but a request costs a
+coroutine instead of a script rerun, so one process serves many more
+concurrent clients than Streamlit sessions.
+
+The functions themselves block, so they run on a thread pool, and the
+number in flight per store is capped at what its client's connection pool
+can serve; extra requests wait on the event loop without holding a thread.
+Identical requests that arrive while one is being computed share its
+result, including the JSON encoding. Every response carries an ETag of
+its body; a request whose If-None-Match matches gets 304 with no body.
+
+    GET /health
+    GET /metrics
+    GET /universities
+    GET /keywords?q=&page=0&page_size=20
+    GET /keywords/rising?top_n=10&window=5
+    GET /keywords/{keyword}/trend?start_year=&end_year=
+    GET /keywords/{keyword}/rankings?top_n=10&offset=0
+    GET /keywords/{keyword}/faculty?page_size=10&weighted=0&after=
+    GET /keywords/{keyword}/related?top_n=10&measure=cosine&min_count=2
+    GET /keywords/{keyword}/network?depth=1&limit=20&min_weight=1
+    GET /faculty/{faculty_id}
+    GET /faculty/{faculty_id}/publications?offset=0&limit=5
+    GET /faculty/{faculty_id}/paths/{other_id}?k=3&max_keywords=4
+
+Faculty ids are MySQL ids, as in the faculty search results. `python -m
+benchmarks.load` load-tests the app against the local stand-ins.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from decimal import Decimal
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+import metrics
+import snapshot
+from backends import BACKENDS, HEALTH_CHECK_SECONDS, BackendUnavailable, get_manager
+from collaboration_paths import MAX_KEYWORDS, build_collaboration_graph
+from faculty_registry import FacultyRegistry
+from fanout import BACKEND_TIMEOUTS
+from keyword_cooccurrence import build_keyword_cooccurrence
+from keyword_index import get_keyword_index
+from keyword_registry import KeywordRegistry
+from mongodb_utils import PROFILE_FIELDS, get_all_publication_keywords, get_faculty_by_ids
+from mongodb_utils import get_faculty_ids as get_mongo_faculty_ids
+from mysql_pool import POOL_SIZE
+from mysql_utils import get_all_universities, get_keyword_ids, get_university_rankings, search_faculty_by_keyword_ids
+from mysql_utils import get_faculty_ids as get_mysql_faculty_ids
+from neo4j_utils import EGO_MAX_DEPTH, EGO_MAX_FACULTY, get_faculty_node_ids, get_keyword_ego_network, get_keyword_node_ids
+from top_publications import get_top_publications
+from trend_cube import build_trend_cube
+
+backends = get_manager()
+
+# Queries in flight per store at once; a store served from the snapshot is
+# read from memory, so it gets the larger "snapshot" share instead
+STORE_CONCURRENCY = {
+    "mysql": POOL_SIZE,
+    "mongodb": int(os.environ.get("API_MONGO_CONCURRENCY", "32")),
+    "neo4j": int(os.environ.get("API_NEO4J_CONCURRENCY", "32")),
+    "snapshot": int(os.environ.get("API_SNAPSHOT_CONCURRENCY", "16")),
+    # In-process work: searching the shared in-memory structures
+    "app": os.cpu_count() or 4,
+    # Building those structures, which reads whole tables; kept apart from
+    # "app" so a slow build doesn't hold the slots searches need
+    "build": int(os.environ.get("API_BUILD_CONCURRENCY", "2")),
+}
+# Same lifetime as the dashboard's st.cache_resource structures
+RESOURCE_TTL = 3600
+# How long clients may reuse a response before revalidating it with its ETag
+CLIENT_MAX_AGE = 60
+TREND_YEARS = 15
+STORE_LABELS = {"mysql": "MySQL", "mongodb": "MongoDB", "neo4j": "Neo4j"}
+MAX_PAGE_SIZE = 100
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class QueryRunner:
+    """Runs blocking data-access calls off the event loop, bounded per store, sharing identical ones.
+
+    Created per event loop, since its semaphores and futures belong to one.
+    """
+
+    def __init__(self, limits=STORE_CONCURRENCY):
+        self._executor = ThreadPoolExecutor(max_workers=sum(limits.values()), thread_name_prefix="api")
+        self._limits = {store: asyncio.Semaphore(n) for store, n in limits.items()}
+        self._pending = {}
+        self.computed = 0
+        self.shared = 0
+        self.not_modified = 0
+
+    async def shared_call(self, key, make):
+        """Await `make()`, or the identical call already in flight under `key`."""
+        future = self._pending.get(key)
+        if future is None:
+            self.computed += 1
+            future = asyncio.ensure_future(make())
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        else:
+            self.shared += 1
+        # One caller giving up (a client disconnecting) must not cancel it for the others
+        return await asyncio.shield(future)
+
+    async def call(self, store, fn, *args, timeout=None):
+        """fn(*args) on the pool, once `store` has a free slot; timed out after its fan-out timeout."""
+        if store in BACKENDS:
+            backends.require(store)
+            slot = "snapshot" if backends.served(store) else store
+            timeout = timeout or BACKEND_TIMEOUTS[store]
+        else:
+            slot = store
+        loop = asyncio.get_running_loop()
+        limit = self._limits[slot]
+        await limit.acquire()
+        future = loop.run_in_executor(self._executor, fn, *args)
+
+        def release(done):
+            limit.release()
+            # Nobody awaits a call that timed out, so read its error here rather than have it logged
+            if not done.cancelled():
+                done.exception()
+
+        # A call that times out keeps running on its thread, so it keeps its slot
+        # until it returns; otherwise timed-out calls would pile up past the limit
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            raise ApiError(504, f"{store} did not answer within {timeout:g}s") from None
+        except (ApiError, BackendUnavailable):
+            raise
+        except Exception as e:
+            if store in BACKENDS:
+                backends.report_failure(store, e)
+            raise
+
+    def stats(self):
+        return {"hits": self.shared, "misses": self.computed, "not_modified": self.not_modified}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_runner = None
+
+
+def runner():
+    if _runner is None:
+        raise RuntimeError("the API's lifespan has not started")
+    return _runner
+
+
+def _runner_stats():
+    return runner().stats()
+
+
+metrics.register_cache("api", "app", _runner_stats)
+
+
+class Resource:
+    """A shared in-memory structure, built on first use and again after `ttl` seconds.
+
+    A build requires every store in `needs`. Stores in `uses` are optional:
+    the build gets the tuple of those available as its first argument, and
+    runs again as soon as that set changes, so a structure built during an
+    outage picks the store back up when it recovers.
+    """
+
+    def __init__(self, build, needs=(), uses=(), ttl=RESOURCE_TTL):
+        self.build = build
+        self.needs = needs
+        self.uses = uses
+        self.ttl = ttl
+        self._values = {}
+
+    async def get(self, *args):
+        stores = tuple(store for store in self.uses if backends.available(store))
+        value, built_at, built_from = self._values.get(args, (None, 0.0, ()))
+        if value is not None and built_from == stores and time.monotonic() - built_at < self.ttl:
+            return value
+        for store in self.needs:
+            backends.require(store)
+        build_args = (stores, *args) if self.uses else args
+        # Builds read whole tables, so they are not held to a query timeout
+        value = await runner().shared_call(("resource", id(self), build_args),
+                                           lambda: runner().call("build", self.build, *build_args))
+        self._values[args] = (value, time.monotonic(), stores)
+        return value
+
+
+def _store_rows(stores, store, read):
+    """read() if `store` is among the available `stores`, else no rows; a failed read counts as down."""
+    if store not in stores:
+        return []
+    try:
+        return read()
+    except Exception as e:
+        backends.report_failure(store, e)
+        return []
+
+
+def _keyword_registry(stores):
+    """The keyword registry over the available stores; a down store's ids are missing from it."""
+    return KeywordRegistry(_store_rows(stores, "mysql", get_keyword_ids),
+                           _store_rows(stores, "mongodb", get_all_publication_keywords),
+                           _store_rows(stores, "neo4j", get_keyword_node_ids))
+
+
+def _faculty_registry(stores):
+    """The faculty registry over the available stores; a down store's ids are missing from it."""
+    return FacultyRegistry(_store_rows(stores, "mysql", get_mysql_faculty_ids),
+                           _store_rows(stores, "mongodb", get_mongo_faculty_ids),
+                           _store_rows(stores, "neo4j", get_faculty_node_ids))
+
+
+keyword_registry = Resource(_keyword_registry, uses=BACKENDS)
+faculty_registry = Resource(_faculty_registry, uses=BACKENDS)
+trend_cube = Resource(build_trend_cube, needs=("mongodb",))
+keyword_cooccurrence = Resource(build_keyword_cooccurrence)
+collaboration_graph = Resource(build_collaboration_graph, needs=("neo4j",))
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode(data):
+    """(body, ETag) for a JSON-serializable result."""
+    body = json.dumps(data, default=_json_default, separators=(",", ":")).encode()
+    return body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _matches(if_none_match, etag):
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 asks for If-None-Match
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def endpoint(handler):
+    """Wrap `async handler(request) -> data` as a coalesced, ETagged JSON route."""
+    async def route(request):
+        key = (handler.__name__, tuple(sorted(request.path_params.items())),
+               tuple(sorted(request.query_params.multi_items())))
+        try:
+            body, etag = await runner().shared_call(key, lambda: _encoded(handler, request))
+        except ApiError as e:
+            return error_response(e.status, e.message)
+        except BackendUnavailable as e:
+            return error_response(503, str(e), {"Retry-After": str(int(HEALTH_CHECK_SECONDS))})
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={CLIENT_MAX_AGE}"}
+        if _matches(request.headers.get("if-none-match"), etag):
+            runner().not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    route.__name__ = handler.__name__
+    route.__doc__ = handler.__doc__
+    return route
+
+
+async def _encoded(handler, request):
+    return encode(await handler(request))
+
+
+def error_response(status, message, headers=None):
+    body = json.dumps({"error": message}).encode()
+    return Response(body, status_code=status, media_type="application/json", headers=headers)
+
+
+def _int(request, name, default, lo=0, hi=None):
+    raw = request.query_params.get(name)
+    if raw is None or raw == "":
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer") from None
+    if value < lo or (hi is not None and value > hi):
+        raise ApiError(400, f"{name} must be between {lo} and {hi}" if hi is not None else f"{name} must be >= {lo}")
+    return value
+
+
+def _flag(request, name):
+    return request.query_params.get(name, "").lower() in ("1", "true", "yes")
+
+
+def _require_all():
+    """Raise BackendUnavailable if any store is down, since what was asked for may be in it."""
+    for store in BACKENDS:
+        backends.require(store)
+
+
+async def _keyword(request):
+    """Registry entry for the {keyword} path parameter, in any store's spelling."""
+    entry = (await keyword_registry.get()).resolve(request.path_params["keyword"])
+    if entry is None:
+        _require_all()
+        raise ApiError(404, f"unknown keyword {request.path_params['keyword']!r}")
+    return entry
+
+
+def _need(entry, field, store):
+    """The entry's id in `store`: 503 if the store is down, 404 if the store doesn't have it."""
+    value = getattr(entry, field)
+    if value is None:
+        backends.require(store)
+        raise ApiError(404, f"{entry.name!r} is not in the {STORE_LABELS[store]} data")
+    return value
+
+
+async def _faculty(faculty_id):
+    entry = (await faculty_registry.get()).by_mysql_id(faculty_id)
+    if entry is None:
+        # Faculty ids are MySQL ids, so only MySQL can say one doesn't exist
+        backends.require("mysql")
+        raise ApiError(404, f"unknown faculty id {faculty_id}")
+    return entry
+
+
+# Endpoints
+
+
+async def health(request):
+    stores = {}
+    for name in BACKENDS:
+        status = backends.status(name)
+        stores[name] = {
+            "available": backends.available(name),
+            "served_from_snapshot": backends.served(name),
+            "error": str(status.error) if status and status.error else None,
+            "checked_at": status.checked_at if status else None,
+        }
+    current = snapshot.current()
+    body = {"stores": stores, "snapshot": os.path.basename(current.directory) if current is not None else None}
+    return Response(json.dumps(body).encode(), media_type="application/json",
+                    headers={"Cache-Control": "no-store"})
+
+
+async def prometheus(request):
+    return Response(metrics.to_prometheus(), media_type="text/plain; version=0.0.4",
+                    headers={"Cache-Control": "no-store"})
+
+
+@endpoint
+async def universities(request):
+    return await runner().call("mysql", get_all_universities)
+
+
+@endpoint
+async def keywords(request):
+    """Keyword names matching ?q (prefix, word prefix, then fuzzy), or all of them alphabetically."""
+    page = _int(request, "page", 0)
+    page_size = _int(request, "page_size", 20, 1, MAX_PAGE_SIZE)
+    query = request.query_params.get("q", "")
+    index = await runner().call("mysql", get_keyword_index)
+    names, total = await runner().call("app", index.search, query, page, page_size)
+    return {"keywords": names, "total": total, "page": page, "page_size": page_size}
+
+
+@endpoint
+async def rising_keywords(request):
+    top_n = _int(request, "top_n", 10, 1, MAX_PAGE_SIZE)
+    window = _int(request, "window", 5, 1, 50)
+    cube = await trend_cube.get()
+    rows = await runner().call("app", cube.fastest_rising, top_n, window)
+    return [{"keyword": k, "growth": growth, "previous": previous, "recent": recent}
+            for k, growth, previous, recent in rows]
+
+
+@endpoint
+async def keyword_trend(request):
+    entry = await _keyword(request)
+    this_year = datetime.datetime.now().year
+    # Years run from start_year up to, not including, end_year, as in TrendCube.trend
+    end_year = _int(request, "end_year", this_year, 1900, this_year + 1)
+    start_year = _int(request, "start_year", end_year - TREND_YEARS, 1900, end_year)
+    name = _need(entry, "mongo_name", "mongodb")
+    counts, years = (await trend_cube.get()).trend(name, start_year, end_year)
+    return {"keyword": entry.name, "years": years, "publications": counts}
+
+
+@endpoint
+async def keyword_rankings(request):
+    entry = await _keyword(request)
+    top_n = _int(request, "top_n", 10, 1, MAX_PAGE_SIZE)
+    offset = _int(request, "offset", 0)
+    rows = await runner().call("mysql", get_university_rankings, _need(entry, "mysql_id", "mysql"), top_n, offset)
+    return [{"position": offset + i + 1, "university": university, "publications": total}
+            for i, (university, total) in enumerate(rows)]
+
+
+def _cursor(raw):
+    """A faculty page cursor from its "score,id" form."""
+    try:
+        score, faculty_id = raw.split(",")
+        return float(score), int(faculty_id)
+    except ValueError:
+        raise ApiError(400, "after must be a cursor returned as next") from None
+
+
+@endpoint
+async def keyword_faculty(request):
+    """A page of faculty ranked by keyword score; pass `next` back as ?after= for the following page."""
+    entry = await _keyword(request)
+    page_size = _int(request, "page_size", 10, 1, MAX_PAGE_SIZE)
+    after = request.query_params.get("after")
+    rows, next_cursor = await runner().call(
+        "mysql", search_faculty_by_keyword_ids, (_need(entry, "mysql_id", "mysql"),),
+        _flag(request, "weighted"), page_size, _cursor(after) if after else None,
+    )
+    faculty = [
+        {"id": fid, "name": name, "position": position, "photo_url": photo, "email": email,
+         "university": university, "university_logo": logo, "score": score}
+        for fid, name, position, photo, email, university, logo, score in rows
+    ]
+    return {"faculty": faculty, "next": f"{float(next_cursor[0])!r},{next_cursor[1]}" if next_cursor else None}
+
+
+@endpoint
+async def related_keywords(request):
+    entry = await _keyword(request)
+    top_n = _int(request, "top_n", 10, 1, MAX_PAGE_SIZE)
+    min_count = _int(request, "min_count", 2, 1)
+    measure = request.query_params.get("measure", "cosine")
+    # The co-occurrence matrix comes from MySQL, or Neo4j while MySQL is down
+    store = next((s for s in ("mysql", "neo4j") if backends.available(s)), None)
+    if store is None:
+        raise BackendUnavailable("mysql and neo4j are unavailable")
+    cooccurrence = await keyword_cooccurrence.get(store)
+    if measure not in cooccurrence.similarity:
+        raise ApiError(400, f"measure must be one of {', '.join(sorted(cooccurrence.similarity))}")
+    rows = cooccurrence.related(entry.name, top_n, measure, min_count)
+    return [{"keyword": name, "score": score, "shared_faculty": shared} for name, score, shared in rows]
+
+
+@endpoint
+async def keyword_network(request):
+    """The keyword's ego network as parallel node and edge arrays (see neo4j_utils.EgoNetwork)."""
+    entry = await _keyword(request)
+    depth = _int(request, "depth", 1, 1, EGO_MAX_DEPTH)
+    limit = _int(request, "limit", 20, 1, EGO_MAX_FACULTY)
+    min_weight = _int(request, "min_weight", 1, 1)
+    network = await runner().call("neo4j", get_keyword_ego_network, _need(entry, "neo4j_id", "neo4j"),
+                                  depth, limit, min_weight)
+    return network._asdict()
+
+
+@endpoint
+async def faculty_profile(request):
+    entry = await _faculty(request.path_params["faculty_id"])
+    mongo_id = _need(entry, "mongo_id", "mongodb")
+    found = await runner().call("mongodb", get_faculty_by_ids, [mongo_id], PROFILE_FIELDS)
+    if not found:
+        raise ApiError(404, f"no MongoDB profile for faculty id {entry.mysql_id}")
+    return dict(found[0], id=entry.mysql_id, mongo_id=mongo_id)
+
+
+@endpoint
+async def faculty_publications(request):
+    entry = await _faculty(request.path_params["faculty_id"])
+    offset = _int(request, "offset", 0)
+    limit = _int(request, "limit", 5, 1, MAX_PAGE_SIZE)
+    publications, total = await runner().call("mongodb", get_top_publications,
+                                              _need(entry, "mongo_id", "mongodb"), offset, limit)
+    return {"publications": publications, "total": total, "offset": offset}
+
+
+@endpoint
+async def collaboration_paths(request):
+    """Shortest chains of shared keywords between two faculty members, shortest first."""
+    a = await _faculty(request.path_params["faculty_id"])
+    b = await _faculty(request.path_params["other_id"])
+    k = _int(request, "k", 3, 1, 10)
+    max_keywords = _int(request, "max_keywords", MAX_KEYWORDS, 1, MAX_KEYWORDS)
+    graph = await collaboration_graph.get()
+    registry = await faculty_registry.get()
+    paths = await runner().call("app", graph.paths, _need(a, "neo4j_id", "neo4j"),
+                                _need(b, "neo4j_id", "neo4j"), k, max_keywords)
+    result = []
+    for path in paths:
+        steps = []
+        for node in path:
+            step = {"kind": node.kind, "node_id": node.node_id, "name": node.name}
+            faculty = registry.by_neo4j_id(node.node_id) if node.kind == "faculty" else None
+            if faculty is not None:
+                step["faculty_id"] = faculty.mysql_id
+            steps.append(step)
+        result.append(steps)
+    return result
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global _runner
+    if snapshot.active():
+        backends.serve_from_snapshot()
+    backends.start_health_checks()
+    _runner = QueryRunner()
+    try:
+        yield
+    finally:
+        _runner.close()
+
+
+routes = [
+    Route("/health", health),
+    Route("/metrics", prometheus),
+    Route("/universities", universities),
+    Route("/keywords", keywords),
+    Route("/keywords/rising", rising_keywords),
+    Route("/keywords/{keyword}/trend", keyword_trend),
+    Route("/keywords/{keyword}/rankings", keyword_rankings),
+    Route("/keywords/{keyword}/faculty", keyword_faculty),
+    Route("/keywords/{keyword}/related", related_keywords),
+    Route("/keywords/{keyword}/network", keyword_network),
+    Route("/faculty/{faculty_id:int}", faculty_profile),
+    Route("/faculty/{faculty_id:int}/publications", faculty_publications),
+    Route("/faculty/{faculty_id:int}/paths/{other_id:int}", collaboration_paths),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
@@ -1,37 +1,159 @@
 import streamlit as st
 from mysql_utils import (
     get_faculty_by_keywords, 
+    search_faculty_by_keyword_ids,
     get_all_universities, 
     get_all_keywords,
-    get_university_pub_counts_by_keyword
+    get_university_pub_counts_by_keyword,
+    get_university_rankings
 )
 from mongodb_utils import (
     get_all_universities as get_all_mongo_unis,
     get_faculty_by_university,
     get_all_faculty_names,
     get_faculty_by_name,
-    get_publications_by_ids,
+    get_faculty_profiles_by_ids,
+    ensure_indexes,
     save_to_favorites, 
     get_favorites, 
     get_faculty_by_id, 
+    get_faculty_by_ids,
     clear_favorites,
     remove_from_favorites,
     get_publication_counts_by_keyword,
+    get_all_publication_keywords as get_all_mongo_keywords,
     get_user_interests,
     save_user_interests
 )
 from neo4j_utils import (
     get_keyword_faculty_network, 
+    get_keyword_ego_network,
+    EgoNetwork,
+    NODE_FACULTY,
     get_all_neo4j_keywords
 )
+from fanout import fan_out, QueryResult
+from profile_store import ProfileStore
+from top_publications import get_top_publications
+from trend_cube import build_trend_cube
+from keyword_cooccurrence import build_keyword_cooccurrence, MEASURES as SIMILARITY_MEASURES
+from faculty_recommender import build_faculty_recommender
+from collaboration_paths import MAX_KEYWORDS as PATH_MAX_KEYWORDS, build_collaboration_graph
+from keyword_index import KeywordIndex, get_keyword_index
+from keyword_registry import build_keyword_registry
+from faculty_registry import build_faculty_registry
+from graph_layout import layout_ego_network, NODE_CLUSTER, NODE_FACULTY_CLUSTER
 from streamlit_agraph import agraph, Node, Edge, Config
 import datetime
-import matplotlib.pyplot as plt
+import os
+from chart_cache import render_chart
+from thumbnails import prefetch as prefetch_thumbnails, thumbnail
+import metrics
+import query_cache
+from mysql_pool import pool_stats
+from backends import BACKENDS, get_manager
+import snapshot
 
-@st.cache_data(show_spinner="Ranking universities...")
-def cached_get_university_pub_counts_by_keyword(keyword):
-    return get_university_pub_counts_by_keyword(keyword)
+BACKEND_LABELS = {"mysql": "MySQL", "mongodb": "MongoDB", "neo4j": "Neo4j"}
+KEYWORD_PAGE_SIZE = 50
+FACULTY_PAGE_SIZE = 10
+PUBLICATION_PAGE_SIZE = 5
+NETWORK_NODE_BUDGET = 120
+# Displayed image widths, which thumbnails are resized to
+FACULTY_PHOTO_WIDTH = 80
+UNIVERSITY_LOGO_WIDTH = 60
+PROFILE_PHOTO_WIDTH = 100
+DEFAULT_FACULTY_PHOTO = "images/default_faculty.png"
+DEFAULT_UNIVERSITY_LOGO = "images/default_uni.png"
 
+# Maps each keyword to its id in every store; built once per process
+@st.cache_resource(show_spinner="Loading keywords...", ttl=3600)
+def get_keyword_registry():
+    return build_keyword_registry()
+
+
+# Joins MySQL faculty ids to MongoDB profiles and Neo4j nodes; built once per process
+@st.cache_resource(show_spinner=False, ttl=3600)
+def get_faculty_registry():
+    return build_faculty_registry()
+
+
+# Clients connect on first use; this only starts the background health checks
+@st.cache_resource(show_spinner=False)
+def backend_manager():
+    manager = get_manager()
+    if snapshot.active():
+        manager.serve_from_snapshot()
+    manager.start_health_checks()
+    return manager
+
+
+# Used only when MySQL is down, so keywords can still be searched
+@st.cache_resource(show_spinner=False, ttl=600)
+def get_fallback_keyword_index(store):
+    keywords = get_all_mongo_keywords() if store == "mongodb" else get_all_neo4j_keywords()
+    return KeywordIndex(keywords)
+
+
+# The top-publications indexes are built by top_publications.py's rebuild, not here
+@st.cache_resource(show_spinner=False)
+def prepare_mongo_indexes():
+    ensure_indexes()
+
+
+# Built with one aggregation over all publications, then shared by every session
+@st.cache_resource(show_spinner=False, ttl=3600)
+def get_trend_cube():
+    return build_trend_cube()
+
+
+# Built from the faculty-keyword relation in one pass, then shared by every session
+@st.cache_resource(show_spinner="Finding related keywords...", ttl=3600)
+def get_keyword_cooccurrence(store):
+    return build_keyword_cooccurrence(store)
+
+
+# Every faculty member's keyword vector, read once and shared by every session
+@st.cache_resource(show_spinner="Loading recommendations...", ttl=3600)
+def get_faculty_recommender():
+    return build_faculty_recommender()
+
+
+# Neo4j's faculty-keyword edges as compact arrays, read once and shared by every session
+@st.cache_resource(show_spinner="Loading the collaboration graph...", ttl=3600)
+def get_collaboration_graph():
+    return build_collaboration_graph()
+
+
+def keyword_trend(keyword, start_year):
+    return get_trend_cube().trend(keyword, start_year)
+
+
+def draw_trend_chart(fig, ax, data):
+    ax.plot(data["years"], data["counts"], marker='o', linewidth=2, markersize=6)
+    ax.set_xlabel("Year")
+    ax.set_ylabel("Number of Publications")
+    ax.set_title(f"Publications mentioning '{data['keyword']}' (Last 15 years)")
+    ax.grid(True, alpha=0.3)
+
+
+def draw_ranking_chart(fig, ax, data):
+    ax.barh(data["universities"], data["publications"], color='skyblue')
+    ax.invert_yaxis()
+    ax.set_xlabel("Total Publications")
+    ax.set_ylabel("University")
+    ax.set_title(f"University Rankings by Publication Count for '{data['keyword']}'")
+    fig.tight_layout()
+
+
+def draw_compare_chart(fig, ax, data):
+    for keyword, counts in data["series"].items():
+        ax.plot(data["years"], counts, marker='o', linewidth=2, markersize=4, label=keyword)
+    ax.set_xlabel("Year")
+    ax.set_ylabel("Number of Publications")
+    ax.set_title("Publications per Year (Last 15 years)")
+    ax.grid(True, alpha=0.3)
+    ax.legend()
 
 if "user" not in st.session_state:
     with st.form("login_form"):
@@ -47,269 +169,892 @@ if "user" not in st.session_state:
                 "name": f"{fname} {lname}",
                 "email": email
             }
-            clear_favorites(email)
+            try:
+                clear_favorites(email)
+            except Exception:
+                # Logging in doesn't need MongoDB; the profile sections say if it's down
+                pass
             st.rerun()
 
     st.stop()
 
 user = st.session_state["user"]
 
+backends = backend_manager()
+
+# Profiles always live in MongoDB, even when everything else comes from a snapshot
+if backends.reachable("mongodb"):
+    try:
+        prepare_mongo_indexes()
+    except Exception as e:
+        backends.report_failure("mongodb", e)
+
+# The profile document is read once per session; checks are answered from
+# memory and changes are written back in one batch by flush(). Without
+# MongoDB there is no profile, and the profile features are hidden.
+profile_store = st.session_state.get("profile_store")
+if profile_store is None or profile_store.email != user["email"]:
+    profile_store = None
+    if backends.reachable("mongodb"):
+        try:
+            profile_store = ProfileStore(user["email"])
+        except Exception as e:
+            backends.report_failure("mongodb", e)
+    st.session_state["profile_store"] = profile_store
+
 
 st.sidebar.success(f"Welcome, {user['name']}!")
 st.sidebar.markdown(f" Email: [{user['email']}](mailto:{user['email']})")
+for name in backends.degraded():
+    st.sidebar.warning(f"{BACKEND_LABELS[name]} is unavailable; the sections that need it are "
+                       "hidden until it recovers.")
 
 
-interests = get_user_interests(user)
-if interests:
-    st.sidebar.markdown(" **Research Interests:**")
-    for interest in interests:
-        col1, col2 = st.sidebar.columns([4, 1])
-        with col1:
-            st.write(f"- {interest}")
-        with col2:
-            if st.button("X", key=f"remove_interest_{interest}", help="Remove interest"):
-                updated = [i for i in interests if i != interest]
-                save_user_interests(user, updated)
-                st.rerun()
+def keyword_cooccurrence():
+    """The shared co-occurrence matrix, from MySQL or else Neo4j; None while both are down."""
+    for store in ("mysql", "neo4j"):
+        if backends.available(store):
+            try:
+                return get_keyword_cooccurrence(store)
+            except Exception as e:
+                backends.report_failure(store, e)
+    return None
+
+
+def session_memo(key, fn, *args):
+    """Per-session memo for page data, so full and fragment reruns don't re-query it.
 
+    Cleared whenever the selected keyword changes.
+    """
+    memo = st.session_state.setdefault("section_memo", {})
+    if key not in memo:
+        memo[key] = fn(*args)
+    return memo[key]
 
-favorites = get_favorites(user["email"])
-if favorites:
-    st.sidebar.markdown(" **Favorites:**")
-    for fav in favorites:
+
+@st.fragment
+def sidebar_fragment():
+    if profile_store is None:
+        st.caption("Your interests and favorites are unavailable while MongoDB is down.")
+        return
+    interests = profile_store.get_interests()
+    if interests:
+        st.markdown(" **Research Interests:**")
+        for interest in interests:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.write(f"- {interest}")
+            with col2:
+                if st.button("X", key=f"remove_interest_{interest}", help="Remove interest"):
+                    profile_store.remove_interest(interest)
+                    profile_store.flush()
+                    st.rerun(scope="fragment")
+
+        cooccurrence = keyword_cooccurrence()
+        suggestions = cooccurrence.suggest(interests, top_n=5) if cooccurrence is not None else []
+        if suggestions:
+            st.markdown(" **Suggested for you:**")
+            for keyword, _ in suggestions:
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    st.write(f"- {keyword}")
+                with col2:
+                    if st.button("+", key=f"suggested_interest_{keyword}", help="Add to your interests"):
+                        profile_store.add_interest(keyword)
+                        profile_store.flush()
+                        st.rerun(scope="fragment")
+
+    favorites = profile_store.get_favorites()
+    if favorites:
+        st.markdown(" **Favorites:**")
         try:
-            prof = get_faculty_by_id(fav["faculty_id"])
-            if prof: 
-                col1, col2 = st.sidebar.columns([4, 1])
+            # One $in query for the whole list instead of a lookup per favorite
+            favorite_ids = tuple(fav["faculty_id"] for fav in favorites)
+            for prof in session_memo(("favorites", favorite_ids), get_faculty_by_ids, list(favorite_ids)):
+                col1, col2 = st.columns([4, 1])
                 with col1:
                     st.markdown(f"- {prof['name']}")
                 with col2:
                     if st.button("X", key=f"remove_fav_{prof['id']}", help="Remove favorite"):
-                        remove_from_favorites(user["email"], prof["id"])
+                        profile_store.remove_from_favorites(prof["id"])
+                        profile_store.flush()
+                        # Faculty cards show favorite status too, so refresh the page;
+                        # its sections are memoized and don't query again.
                         st.rerun()
         except Exception as e:
-            st.sidebar.error(f"Error loading favorite: {e}")
+            st.error(f"Error loading favorites: {e}")
+
+    if interests or favorites:
+        recommended_faculty(interests, favorites)
+
+
+def recommended_faculty(interests, favorites):
+    """Faculty closest to the user's interests and favorites, from the in-memory recommender."""
+    if not backends.available("mysql"):
+        return
+    try:
+        recommender = get_faculty_recommender()
+        # Favorites hold MongoDB ids and the recommender is keyed by MySQL id, so
+        # without the registry to map them favorites can't seed recommendations
+        favorite_ids = []
+        faculty_map = None
+        if not backends.degraded():
+            faculty_map = get_faculty_registry()
+            for fav in favorites:
+                entry = faculty_map.by_mongo_id(fav["faculty_id"])
+                if entry is not None:
+                    favorite_ids.append(entry.mysql_id)
+        recommendations = recommender.recommend(interests, favorite_ids, top_n=5)
+    except Exception as e:
+        st.caption(f"Recommendations unavailable ({e})")
+        return
+    if not recommendations:
+        return
+
+    st.markdown(" **Recommended for you:**")
+    for fid, name, university, score, reasons in recommendations:
+        # Saving a favorite needs the MongoDB id, so without the registry there is no button
+        mongo_id = faculty_map.mongo_id(fid) if faculty_map is not None else None
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(f"- {name} ({university})")
+            st.caption("Shares: " + ", ".join(reasons))
+        with col2:
+            if mongo_id is not None and st.button("☆", key=f"recommended_fav_{fid}", help="Add to favorites"):
+                profile_store.save_to_favorites(mongo_id, name, university or "Unknown University")
+                profile_store.flush()
+                # Faculty cards show favorite status too, so refresh the page
+                st.rerun()
+
+
+with st.sidebar:
+    sidebar_fragment()
+
+
+# Comma-separated emails that see the query metrics panel
+METRICS_ADMINS = {e.strip() for e in os.environ.get("DASHBOARD_ADMINS", "").split(",") if e.strip()}
+
+
+@st.fragment
+def metrics_panel():
+    with st.expander("Query metrics"):
+        data = metrics.snapshot()
+        if st.button("Refresh", key="metrics_refresh"):
+            st.rerun(scope="fragment")
+
+        for backend, total in sorted(data["backends"].items()):
+            mean = total["seconds"] / total["calls"] if total["calls"] else 0.0
+            st.caption(f"**{backend}**: {total['calls']} calls, {total['errors']} errors, "
+                       f"{mean * 1000:.1f} ms mean")
+        st.dataframe(
+            [
+                {
+                    "backend": row["backend"],
+                    "function": row["function"],
+                    "calls": row["calls"],
+                    "errors": row["errors"],
+                    "p50 ms": row["p50"] * 1000 if row["p50"] is not None else None,
+                    "p95 ms": row["p95"] * 1000 if row["p95"] is not None else None,
+                    "rows/call": row["rows"] / row["calls"] if row["calls"] else None,
+                    "max rows": row["max_rows"],
+                }
+                for row in data["functions"] if row["calls"]
+            ],
+            hide_index=True,
+        )
+        if data["caches"]:
+            st.dataframe(data["caches"], hide_index=True)
+        cache = query_cache.stats()
+        st.caption(f"Query cache: {cache['entries']} results, {cache['bytes'] / 2**20:.1f} of "
+                   f"{cache['max_bytes'] / 2**20:.0f} MB, {cache['disk_hits']} disk hits, "
+                   f"{cache['evictions']} evictions, {cache['invalidations']} invalidations")
+        for name in BACKENDS:
+            status = backends.status(name)
+            if backends.served(name):
+                st.caption(f"{BACKEND_LABELS[name]}: served from snapshot "
+                           f"({os.path.basename(snapshot.current().directory)})")
+            elif status is None:
+                st.caption(f"{BACKEND_LABELS[name]}: not checked yet")
+            elif status.available:
+                st.caption(f"{BACKEND_LABELS[name]}: up ({status.latency * 1000:.0f} ms probe)")
+            else:
+                st.caption(f"{BACKEND_LABELS[name]}: down ({status.error})")
+        st.caption("MySQL pool: " + ", ".join(f"{k} {v}" for k, v in pool_stats().items()))
+
+        json_col, prom_col = st.columns(2)
+        with json_col:
+            st.download_button("JSON", metrics.to_json(data), "metrics.json", "application/json")
+        with prom_col:
+            st.download_button("Prometheus", metrics.to_prometheus(data), "metrics.prom", "text/plain")
+        if st.button("Reset counters", key="metrics_reset"):
+            metrics.reset()
+            st.rerun(scope="fragment")
+
+
+if user["email"] in METRICS_ADMINS:
+    with st.sidebar:
+        metrics_panel()
 
 
 st.markdown("##  Keyword Publication Trend (Past 15 Years)")
 
+keyword_index = None
 try:
-    keyword_options = get_all_keywords()
-    if not keyword_options:
-        st.error("No keywords found. Please check your database connection.")
-        st.stop()
+    if backends.available("mysql"):
+        keyword_index = get_keyword_index()
 except Exception as e:
-    st.error(f"Error loading keywords: {e}")
+    backends.report_failure("mysql", e)
+if keyword_index is None:
+    # MySQL holds the keyword list; borrow another store's vocabulary while it's down
+    for store in ("mongodb", "neo4j"):
+        if backends.available(store):
+            try:
+                keyword_index = get_fallback_keyword_index(store)
+                break
+            except Exception as e:
+                backends.report_failure(store, e)
+if keyword_index is None:
+    st.error("Keywords can't be loaded: no database is reachable right now.")
+    st.stop()
+if not len(keyword_index):
+    st.error("No keywords found. Please check your database connection.")
     st.stop()
 
-selected_chart_keyword = st.selectbox("Choose a keyword", keyword_options, index=None, placeholder="Select...")
 
-if selected_chart_keyword:
+def search_keywords(label, key, keep=()):
+    """Search box over the shared keyword index; returns one page of matching keywords.
+
+    Only the current page goes to the browser instead of the whole vocabulary.
+    Anything in `keep` stays in the options so an existing selection survives
+    a new search.
+    """
+    query = st.text_input(label, key=f"{key}_query", placeholder="Type to search, typos are OK...")
+    matches, total = keyword_index.search(query, page_size=KEYWORD_PAGE_SIZE)
+    pages = -(-total // KEYWORD_PAGE_SIZE)
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages}, {total} matches)", min_value=1, max_value=pages,
+                               key=f"{key}_page")
+        if page > 1:
+            matches, _ = keyword_index.search(query, page=page - 1, page_size=KEYWORD_PAGE_SIZE)
+    elif query and not total:
+        st.caption("No matching keywords.")
+    return [k for k in keep if k and k not in matches] + matches
+
+
+chart_options = search_keywords("Search keywords", "chart_keyword",
+                                keep=[st.session_state.get("chart_keyword")])
+selected_chart_keyword = st.selectbox("Choose a keyword", chart_options, index=None,
+                                      placeholder="Select...", key="chart_keyword")
+
+trend_start_year = datetime.datetime.now().year - 15
+
+with st.expander(" Fastest Growing Research Areas"):
     try:
-        current_year = datetime.datetime.now().year
-        start_year = current_year - 15
-        counts, years = get_publication_counts_by_keyword(selected_chart_keyword, start_year)
-        
-        if counts and years:
-            st.subheader(f"Number of Publications per Year for '{selected_chart_keyword}'")
-            
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.plot(years, counts, marker='o', linewidth=2, markersize=6)
-            ax.set_xlabel("Year")
-            ax.set_ylabel("Number of Publications")
-            ax.set_title(f"Publications mentioning '{selected_chart_keyword}' (Last 15 years)")
-            ax.grid(True, alpha=0.3)
-            st.pyplot(fig)
+        backends.require("mongodb")
+        rising = get_trend_cube().fastest_rising(top_n=10, window=5)
+        if rising:
+            st.caption("Publications in the last 5 years compared with the 5 years before.")
+            for keyword, growth, previous, recent in rising:
+                st.markdown(f"- **{keyword}**: {previous} → {recent} publications ({growth:+.0%})")
         else:
-            st.warning(f"No publication data found for '{selected_chart_keyword}'")
+            st.info("Not enough publication data to rank growing areas.")
     except Exception as e:
-        st.error(f"Error generating publication chart: {e}")
-
+        st.error(f"Error loading growing research areas: {e}")
 
-if selected_chart_keyword:
-    if st.button(" Save Interest to My Profile"):
+with st.expander(" Compare Keyword Trends"):
+    compare_options = search_keywords("Find keywords to compare", "compare_keywords",
+                                      keep=st.session_state.get("compare_keywords", []))
+    compare_keywords = st.multiselect("Keywords to compare", compare_options, max_selections=6,
+                                      key="compare_keywords")
+    if compare_keywords:
         try:
-            current_interests = get_user_interests(user) or []
-            
-            if selected_chart_keyword not in current_interests:
-                current_interests.append(selected_chart_keyword)
-                save_user_interests(user, current_interests)
-                st.success(f"✅ '{selected_chart_keyword}' added to your interests!")
-                st.rerun()
-            else:
-                st.info(f"'{selected_chart_keyword}' is already in your interests.")
-                
+            backends.require("mongodb")
+            series, years = get_trend_cube().overlay(compare_keywords, trend_start_year)
+            st.image(render_chart("compare", tuple(compare_keywords), {"series": series, "years": years},
+                                  draw_compare_chart))
         except Exception as e:
-            st.error(f"Error saving interests: {e}")
+            st.error(f"Error generating comparison chart: {e}")
 
 
-if selected_chart_keyword:
-    st.subheader(" University Publication Rankings by Keyword")
+@st.fragment
+def collaboration_fragment(favorites):
+    """The shortest chains of shared keywords between two favorited faculty members."""
+    names = {fav["faculty_id"]: fav["name"] for fav in favorites}
+    from_col, to_col, count_col = st.columns([2, 2, 1])
+    with from_col:
+        first = st.selectbox("From", list(names), format_func=names.get, key="path_from")
+    with to_col:
+        second = st.selectbox("To", [fid for fid in names if fid != first], format_func=names.get,
+                              key="path_to")
+    with count_col:
+        count = st.number_input("Paths", min_value=1, max_value=5, value=3, key="path_count")
 
     try:
-        if selected_chart_keyword:
-            results = cached_get_university_pub_counts_by_keyword(selected_chart_keyword)
-
-            if results:
-                universities = [row[0] for row in results]
-                publications = [row[1] for row in results]
-
-                st.subheader(f"Top Universities for '{selected_chart_keyword}'")
-
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.barh(universities, publications, color='skyblue')
-                ax.set_xlabel("Total Publications")
-                ax.set_ylabel("University")
-                ax.set_title(f"University Rankings by Publication Count for '{selected_chart_keyword}'")
-                plt.tight_layout()
-                st.pyplot(fig)
-            else:
-                st.info(f"No publications found for the keyword '{selected_chart_keyword}'.")
+        backends.require("neo4j")
+        # Favorites hold MongoDB ids; the graph is keyed by Neo4j node id
+        faculty_map = get_faculty_registry()
+        ends = [faculty_map.by_mongo_id(fid) for fid in (first, second)]
+        missing = [names[fid] for fid, entry in zip((first, second), ends)
+                   if entry is None or entry.neo4j_id is None]
+        if missing:
+            st.info(f"{' and '.join(missing)} can't be found in the research network.")
+            return
+        paths = get_collaboration_graph().paths(ends[0].neo4j_id, ends[1].neo4j_id, k=count)
     except Exception as e:
-        st.error(f"Error loading university data: {e}")
+        st.error(f"Error finding connections: {e}")
+        return
 
+    if not paths:
+        st.info(f"{names[first]} and {names[second]} aren't connected through "
+                f"{PATH_MAX_KEYWORDS} or fewer shared keywords.")
+        return
+    for path in paths:
+        st.markdown(" → ".join(f"**{node.name}**" if node.kind == NODE_FACULTY else f"*{node.name}*"
+                               for node in path))
 
-if selected_chart_keyword:
-    st.subheader(f"Top 10 Faculty for '{selected_chart_keyword}'")
-    
-    try:
-        results = get_faculty_by_keywords([selected_chart_keyword])
-        
-        if not results:
-            st.warning(f"No faculty found for keyword '{selected_chart_keyword}'")
-        else:
-            if 'viewed_profiles' not in st.session_state:
-                st.session_state.viewed_profiles = set()
-            
-            for i, (name, position, faculty_photo, email, uni_name, uni_logo) in enumerate(results):
-                faculty_key = f"{name}_{uni_name}_{i}"
-                
-                with st.container():
-                    col1, col2, col3 = st.columns([1, 5, 1])
-                    
-                    with col1:
-                        st.image(faculty_photo or "images/default_faculty.png", width=80)
-                    
-                    with col2:
-                        st.markdown(f"### {name}")
-                        st.markdown(f"**{position or 'Unknown Position'}** at *{uni_name}*")
-                        if email:
-                            st.markdown(f" [Email](mailto:{email})")
-                        else:
-                            st.markdown(" Email: N/A")
-                    
-                    with col3:
-                        st.image(uni_logo or "images/default_uni.png", width=60)
-                    
-                    btn_col1, btn_col2 = st.columns([1, 1])
-                    
-                    with btn_col1:
-                        if st.button(" View Profile", key=f"view_profile_{faculty_key}"):
-                            if faculty_key in st.session_state.viewed_profiles:
-                                st.session_state.viewed_profiles.remove(faculty_key)
-                            else:
-                                st.session_state.viewed_profiles.add(faculty_key)
-                            st.rerun()
-                    
+
+with st.expander(" How Are Your Favorites Connected?"):
+    connected_favorites = profile_store.get_favorites() if profile_store is not None else []
+    if len(connected_favorites) < 2:
+        st.caption("Save at least two faculty members to your favorites to see how their research connects.")
+    else:
+        collaboration_fragment(connected_favorites)
+
+
+def render_trend(keyword, result):
+    if result.timed_out:
+        st.warning("Publication trend is taking too long to load (MongoDB). Try again shortly.")
+        return
+    if not result.ok:
+        st.error(f"Error generating publication chart: {result.error}")
+        return
+
+    counts, years = result.value
+    if counts and years:
+        st.subheader(f"Number of Publications per Year for '{keyword}'")
+
+        st.image(render_chart("trend", keyword, {"keyword": keyword, "counts": counts, "years": years},
+                              draw_trend_chart))
+    else:
+        st.warning(f"No publication data found for '{keyword}'")
+
+
+def render_rankings(keyword, result):
+    if result.timed_out:
+        st.warning("University rankings are taking too long to load (MySQL). Try again shortly.")
+        return
+    if not result.ok:
+        st.error(f"Error loading university data: {result.error}")
+        return
+
+    results = result.value
+    if results:
+        universities = [row[0] for row in results]
+        publications = [row[1] for row in results]
+
+        st.subheader(f"Top Universities for '{keyword}'")
+
+        data = {"keyword": keyword, "universities": universities, "publications": publications}
+        st.image(render_chart("ranking", keyword, data, draw_ranking_chart,
+                              figsize=(10, max(6, len(universities) * 0.3))))
+    else:
+        st.info(f"No publications found for the keyword '{keyword}'.")
+
+
+def faculty_page_stack(keyword):
+    """Keyset cursors for the pages of faculty visited so far; the last one is the current page."""
+    weighted = st.session_state.get("faculty_weighted", False)
+    pages = st.session_state.setdefault("faculty_pages", {})
+    return pages.setdefault((keyword, weighted), [None])
+
+
+def legacy_faculty_page(keywords):
+    """Unranked name-matched faculty, shaped like search_faculty_by_keyword_ids's pages"""
+    return [row + (None,) for row in get_faculty_by_keywords(keywords)], None
+
+
+def render_faculty(keyword, result):
+    if result.timed_out:
+        st.warning("Faculty list is taking too long to load (MySQL). Try again shortly.")
+        return
+    if not result.ok:
+        st.error(f"Error loading faculty data: {result.error}")
+        return
+
+    results, next_cursor = result.value
+    if not results:
+        st.warning(f"No faculty found for keyword '{keyword}'")
+        return
+
+    if 'viewed_profiles' not in st.session_state:
+        st.session_state.viewed_profiles = set()
+
+    # Load every expanded card's profile in one indexed query, keyed by faculty id
+    profiles = {}
+    expanded = [row[0] for row in results if f"faculty_{row[0]}" in st.session_state.viewed_profiles]
+    if expanded:
+        # MySQL and MongoDB share faculty ids in academicworld; the registry
+        # (built from all three stores) corrects any that don't line up
+        mongo_ids = {fid: fid for fid in expanded}
+        if not backends.degraded():
+            try:
+                faculty_map = get_faculty_registry()
+                mongo_ids = {fid: faculty_map.mongo_id(fid) for fid in expanded}
+            except Exception:
+                pass
+        try:
+            wanted = tuple(sorted(m for m in mongo_ids.values() if m is not None))
+            by_mongo_id = session_memo(("profiles", wanted), get_faculty_profiles_by_ids, list(wanted))
+            profiles = {fid: by_mongo_id.get(mongo_id) for fid, mongo_id in mongo_ids.items()}
+        except Exception as e:
+            st.error(f" Error loading faculty profiles: {e}")
+
+    # Fetch the whole page's images at once; each card below then waits only for its own
+    prefetch_thumbnails(
+        [(row[3], FACULTY_PHOTO_WIDTH) for row in results]
+        + [(row[6], UNIVERSITY_LOGO_WIDTH) for row in results]
+        + [(profile.get("photoUrl"), PROFILE_PHOTO_WIDTH) for profile in profiles.values() if profile]
+    )
+
+    for faculty_id, name, position, faculty_photo, email, uni_name, uni_logo, score in results:
+        faculty_key = f"faculty_{faculty_id}"
+
+        with st.container():
+            col1, col2, col3 = st.columns([1, 5, 1])
+
+            with col1:
+                st.image(thumbnail(faculty_photo, FACULTY_PHOTO_WIDTH, DEFAULT_FACULTY_PHOTO),
+                         width=FACULTY_PHOTO_WIDTH)
+
+            with col2:
+                st.markdown(f"### {name}")
+                st.markdown(f"**{position or 'Unknown Position'}** at *{uni_name}*")
+                if score is not None:
+                    st.caption(f"Relevance score: {score:.2f}")
+                if email:
+                    st.markdown(f" [Email](mailto:{email})")
+                else:
+                    st.markdown(" Email: N/A")
+
+            with col3:
+                st.image(thumbnail(uni_logo, UNIVERSITY_LOGO_WIDTH, DEFAULT_UNIVERSITY_LOGO),
+                         width=UNIVERSITY_LOGO_WIDTH)
+
+            btn_col1, btn_col2 = st.columns([1, 1])
+
+            with btn_col1:
+                if st.button(" View Profile", key=f"view_profile_{faculty_key}"):
                     if faculty_key in st.session_state.viewed_profiles:
+                        st.session_state.viewed_profiles.remove(faculty_key)
+                    else:
+                        st.session_state.viewed_profiles.add(faculty_key)
+                    st.rerun(scope="fragment")
+
+            if faculty_key in st.session_state.viewed_profiles:
+                try:
+                    profile = profiles.get(faculty_id)
+                    if profile:
+                        st.markdown("---")
+                        st.markdown("###  Faculty Profile")
+
+                        profile_col1, profile_col2 = st.columns([1, 3])
+                        with profile_col1:
+                            st.image(thumbnail(profile.get("photoUrl"), PROFILE_PHOTO_WIDTH, DEFAULT_FACULTY_PHOTO),
+                                     width=PROFILE_PHOTO_WIDTH)
+
+                        with profile_col2:
+                            st.markdown(f"**{profile['name']}**")
+                            st.markdown(f"Position: {profile.get('position', 'Unknown Position')}")
+                            if 'affiliation' in profile and profile['affiliation']:
+                                st.markdown(f"University: {profile['affiliation']['name']}")
+
+                        fav_button_key = f"save_fav_{profile['id']}_{faculty_key}"
+
+                        if profile_store is None:
+                            # No profile to save to while MongoDB is down
+                            pass
+                        elif profile_store.is_favorite(profile["id"]):
+                            st.success(" Already in favorites!")
+                        else:
+                            if st.button(" Save to My Favorites", key=fav_button_key):
+                                try:
+                                    profile_store.save_to_favorites(
+                                        profile["id"],
+                                        profile["name"],
+                                        (profile.get("affiliation") or {}).get("name", "Unknown University"),
+                                    )
+                                    profile_store.flush()
+                                    # A toast survives the rerun, so no need to sleep before it
+                                    st.toast("✅ Successfully saved to favorites!")
+                                    st.rerun()
+                                except Exception as e:
+                                    st.error(f" Error saving to favorites: {e}")
+                        st.markdown("###  Top Publications")
+                        pub_page_key = f"pub_page_{profile['id']}"
+                        pub_page = st.session_state.get(pub_page_key, 0)
                         try:
-                            profile = get_faculty_by_name(name)
-                            if profile:
-                                st.markdown("---")
-                                st.markdown("###  Faculty Profile")
-                                
-                                profile_col1, profile_col2 = st.columns([1, 3])
-                                with profile_col1:
-                                    st.image(profile.get("photoUrl") or "https://via.placeholder.com/100", width=100)
-                                
-                                with profile_col2:
-                                    st.markdown(f"**{profile['name']}**")
-                                    st.markdown(f"Position: {profile.get('position', 'Unknown Position')}")
-                                    if 'affiliation' in profile and profile['affiliation']:
-                                        st.markdown(f"University: {profile['affiliation']['name']}")
-                                
-                                fav_button_key = f"save_fav_{profile['id']}_{faculty_key}"
-                                
-                                current_favorites = get_favorites(user["email"])
-                                is_already_favorite = any(fav.get("faculty_id") == profile["id"] for fav in current_favorites)
-                                
-                                if is_already_favorite:
-                                    st.success(" Already in favorites!")
-                                else:
-                                    if st.button(" Save to My Favorites", key=fav_button_key):
-                                        try:
-                                            save_to_favorites(user["email"], profile["id"])
-                                            st.success("✅ Successfully saved to favorites!")
-                                            import time
-                                            time.sleep(0.5)
-                                            st.rerun()
-                                        except Exception as e:
-                                            st.error(f" Error saving to favorites: {e}")
-                                            st.write(f"Debug - User email: {user['email']}")
-                                            st.write(f"Debug - Faculty ID: {profile['id']}")
-                                st.markdown("###  Top Publications")
-                                pub_ids = profile.get("publications", [])
-                                if pub_ids:
-                                    try:
-                                        pubs = get_publications_by_ids(pub_ids, limit=5)
-                                        if pubs:
-                                            for pub in pubs:
-                                                st.markdown(
-                                                    f"- **{pub.get('title', 'Unknown Title')}** "
-                                                    f"({pub.get('venue', 'Unknown Venue')}, {pub.get('year', 'N/A')}) "
-                                                    f"— *{pub.get('numCitations', 0)} citations*"
-                                                )
-                                        else:
-                                            st.markdown("No publications found.")
-                                    except Exception as e:
-                                        st.error(f"Error loading publications: {e}")
-                                else:
-                                    st.markdown("No publications found.")
-                                    
-                                st.markdown("---")
+                            pubs, pub_total = session_memo(
+                                ("publications", profile["id"], pub_page),
+                                get_top_publications, profile["id"], pub_page * PUBLICATION_PAGE_SIZE,
+                                PUBLICATION_PAGE_SIZE,
+                            )
+                            if pubs:
+                                for pub in pubs:
+                                    st.markdown(
+                                        f"- **{pub.get('title') or 'Unknown Title'}** "
+                                        f"({pub.get('venue') or 'Unknown Venue'}, {pub.get('year') or 'N/A'}) "
+                                        f"— *{pub.get('numCitations', 0)} citations*"
+                                    )
+                                shown = pub_page * PUBLICATION_PAGE_SIZE + len(pubs)
+                                less_col, more_col = st.columns(2)
+                                with less_col:
+                                    if pub_page > 0 and st.button("Previous publications", key=f"pub_prev_{profile['id']}"):
+                                        st.session_state[pub_page_key] = pub_page - 1
+                                        st.rerun(scope="fragment")
+                                with more_col:
+                                    if shown < pub_total and st.button(
+                                        f"More publications ({shown} of {pub_total})", key=f"pub_more_{profile['id']}"
+                                    ):
+                                        st.session_state[pub_page_key] = pub_page + 1
+                                        st.rerun(scope="fragment")
                             else:
-                                st.error(" Faculty profile not found.")
+                                st.markdown("No publications found.")
                         except Exception as e:
-                            st.error(f" Error loading faculty profile: {e}")
-                            st.write(f"Debug - Trying to load profile for: {name}")
-                    
-                    st.markdown("---")
-                    
+                            st.error(f"Error loading publications: {e}")
+
+                        st.markdown("---")
+                    else:
+                        st.error(" Faculty profile not found.")
+                except Exception as e:
+                    st.error(f" Error loading faculty profile: {e}")
+
+            st.markdown("---")
+
+    stack = faculty_page_stack(keyword)
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if len(stack) > 1:
+            st.button("← Previous", key="faculty_prev", on_click=stack.pop)
+    with page_col:
+        st.caption(f"Page {len(stack)}")
+    with next_col:
+        if next_cursor is not None:
+            st.button("Next →", key="faculty_next", on_click=stack.append, args=(next_cursor,))
+
+
+def network_center_key(keyword):
+    return f"network_center_{keyword}"
+
+
+def render_network(keyword, result):
+    if result.timed_out:
+        st.warning("Research network is taking too long to load (Neo4j). Try again shortly.")
+        return
+    if not result.ok:
+        st.error(f"Error generating network graph: {result.error}")
+        return
+
+    network = result.value
+    if isinstance(network, EgoNetwork):
+        render_ego_network(keyword, network)
+        return
+
+    network_data = network
+    if network_data:
+        nodes = []
+        edges = []
+        seen = set()
+
+        nodes.append(Node(id=keyword, label=keyword, shape="ellipse", color="red"))
+
+        for entry in network_data:
+            faculty = entry["faculty"]
+            co_keywords = entry["co_keywords"]
+
+            if faculty not in seen:
+                nodes.append(Node(id=faculty, label=faculty, shape="box", color="lightblue"))
+                edges.append(Edge(source=faculty, target=keyword))
+                seen.add(faculty)
+
+            for co_kw in co_keywords:
+                if co_kw not in seen:
+                    nodes.append(Node(id=co_kw, label=co_kw, shape="ellipse", color="lightgreen"))
+                    seen.add(co_kw)
+                edges.append(Edge(source=faculty, target=co_kw))
+
+        config = Config(width=800, height=600, directed=True, physics=True)
+        agraph(nodes=nodes, edges=edges, config=config)
+    else:
+        st.warning(f"No network data found for '{keyword}'")
+
+
+def render_ego_network(keyword, network):
+    if len(network.node_ids) <= 1:
+        st.warning(f"No network data found for '{keyword}'")
+        return
+
+    expanded_key = f"network_expanded_{keyword}_{network.center}"
+    expanded = frozenset(st.session_state.get(expanded_key, ()))
+    graph = layout_ego_network(network, NETWORK_NODE_BUDGET, expanded, 800, 600)
+
+    # Positions come from the server-side layout, so the browser doesn't simulate
+    nodes = []
+    for node_id, label, kind, weight, members, x, y in zip(
+            graph.ids, graph.labels, graph.kinds, graph.weights, graph.members, graph.x, graph.y):
+        if kind == NODE_FACULTY:
+            nodes.append(Node(id=node_id, label=label, shape="box", color="lightblue", x=x, y=y))
+        elif kind == NODE_FACULTY_CLUSTER:
+            preview = ", ".join(members[:10]) + (", ..." if len(members) > 10 else "")
+            nodes.append(Node(id=node_id, label=label, shape="box", color="lightgray",
+                              title=f"Not shown: {preview}", x=x, y=y))
+        elif kind == NODE_CLUSTER:
+            preview = ", ".join(members[:10]) + (", ..." if len(members) > 10 else "")
+            nodes.append(Node(id=node_id, label=label, shape="dot", color="lightgray",
+                              size=12, title=f"Click to expand: {preview}", x=x, y=y))
+        elif node_id == f"k{network.center}":
+            nodes.append(Node(id=node_id, label=label, shape="ellipse", color="red", x=x, y=y))
+        else:
+            nodes.append(Node(id=node_id, label=label, shape="ellipse", color="lightgreen",
+                              title=f"Shared by {weight} faculty", x=x, y=y))
+
+    edges = [Edge(source=graph.ids[a], target=graph.ids[b]) for a, b in zip(graph.sources, graph.targets)]
+
+    config = Config(width=800, height=600, directed=True, physics=False)
+    clicked = agraph(nodes=nodes, edges=edges, config=config)
+    st.caption("Click a keyword to re-center the network on it, or a grey cluster to expand it.")
+
+    # The component keeps returning its last click on later reruns, so only act on new ones
+    if clicked and clicked != st.session_state.get("network_last_click"):
+        st.session_state["network_last_click"] = clicked
+        if clicked.startswith("c"):
+            st.session_state[expanded_key] = expanded | {int(clicked[1:])}
+            st.rerun(scope="fragment")
+        if clicked.startswith("k") and clicked != f"k{network.center}":
+            # Drilling into a neighbour is another cached ego-network lookup, not a new page load
+            st.session_state[network_center_key(keyword)] = int(clicked[1:])
+            st.rerun(scope="fragment")
+
+
+def section_queries(keyword, entry):
+    """(backend, fn, args) for each keyword-page section, read from the current widget state.
+
+    A section is None when its store doesn't have the keyword. Without a
+    registry entry, sections fall back to matching the keyword by name.
+    """
+    ranking_depth = st.session_state.get("ranking_depth", 10)
+    weighted = st.session_state.get("faculty_weighted", False)
+    cursor = faculty_page_stack(keyword)[-1]
+
+    if entry is None:
+        return {
+            "trend": ("mongodb", keyword_trend, (keyword, trend_start_year)),
+            "ranking": ("mysql", get_university_pub_counts_by_keyword, (keyword, ranking_depth)),
+            "faculty": ("mysql", legacy_faculty_page, ((keyword,),)),
+            "network": ("neo4j", get_keyword_faculty_network, (keyword,)),
+        }
+
+    # Every store is queried by its own id (or exact name) for the keyword
+    center = st.session_state.get(network_center_key(keyword), entry.neo4j_id)
+    network_args = (center, st.session_state.get("network_depth", 1),
+                    st.session_state.get("network_limit", 20), st.session_state.get("network_min_weight", 1))
+    return {
+        "trend": ("mongodb", keyword_trend, (entry.mongo_name, trend_start_year))
+        if entry.mongo_name is not None else None,
+        "ranking": ("mysql", get_university_rankings, (entry.mysql_id, ranking_depth))
+        if entry.mysql_id is not None else None,
+        "faculty": ("mysql", search_faculty_by_keyword_ids, ((entry.mysql_id,), weighted, FACULTY_PAGE_SIZE, cursor))
+        if entry.mysql_id is not None else None,
+        "network": ("neo4j", get_keyword_ego_network, network_args)
+        if entry.neo4j_id is not None else None,
+    }
+
+
+def section_key(name, query):
+    backend, fn, args = query
+    return (name, fn.__name__, args)
+
+
+def section_result(name, keyword, entry):
+    """QueryResult for one section, from the memo or the prefetch failures if possible.
+
+    Only a section whose own widgets changed (paging, network drill-down)
+    misses both and queries its backend here, inside its fragment.
+    """
+    query = section_queries(keyword, entry)[name]
+    if query is None:
+        return None
+    backend, fn, args = query
+    key = section_key(name, query)
+    memo = st.session_state.setdefault("section_memo", {})
+    if key in memo:
+        return QueryResult(name, backend, value=memo[key])
+    failure = st.session_state.get("section_failures", {}).get(key)
+    if failure is not None:
+        return failure
+    try:
+        return QueryResult(name, backend, value=session_memo(key, fn, *args))
     except Exception as e:
-        st.error(f"Error loading faculty data: {e}")
+        return QueryResult(name, backend, error=e)
 
-if selected_chart_keyword:
+
+SECTION_BACKENDS = {"trend": "mongodb", "ranking": "mysql", "faculty": "mysql", "network": "neo4j"}
+
+
+def render_section(name, keyword, entry, render):
+    """Render one section, or say why it can't be: its store is down or lacks the keyword."""
+    backend = BACKEND_LABELS[SECTION_BACKENDS[name]]
+    if not backends.available(SECTION_BACKENDS[name]):
+        st.warning(f"{backend} is unavailable right now; this section will be back when it recovers.")
+        return
+    result = section_result(name, keyword, entry)
+    if result is None:
+        st.info(f"'{keyword}' is not in the {backend} data.")
+    else:
+        render(keyword, result)
+
+
+@st.fragment
+def trend_fragment(keyword, entry):
+    render_section("trend", keyword, entry, render_trend)
+
+
+@st.fragment
+def ranking_fragment(keyword, entry):
+    st.subheader(" University Publication Rankings by Keyword")
+    st.selectbox("Universities to show", [10, 25, 50], key="ranking_depth")
+    render_section("ranking", keyword, entry, render_rankings)
+
+
+@st.fragment
+def faculty_fragment(keyword, entry):
+    st.subheader(f"Top Faculty for '{keyword}'")
+    st.checkbox("Weight by publication count", key="faculty_weighted")
+    render_section("faculty", keyword, entry, render_faculty)
+
+
+@st.fragment
+def network_fragment(keyword, entry):
     st.markdown("##  Research Network Graph")
-    
-    try:
-        network_data = get_keyword_faculty_network(selected_chart_keyword)
-        
-        if network_data:
-            nodes = []
-            edges = []
-            seen = set()
-
-            nodes.append(Node(id=selected_chart_keyword, label=selected_chart_keyword, shape="ellipse", color="red"))
-
-            for entry in network_data:
-                faculty = entry["faculty"]
-                co_keywords = entry["co_keywords"]
-
-                if faculty not in seen:
-                    nodes.append(Node(id=faculty, label=faculty, shape="box", color="lightblue"))
-                    edges.append(Edge(source=faculty, target=selected_chart_keyword))
-                    seen.add(faculty)
-
-                for co_kw in co_keywords:
-                    if co_kw not in seen:
-                        nodes.append(Node(id=co_kw, label=co_kw, shape="ellipse", color="lightgreen"))
-                        seen.add(co_kw)
-                    edges.append(Edge(source=faculty, target=co_kw))
-
-            config = Config(width=800, height=600, directed=True, physics=True)
-            agraph(nodes=nodes, edges=edges, config=config)
+    if entry is not None:
+        depth_col, limit_col, weight_col = st.columns(3)
+        with depth_col:
+            st.selectbox("Hops", [1, 2], key="network_depth")
+        with limit_col:
+            st.selectbox("Faculty per keyword", [10, 20, 50], index=1, key="network_limit")
+        with weight_col:
+            st.number_input("Min. shared faculty", min_value=1, max_value=10, key="network_min_weight")
+        if st.session_state.get(network_center_key(keyword)) is not None:
+            if st.button(f"Back to '{keyword}'", key="network_back"):
+                del st.session_state[network_center_key(keyword)]
+                st.rerun(scope="fragment")
+    render_section("network", keyword, entry, render_network)
+
+
+def explore_keyword(keyword):
+    # A callback, so the keyword box can still be changed before it is drawn
+    st.session_state["chart_keyword"] = keyword
+
+
+@st.fragment
+def related_fragment(keyword):
+    with st.expander(" Related Research Areas"):
+        cooccurrence = keyword_cooccurrence()
+        if cooccurrence is None:
+            st.warning("Related keywords are unavailable while MySQL and Neo4j are down.")
+            return
+        measure_col, count_col = st.columns(2)
+        with measure_col:
+            measure = st.radio("Similarity", SIMILARITY_MEASURES, horizontal=True, key="related_measure",
+                               format_func=lambda m: {"cosine": "Cosine", "pmi": "PMI"}[m])
+        with count_col:
+            min_count = st.number_input("Min. shared faculty", min_value=1, max_value=20, value=2,
+                                        key="related_min_count")
+        related = cooccurrence.related(keyword, top_n=10, measure=measure, min_count=min_count)
+        if not related:
+            st.info(f"No keywords share enough faculty with '{keyword}'.")
+            return
+        st.caption("Keywords whose faculty are most often also interested in this one.")
+        for name, score, shared in related:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(f"- **{name}**: {score:.3f} ({shared} shared faculty)")
+            with col2:
+                if st.button("Explore", key=f"related_{name}", on_click=explore_keyword, args=(name,)):
+                    st.rerun()
+
+
+SECTION_FRAGMENTS = {
+    "trend": trend_fragment,
+    "ranking": ranking_fragment,
+    "faculty": faculty_fragment,
+    "network": network_fragment,
+}
+
+
+if selected_chart_keyword:
+    # Section data is memoized per keyword, so reruns that don't change the
+    # keyword (favorites, interests, profile toggles) don't re-query it.
+    if st.session_state.get("section_memo_keyword") != selected_chart_keyword:
+        st.session_state["section_memo"] = {}
+        st.session_state["section_memo_keyword"] = selected_chart_keyword
+
+    keyword_entry = None
+    # The registry is built from all three stores, so skip it while one is down
+    if not backends.degraded():
+        try:
+            keyword_entry = get_keyword_registry().resolve(selected_chart_keyword)
+        except Exception as e:
+            st.caption(f"Keyword registry unavailable, matching by name instead ({e})")
+
+    # Lay the sections out in page order first, then fill each one in as soon
+    # as its backend answers so one slow store doesn't hold up the rest.
+    sections = {"trend": st.container()}
+
+    if profile_store is not None and st.button(" Save Interest to My Profile"):
+        try:
+            if profile_store.add_interest(selected_chart_keyword):
+                profile_store.flush()
+                st.toast(f"✅ '{selected_chart_keyword}' added to your interests!")
+                st.rerun()
+            else:
+                st.info(f"'{selected_chart_keyword}' is already in your interests.")
+
+        except Exception as e:
+            st.error(f"Error saving interests: {e}")
+
+    related_fragment(selected_chart_keyword)
+
+    for name in ("ranking", "faculty", "network"):
+        sections[name] = st.container()
+
+    queries = section_queries(selected_chart_keyword, keyword_entry)
+    memo = st.session_state["section_memo"]
+    failures = {}
+    st.session_state["section_failures"] = failures
+    to_fetch = {
+        name: query for name, query in queries.items()
+        if query is not None and section_key(name, query) not in memo and backends.available(query[0])
+    }
+
+    loading = {}
+    for name, section in sections.items():
+        if name in to_fetch:
+            with section:
+                loading[name] = st.empty()
+                loading[name].caption("Loading...")
         else:
-            st.warning(f"No network data found for '{selected_chart_keyword}'")
-            
-    except Exception as e:
-        st.error(f"Error generating network graph: {e}")
+            with section:
+                SECTION_FRAGMENTS[name](selected_chart_keyword, keyword_entry)
+
+    for result in fan_out(to_fetch):
+        key = section_key(result.name, to_fetch[result.name])
+        if result.ok:
+            memo[key] = result.value
+        else:
+            failures[key] = result
+            if result.timed_out and result.started:
+                # Stop sending queries to a store that isn't answering until a health check passes
+                backends.report_failure(result.backend, TimeoutError(f"{result.name} query timed out"))
+        loading[result.name].empty()
+        with sections[result.name]:
+            SECTION_FRAGMENTS[result.name](selected_chart_keyword, keyword_entry)
@@ -0,0 +1,248 @@
+"""Lazily connected database clients and their health.
+
+Nothing here connects at import time. Each store's client is created on
+first use, once per process, and shared by every module through the lazy
+proxies below, so importing the data-access modules (and rendering the
+login page) no longer waits on MongoDB or Neo4j, and one store being down
+doesn't stop the others from serving their sections.
+
+A background thread probes every store periodically. A store whose probe
+(or a real query, via report_failure) fails is reported as degraded until
+a later probe succeeds; the app skips its sections instead of waiting for
+timeouts.
+
+Stores whose reads are served from an offline snapshot (see snapshot.py)
+count as available whatever their server's state. Only user profiles
+still need the live MongoDB; reachable() tells whether it is up.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+BACKENDS = ("mysql", "mongodb", "neo4j")
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DATABASE = "academicworld"
+NEO4J_URI = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_AUTH = ("neo4j", "Apb_0328")
+NEO4J_DATABASE = "academicworld"
+
+# How long a client waits for an unreachable server before giving up
+CONNECT_TIMEOUT = float(os.environ.get("BACKEND_CONNECT_TIMEOUT", "3"))
+HEALTH_CHECK_SECONDS = float(os.environ.get("BACKEND_HEALTH_CHECK_SECONDS", "30"))
+
+BackendStatus = namedtuple("BackendStatus", ["name", "available", "error", "checked_at", "latency"])
+
+
+class BackendUnavailable(Exception):
+    """Raised instead of querying a store that is known to be down."""
+
+
+def _mysql_client():
+    from mysql_pool import get_pool
+    return get_pool()
+
+
+def _mongo_client():
+    from pymongo import MongoClient
+    timeout_ms = int(CONNECT_TIMEOUT * 1000)
+    return MongoClient(MONGO_URI, serverSelectionTimeoutMS=timeout_ms, connectTimeoutMS=timeout_ms)
+
+
+def _neo4j_client():
+    from neo4j import GraphDatabase
+    return GraphDatabase.driver(NEO4J_URI, auth=NEO4J_AUTH, encrypted=False,
+                                connection_timeout=CONNECT_TIMEOUT)
+
+
+def _probe_mysql(pool):
+    with pool.cursor() as cur:
+        cur.execute("SELECT 1")
+        cur.fetchall()
+
+
+def _probe_mongo(client):
+    client.admin.command("ping")
+
+
+def _probe_neo4j(driver):
+    driver.verify_connectivity()
+
+
+DEFAULT_FACTORIES = {"mysql": _mysql_client, "mongodb": _mongo_client, "neo4j": _neo4j_client}
+DEFAULT_PROBES = {"mysql": _probe_mysql, "mongodb": _probe_mongo, "neo4j": _probe_neo4j}
+
+
+class BackendManager:
+    """One lazily created client per store, plus the latest health of each."""
+
+    def __init__(self, factories=None, probes=None):
+        self._factories = dict(DEFAULT_FACTORIES, **(factories or {}))
+        self._probes = dict(DEFAULT_PROBES, **(probes or {}))
+        self._clients = {}
+        self._status = {}
+        self._served = set()
+        # Stores whose background probe hasn't returned yet
+        self._probing = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def configure(self, name, factory, probe=None):
+        """Swap in another client factory (and probe) for a store, e.g. a local stand-in."""
+        with self._lock:
+            self._factories[name] = factory
+            if probe is not None:
+                self._probes[name] = probe
+            self._clients.pop(name, None)
+            self._status.pop(name, None)
+
+    def client(self, name):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._factories[name]()
+                    self._clients[name] = client
+        return client
+
+    def mongo_db(self):
+        return self.client("mongodb")[MONGO_DATABASE]
+
+    def neo4j_driver(self):
+        return self.client("neo4j")
+
+    # Health
+
+    def check(self, name):
+        started = time.monotonic()
+        try:
+            self._probes[name](self.client(name))
+            error = None
+        except Exception as e:
+            error = e
+        status = BackendStatus(name, error is None, error, time.time(), time.monotonic() - started)
+        self._status[name] = status
+        return status
+
+    def check_all(self):
+        return {name: self.check(name) for name in BACKENDS}
+
+    def serve_from_snapshot(self, names=BACKENDS):
+        """Mark stores whose reads come from the snapshot; they are never reported degraded."""
+        self._served.update(names)
+
+    def served(self, name):
+        return name in self._served
+
+    def report_failure(self, name, error):
+        """Mark a store degraded after a real query against it failed."""
+        self._status[name] = BackendStatus(name, False, error, time.time(), None)
+
+    def status(self, name):
+        return self._status.get(name)
+
+    def reachable(self, name):
+        """Whether the live server answers: False only once a probe or query has failed."""
+        status = self._status.get(name)
+        return status is None or status.available
+
+    def available(self, name):
+        """Whether the store's reads can be served, live or from the snapshot."""
+        return name in self._served or self.reachable(name)
+
+    def degraded(self):
+        return [name for name in BACKENDS if not self.available(name)]
+
+    def require(self, name):
+        if not self.available(name):
+            raise BackendUnavailable(f"{name} is unavailable: {self._status[name].error}")
+
+    def start_health_checks(self, interval=HEALTH_CHECK_SECONDS):
+        """Probe every store now and then every `interval` seconds, on a daemon thread."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._health_loop, args=(interval,),
+                                            name="backend-health", daemon=True)
+            self._thread.start()
+
+    def _health_loop(self, interval):
+        while not self._stop.is_set():
+            for name in BACKENDS:
+                if name in self._served and name not in self._clients:
+                    # Served from the snapshot and never connected to, so nothing to probe
+                    continue
+                with self._lock:
+                    if name in self._probing:
+                        # Still waiting on a hung server; don't pile another attempt on it
+                        continue
+                    self._probing.add(name)
+                # Each store on its own thread, so a hung server doesn't delay the others' status
+                threading.Thread(target=self._probe, args=(name,), daemon=True).start()
+            self._stop.wait(interval)
+
+    def _probe(self, name):
+        try:
+            self.check(name)
+        finally:
+            with self._lock:
+                self._probing.discard(name)
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            self._thread = None
+        for client in clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    """Process-wide backend manager."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = BackendManager()
+    return _manager
+
+
+class LazyDatabase:
+    """Stands in for the academicworld pymongo Database until first used."""
+
+    def __getitem__(self, name):
+        return get_manager().mongo_db()[name]
+
+    def __getattr__(self, attr):
+        return getattr(get_manager().mongo_db(), attr)
+
+
+class LazyCollection:
+    """Stands in for a pymongo Collection; connects on the first real call."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_manager().mongo_db()[self._name], attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
+
+
+class LazyDriver:
+    """Stands in for the Neo4j driver; connects on the first session."""
+
+    def __getattr__(self, attr):
+        return getattr(get_manager().neo4j_driver(), attr)
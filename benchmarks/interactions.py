@@ -0,0 +1,214 @@
+"""Database calls per page interaction, against the local stand-ins.
+
+Loads a synthetic dataset into the stand-ins like run.py, renders app.py
+through Streamlit's AppTest with the most linked keyword selected, then
+performs each interaction once and reports what it cost: the data-access
+calls recorded by the metrics counters, and the round trips the stand-ins
+actually served (SQL statements, MongoDB collection operations, Cypher
+queries), both per backend:
+
+    python -m benchmarks.interactions --scale 1000
+    python -m benchmarks.interactions --scale 1000 --out interactions.json
+
+AppTest reruns the whole script on every interaction, where the browser
+reruns only the fragment the widget is in, so interactions inside a
+fragment are sent as a rerun of that fragment.
+"""
+import argparse
+import contextlib
+import dataclasses
+import datetime
+import inspect
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import metrics  # noqa: E402
+from benchmarks import standins, synthetic  # noqa: E402
+from benchmarks.run import BENCH_EMAIL, Samples, _git_commit  # noqa: E402
+
+BACKENDS = ("mysql", "mongodb", "neo4j")
+MONGO_OPERATIONS = ("find", "find_one", "aggregate", "distinct", "count_documents", "insert_one",
+                    "insert_many", "update_one", "update_many", "delete_one", "bulk_write")
+
+
+class RoundTrips:
+    """Counts the queries the stand-ins answer, per backend."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def install(self):
+        import mongomock
+
+        self._count(standins.SQLiteCursor, "execute", "mysql")
+        self._count(standins.FakeSession, "run", "neo4j")
+        for name in MONGO_OPERATIONS:
+            self._count(mongomock.collection.Collection, name, "mongodb")
+
+    def _count(self, cls, name, backend):
+        method = getattr(cls, name)
+
+        def counted(*args, **kwargs):
+            # Section queries run on fan-out worker threads
+            with self._lock:
+                self.counts[backend] += 1
+            return method(*args, **kwargs)
+
+        setattr(cls, name, counted)
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+
+def _fragment_id(at, name):
+    for fragment_id, fragment in at._fragment_storage._fragments.items():
+        fn = inspect.getclosurevars(fragment).nonlocals.get("non_optional_func")
+        if fn is not None and fn.__name__ == name:
+            return fragment_id
+    return None
+
+
+@contextlib.contextmanager
+def fragment_rerun(at, name):
+    """Make the next at.run() rerun only fragment `name`, as the browser does."""
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    fragment_id = _fragment_id(at, name)
+    if fragment_id is None:
+        raise LookupError(f"app.py has no fragment {name!r}")
+    request_rerun = LocalScriptRunner.request_rerun
+
+    def fragment_request(runner, rerun_data):
+        # A new runner already holds a full-app rerun request, which would absorb this one
+        result = request_rerun(runner, rerun_data)
+        runner._requests._rerun_data = dataclasses.replace(
+            runner._requests._rerun_data, fragment_id_queue=[fragment_id], is_fragment_scoped_rerun=True)
+        LocalScriptRunner.request_rerun = request_rerun
+        return result
+
+    LocalScriptRunner.request_rerun = fragment_request
+    try:
+        yield
+    finally:
+        LocalScriptRunner.request_rerun = request_rerun
+
+
+def _button(at, key=None, label=None):
+    for button in at.button:
+        if key is not None and button.key and button.key.startswith(key):
+            return button
+        if label is not None and button.label == label:
+            return button
+    raise LookupError(f"no button {key or label!r} on the page")
+
+
+def interactions(samples, recenter_node):
+    """(label, fragment or None for a full rerun, action(at)) in the order they are performed."""
+    center_key = f"network_center_{samples.keyword}"
+
+    def recenter(at):
+        at.session_state[center_key] = recenter_node
+
+    return [
+        ("select keyword", None, lambda at: at.selectbox(key="chart_keyword").set_value(samples.keyword)),
+        ("view profile", "faculty_fragment", lambda at: _button(at, key="view_profile_").click()),
+        ("save favorite", "faculty_fragment", lambda at: _button(at, label=" Save to My Favorites").click()),
+        ("faculty next", "faculty_fragment", lambda at: _button(at, key="faculty_next").click()),
+        ("faculty previous", "faculty_fragment", lambda at: _button(at, key="faculty_prev").click()),
+        ("network hops 1 -> 2", "network_fragment", lambda at: at.selectbox(key="network_depth").set_value(2)),
+        # A click on the graph component can't be sent from AppTest; set the state it would
+        ("network recenter", "network_fragment", recenter),
+        ("network back to keyword", "network_fragment", lambda at: _button(at, key="network_back").click()),
+        ("save interest", None, lambda at: _button(at, label=" Save Interest to My Profile").click()),
+    ]
+
+
+def measure(samples, recenter_node, trips):
+    """{interaction: {"calls": {backend: n}, "round_trips": {backend: n}, "rerun": ...}}"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(REPO_ROOT, "app.py"), default_timeout=300)
+    at.session_state["user"] = {"name": "Bench User", "email": BENCH_EMAIL}
+    at.run()
+
+    results = {}
+    for label, fragment, action in interactions(samples, recenter_node):
+        # A full run first, so the element tree has every widget and nothing is pending
+        at.run()
+        metrics.reset()
+        trips.reset()
+        action(at)
+        with fragment_rerun(at, fragment) if fragment else contextlib.nullcontext():
+            at.run()
+        if at.exception:
+            raise RuntimeError(f"{label}: {at.exception[0].message}")
+        backends = metrics.snapshot()["backends"]
+        result = {
+            "rerun": fragment or "app",
+            "calls": {backend: backends.get(backend, {}).get("calls", 0) for backend in BACKENDS},
+            "round_trips": {backend: trips.counts[backend] for backend in BACKENDS},
+        }
+        results[label] = result
+        print(f"  {label:26} {result['rerun']:17} calls {sum(result['calls'].values()):3d} "
+              f"({_per_backend(result['calls'])})  round trips {sum(result['round_trips'].values()):3d} "
+              f"({_per_backend(result['round_trips'])})")
+    return results
+
+
+def _per_backend(counts):
+    return ", ".join(f"{backend} {counts[backend]}" for backend in BACKENDS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1000, help="number of synthetic faculty")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    print(f"Generating academicworld data for {args.scale} faculty...")
+    data = synthetic.generate(args.scale, seed=args.seed)
+    with tempfile.TemporaryDirectory(prefix="aw-interactions-") as workdir:
+        stores = standins.install(data, workdir)
+        # Rank tables and top publications are normally built by the cron job
+        import keyword_rankings
+        import top_publications
+        keyword_rankings.rebuild_all()
+        top_publications.rebuild_all()
+        samples = Samples(data, stores)
+        recenter_node = next(n for n in stores.graph.nodes("KEYWORD") if n != samples.keyword_node)
+
+        trips = RoundTrips()
+        trips.install()
+        print("Database calls per interaction:")
+        results = measure(samples, recenter_node, trips)
+
+    if args.out:
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "scale": args.scale,
+                "seed": args.seed,
+            },
+            "results": results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
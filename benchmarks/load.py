@@ -0,0 +1,222 @@
+"""Load test for the JSON API (api.py) against the local stand-ins.
+
+Loads a synthetic dataset into the stand-ins like run.py, then drives
+api.app in-process at increasing numbers of concurrent clients, calling
+it directly through ASGI so the numbers measure the app rather than a
+socket. Each client repeats a mix of the API's endpoints over the most
+linked keywords and most published faculty, and revalidates a share of
+the responses it has already seen with If-None-Match:
+
+    python -m benchmarks.load --scale 1000
+    python -m benchmarks.load --scale 1000 --concurrency 1 64 512 --requests 5000
+    python -m benchmarks.load --scale 1000 --snapshot
+    python -m benchmarks.load --scale 1000 --serve --port 8000   # for wrk, hey or curl
+
+The first level also builds the shared structures (registries, trend
+cube, graphs) and fills the query cache, so it is reported but is not
+comparable with the rest.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import urllib.parse
+from collections import Counter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import snapshot  # noqa: E402
+from benchmarks import standins, synthetic  # noqa: E402
+from benchmarks.run import Samples, _git_commit  # noqa: E402
+
+DEFAULT_CONCURRENCY = (1, 16, 64, 256)
+# Keywords and faculty the request mix is spread over
+MIX_KEYWORDS = 20
+MIX_FACULTY = 10
+
+
+def request_mix(data, samples, rng):
+    """Every path the clients request, weighted by repetition."""
+    links = Counter(kid for _, kid, _ in data.faculty_keyword)
+    names = dict(data.keywords)
+    keywords = [urllib.parse.quote(names[kid], safe="") for kid, _ in links.most_common(MIX_KEYWORDS)]
+    faculty = samples.faculty_ids[:MIX_FACULTY]
+
+    paths = ["/universities", "/keywords", "/keywords/rising"]
+    for keyword in keywords:
+        paths += [f"/keywords/{keyword}/faculty"] * 4
+        paths += [f"/keywords/{keyword}/rankings"] * 3
+        paths += [f"/keywords/{keyword}/trend"] * 3
+        paths += [
+            f"/keywords/{keyword}/faculty?weighted=1",
+            f"/keywords/{keyword}/related",
+            f"/keywords/{keyword}/network",
+            f"/keywords?q={keyword[:4]}",
+        ]
+    for fid in faculty:
+        paths += [f"/faculty/{fid}"] * 2
+        paths += [f"/faculty/{fid}/publications", f"/faculty/{fid}/paths/{rng.choice(faculty)}"]
+    return paths
+
+
+async def get(app, path, headers=()):
+    """(status, headers, body) for one GET sent straight to an ASGI app."""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": urllib.parse.unquote(path),
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), *headers],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], dict(start["headers"]), body
+
+
+async def run_level(app, paths, concurrency, requests, revalidate, rng):
+    """Send `requests` requests from `concurrency` clients; per-request latencies and statuses."""
+    latencies = []
+    statuses = Counter()
+    remaining = [requests]
+
+    async def client():
+        etags = {}
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            path = rng.choice(paths)
+            headers = []
+            if path in etags and rng.random() < revalidate:
+                headers.append((b"if-none-match", etags[path]))
+            started = time.perf_counter()
+            status, response_headers, _ = await get(app, path, headers)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+            if b"etag" in response_headers:
+                etags[path] = response_headers[b"etag"]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies, statuses
+
+
+def _quantile(values, q):
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q * 100) - 1] if len(values) > 1 else values[0]
+
+
+async def load_test(levels, requests, revalidate, seed, paths):
+    import api
+
+    rng = random.Random(seed)
+    results = {}
+    async with api.lifespan(api.app):
+        for concurrency in levels:
+            before = api.runner().stats()
+            elapsed, latencies, statuses = await run_level(api.app, paths, concurrency, requests, revalidate, rng)
+            after = api.runner().stats()
+            result = {
+                "requests": len(latencies),
+                "seconds": elapsed,
+                "rate": len(latencies) / elapsed,
+                "p50": _quantile(latencies, 0.50),
+                "p95": _quantile(latencies, 0.95),
+                "p99": _quantile(latencies, 0.99),
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+                "coalesced": after["hits"] - before["hits"],
+            }
+            results[str(concurrency)] = result
+            print(f"  {concurrency:5d} clients  {result['rate']:9.0f} req/s  "
+                  f"p50 {result['p50'] * 1000:7.2f}ms  p95 {result['p95'] * 1000:7.2f}ms  "
+                  f"p99 {result['p99'] * 1000:7.2f}ms  coalesced {result['coalesced']:5d}  "
+                  f"{dict(statuses)}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1000, help="number of synthetic faculty")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY,
+                        help="concurrent clients per level")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per level")
+    parser.add_argument("--revalidate", type=float, default=0.5,
+                        help="share of repeated requests sent with If-None-Match")
+    parser.add_argument("--snapshot", action="store_true", help="serve catalog reads from an exported snapshot")
+    parser.add_argument("--serve", action="store_true", help="serve the API over HTTP instead of load-testing it")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    print(f"Generating academicworld data for {args.scale} faculty...")
+    data = synthetic.generate(args.scale, seed=args.seed)
+    with tempfile.TemporaryDirectory(prefix="aw-load-") as workdir:
+        stores = standins.install(data, workdir)
+        # Rank tables and top publications are normally built by the cron job
+        import keyword_rankings
+        import top_publications
+        keyword_rankings.rebuild_all()
+        top_publications.rebuild_all()
+        if args.snapshot:
+            snapshot.export(os.path.join(workdir, "snapshot"))
+            snapshot.use(os.path.join(workdir, "snapshot"))
+        samples = Samples(data, stores)
+
+        if args.serve:
+            import uvicorn
+
+            import api
+            print(f"Serving on http://{args.host}:{args.port}/ (e.g. /keywords/"
+                  f"{urllib.parse.quote(samples.keyword, safe='')}/faculty, /faculty/{samples.faculty_id})")
+            uvicorn.run(api.app, host=args.host, port=args.port, log_level="warning")
+            return 0
+
+        paths = request_mix(data, samples, random.Random(args.seed))
+        print(f"Load-testing {len(set(paths))} distinct paths, {args.requests} requests per level:")
+        results = asyncio.run(load_test(args.concurrency, args.requests, args.revalidate, args.seed, paths))
+
+    if args.out:
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "scale": args.scale,
+                "seed": args.seed,
+                "snapshot": args.snapshot,
+                "revalidate": args.revalidate,
+            },
+            "results": results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""Offline benchmarks for the data-access modules and the page render.
+
+Generates a synthetic academicworld dataset, loads it into the local
+stand-ins (see standins.py), then times every public function in
+mysql_utils, mongodb_utils and neo4j_utils and a full render of app.py
+through Streamlit's AppTest. Results are written as JSON so runs on
+different commits can be compared:
+
+    python -m benchmarks.run --scale 1000 --out benchmarks/baselines/main.json
+    python -m benchmarks.run --scale 1000 --compare benchmarks/baselines/main.json
+    python -m benchmarks.run --scale 1000 --snapshot   # served from an exported snapshot
+    python -m benchmarks.run --scale 1000 --photos --photo-delay 0.2   # with a local photo host
+
+Absolute numbers reflect the stand-ins, not the real servers; they are
+meant for comparing commits on the same machine.
+"""
+import argparse
+import datetime
+import importlib
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import snapshot  # noqa: E402
+from benchmarks import standins, synthetic  # noqa: E402
+
+MODULES = ("mysql_utils", "mongodb_utils", "neo4j_utils")
+BENCH_EMAIL = "bench.user@example.org"
+# A case whose median grows by more than this factor counts as a regression
+DEFAULT_THRESHOLD = 1.25
+# ...and by more than this many seconds, so sub-millisecond jitter isn't reported
+MIN_DELTA = 0.001
+
+
+class Samples:
+    """Values picked out of the dataset to call functions with."""
+
+    def __init__(self, data, stores):
+        links = Counter(kid for _, kid, _ in data.faculty_keyword)
+        keyword_names = dict(data.keywords)
+        self.keyword_id = links.most_common(1)[0][0]
+        self.keyword = keyword_names[self.keyword_id]
+        self.rare_keyword_id = min(links, key=lambda kid: (links[kid], kid))
+        # Snapshots use MySQL ids as node ids
+        self.keyword_node = self.keyword_id if snapshot.active() else next(
+            n for n in stores.graph.nodes("KEYWORD") if stores.graph.props[n]["id"] == self.keyword_id)
+
+        pubs = Counter(fid for fid, _ in data.faculty_publication)
+        self.faculty_id = pubs.most_common(1)[0][0]
+        self.faculty_name = next(name for fid, name, *_ in data.faculty if fid == self.faculty_id)
+        self.faculty_ids = [fid for fid, _ in pubs.most_common(10)]
+        self.publication_ids = [pid for fid, pid in data.faculty_publication if fid == self.faculty_id]
+        self.university = data.universities[0][1]
+        self.start_year = datetime.date.today().year - 15
+
+
+def cases(s):
+    """{qualified function name: [(case label, args)]} for every benchmarked call."""
+    user = {"email": BENCH_EMAIL}
+    return {
+        "mysql_utils.get_all_universities": [("", ())],
+        "mysql_utils.get_faculty_by_keywords": [("", ([s.keyword],))],
+        "mysql_utils.get_all_keywords": [("", ())],
+        "mysql_utils.get_keyword_ids": [("", ())],
+        "mysql_utils.get_faculty_by_keyword_ids": [("", ([s.keyword_id],))],
+        "mysql_utils.search_faculty_by_keyword_ids": [
+            ("popular", ([s.keyword_id],)),
+            ("weighted", ([s.keyword_id], True)),
+            ("rare", ([s.rare_keyword_id],)),
+        ],
+        "mysql_utils.get_faculty_ids": [("", ())],
+        "mysql_utils.get_faculty_keyword_pairs": [("", ())],
+        "mysql_utils.get_faculty_keyword_scores": [("all", ()), ("some", (s.faculty_ids,))],
+        "mysql_utils.get_keyword_table_signature": [("", ())],
+        "mysql_utils.get_university_pub_counts_by_keyword": [("", (s.keyword, 10))],
+        "mysql_utils.get_university_pub_counts_by_keyword_id": [("", (s.keyword_id, 10))],
+        "mysql_utils.get_university_rankings": [("top10", (s.keyword_id, 10)), ("top50", (s.keyword_id, 50))],
+
+        "mongodb_utils.ensure_indexes": [("", ())],
+        "mongodb_utils.get_all_universities": [("", ())],
+        "mongodb_utils.get_faculty_by_university": [("", (s.university,))],
+        "mongodb_utils.get_all_faculty_names": [("", ())],
+        "mongodb_utils.get_faculty_by_name": [("", (s.faculty_name,))],
+        "mongodb_utils.get_faculty_by_id": [("", (s.faculty_id,))],
+        "mongodb_utils.get_faculty_by_ids": [("", (s.faculty_ids,))],
+        "mongodb_utils.get_faculty_profiles_by_ids": [("", (s.faculty_ids,))],
+        "mongodb_utils.get_faculty_ids": [("", ())],
+        "mongodb_utils.get_publications_by_ids": [("", (s.publication_ids, 5))],
+        "mongodb_utils.get_publication_counts_by_keyword": [("", (s.keyword, s.start_year))],
+        "mongodb_utils.get_all_publication_keywords": [("", ())],
+        "mongodb_utils.get_keyword_year_counts": [("", ())],
+        "mongodb_utils.create_or_update_user_profile": [("", (BENCH_EMAIL, "Bench", "User"))],
+        "mongodb_utils.get_user_profile": [("", (BENCH_EMAIL,))],
+        "mongodb_utils.save_user_interests": [("", (user, [s.keyword]))],
+        "mongodb_utils.get_user_interests": [("", (user,))],
+        "mongodb_utils.add_user_interest": [("", (user, s.keyword))],
+        "mongodb_utils.remove_user_interest": [("", (user, s.keyword))],
+        "mongodb_utils.save_to_favorites": [("", (BENCH_EMAIL, s.faculty_id))],
+        "mongodb_utils.get_favorites": [("", (BENCH_EMAIL,))],
+        "mongodb_utils.remove_from_favorites": [("", (BENCH_EMAIL, s.faculty_id))],
+        "mongodb_utils.clear_favorites": [("", (BENCH_EMAIL,))],
+        "mongodb_utils.get_user_stats": [("", (BENCH_EMAIL,))],
+        "mongodb_utils.save_user_profile": [("", (user, "Bench", "User", BENCH_EMAIL))],
+        "mongodb_utils.add_favorite_to_profile": [("", (user, s.faculty_id))],
+        "mongodb_utils.remove_favorite_from_profile": [("", (user, s.faculty_id))],
+        # Last, since it deletes the profile the others write to
+        "mongodb_utils.clear_user_profile": [("", (BENCH_EMAIL,))],
+
+        "neo4j_utils.get_keyword_faculty_network": [("", (s.keyword,))],
+        "neo4j_utils.get_keyword_faculty_network_by_id": [("", (s.keyword_node,))],
+        "neo4j_utils.get_keyword_node_ids": [("", ())],
+        "neo4j_utils.get_faculty_node_ids": [("", ())],
+        "neo4j_utils.get_faculty_keyword_node_pairs": [("", ())],
+        "neo4j_utils.get_all_neo4j_keywords": [("", ())],
+        "neo4j_utils.get_keyword_ego_network": [
+            ("1hop", (s.keyword_node, 1, 20, 1)),
+            ("2hop", (s.keyword_node, 2, 20, 2)),
+        ],
+    }
+
+
+# Functions that aren't queries, so have nothing to time
+NOT_BENCHMARKED = {
+    "neo4j_utils.ego_network_cache_info",
+    "neo4j_utils.clear_ego_network_cache",
+}
+
+
+def public_functions(module):
+    return sorted(
+        f"{module.__name__}.{name}"
+        for name, fn in inspect.getmembers(module, callable)
+        if not name.startswith("_") and getattr(fn, "__module__", None) == module.__name__
+        and not inspect.isclass(fn)
+    )
+
+
+def _size(result):
+    if hasattr(result, "node_ids"):
+        return len(result.node_ids)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    try:
+        return len(result)
+    except TypeError:
+        return 1
+
+
+def time_call(fn, args, repeat):
+    # Cached functions (lru_cache or query_cache) are timed underneath the cache, i.e. as misses;
+    # functions served from a snapshot never reach their cache, so they are timed as they are
+    while hasattr(fn, "cache_info") and not (snapshot.active() and hasattr(fn, "from_snapshot")):
+        fn = fn.__wrapped__
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - started)
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "repeat": repeat,
+        "size": _size(result),
+    }
+
+
+def run_functions(samples, repeat):
+    table = cases(samples)
+    results = {}
+    missing = []
+    for module_name in MODULES:
+        module = importlib.import_module(module_name)
+        for qualified in public_functions(module):
+            if qualified not in table and qualified not in NOT_BENCHMARKED:
+                missing.append(qualified)
+    for qualified, calls in table.items():
+        module_name, name = qualified.split(".")
+        fn = getattr(importlib.import_module(module_name), name, None)
+        for label, args in calls:
+            key = f"{qualified}[{label}]" if label else qualified
+            if fn is None:
+                results[key] = {"error": "function not found"}
+                continue
+            try:
+                results[key] = time_call(fn, args, repeat)
+            except Exception as e:
+                results[key] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"  {key:70} {_format(results[key])}")
+    return results, missing
+
+
+def run_page(samples, repeat):
+    """Time app.py: the login form, the first render after login, and a selected keyword."""
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    app_path = os.path.join(REPO_ROOT, "app.py")
+    for label, logged_in, keyword in (("login_form", False, None), ("login", True, None),
+                                      ("keyword", True, samples.keyword)):
+        times = []
+        error = None
+        for _ in range(repeat):
+            at = AppTest.from_file(app_path, default_timeout=120)
+            if logged_in:
+                at.session_state["user"] = {"name": "Bench User", "email": BENCH_EMAIL}
+            started = time.perf_counter()
+            at.run()
+            if keyword is not None:
+                at.selectbox(key="chart_keyword").set_value(keyword).run()
+            times.append(time.perf_counter() - started)
+            if at.exception:
+                error = at.exception[0].message
+        key = f"app.render[{label}]"
+        if error:
+            results[key] = {"error": error}
+        else:
+            # The first run includes building cache_resource data; later runs reuse it
+            results[key] = {
+                "first": times[0],
+                "median": statistics.median(times[1:] or times),
+                "min": min(times),
+                "max": max(times),
+                "repeat": repeat,
+            }
+        print(f"  {key:70} {_format(results[key])}")
+    return results
+
+
+def _format(result):
+    if "error" in result:
+        return f"ERROR {result['error'][:60]}"
+    return f"{result['median'] * 1000:9.2f} ms"
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline, threshold, min_delta=MIN_DELTA):
+    """Print cases slower than baseline by more than `threshold`x; return how many."""
+    regressions = 0
+    for key, result in sorted(current["results"].items()):
+        before = baseline["results"].get(key)
+        if not before or "median" not in before or "median" not in result:
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else float("inf")
+        marker = ""
+        if ratio > threshold and result["median"] - before["median"] > min_delta:
+            regressions += 1
+            marker = "  <-- slower"
+        elif ratio < 1 / threshold:
+            marker = "  (faster)"
+        print(f"  {key:70} {before['median'] * 1000:9.2f} -> {result['median'] * 1000:9.2f} ms "
+              f"({ratio:5.2f}x){marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1000, help="number of synthetic faculty")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per function")
+    parser.add_argument("--page-repeat", type=int, default=3, help="timed page renders")
+    parser.add_argument("--skip-page", action="store_true", help="only time the *_utils functions")
+    parser.add_argument("--photos", action="store_true",
+                        help="serve faculty photos and logos from a local HTTP stand-in instead of refusing them")
+    parser.add_argument("--photo-delay", type=float, default=0.0, help="seconds the photo stand-in waits per image")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="export the stand-ins to a snapshot and time reads served from it")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    photos = standins.PhotoServer(delay=args.photo_delay).start() if args.photos else None
+    print(f"Generating academicworld data for {args.scale} faculty...")
+    data = synthetic.generate(args.scale, seed=args.seed,
+                              photo_host=photos.url if photos else synthetic.PHOTO_HOST)
+    with tempfile.TemporaryDirectory(prefix="aw-bench-") as workdir:
+        stores = standins.install(data, workdir)
+        # Every run starts with an empty thumbnail cache of its own
+        import thumbnails
+        thumbnails.THUMBNAIL_DIR = os.path.join(workdir, "thumbnails")
+        # Rank tables are normally built by the cron job
+        import keyword_rankings
+        keyword_rankings.rebuild_all()
+        if args.snapshot:
+            started = time.perf_counter()
+            snapshot.export(os.path.join(workdir, "snapshot"))
+            snapshot.use(os.path.join(workdir, "snapshot"))
+            print(f"Exported snapshot in {time.perf_counter() - started:.2f}s")
+        samples = Samples(data, stores)
+
+        print("Timing data-access functions:")
+        results, missing = run_functions(samples, args.repeat)
+        if not args.skip_page:
+            print("Timing page render:")
+            results.update(run_page(samples, args.page_repeat))
+        if photos:
+            photos.close()
+            print(f"Photo stand-in served {photos.requests} requests")
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "seed": args.seed,
+            "snapshot": args.snapshot,
+            "photo_delay": args.photo_delay if args.photos else None,
+            "rows": {field: len(getattr(data, field)) for field in data._fields},
+        },
+        "results": results,
+        "not_covered": missing,
+    }
+    if missing:
+        print("No benchmark case for: " + ", ".join(missing))
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} (commit {baseline['meta'].get('commit')}):")
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{regressions} case(s) slower than {args.threshold}x the baseline")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""Local stand-ins for the three academicworld servers.
+
+- MySQL: a sqlite3 database behind the real mysql_pool.ConnectionPool.
+  Queries are passed through with %s placeholders rewritten to ?, LN() and
+  NOW() registered, and sqlite errors raised as mysql.connector errors so
+  the ER_NO_SUCH_TABLE fallbacks behave as they do against MySQL.
+- MongoDB: a mongomock client, whose bulk writes accept the `sort`
+  argument newer pymongo versions pass with every replace and update.
+- Neo4j: an in-memory FakeGraph whose sessions answer each Cypher query
+  the app sends with an equivalent Python traversal.
+- Photo hosts: PhotoServer, a local HTTP server with generated faculty
+  photos and university logos, some of them missing.
+
+install() registers them with the backend manager, so the app's lazy
+clients connect to them instead of the real servers.
+"""
+import datetime
+import io
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from benchmarks import synthetic
+
+StandIns = namedtuple("StandIns", ["sqlite_path", "mongo", "graph"])
+
+
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _run(self, method, sql, params):
+        try:
+            return method(sql.replace("%s", "?"), params)
+        except sqlite3.OperationalError as e:
+            if "no such table" in str(e):
+                raise mysql.connector.ProgrammingError(msg=str(e), errno=errorcode.ER_NO_SUCH_TABLE)
+            raise mysql.connector.DatabaseError(msg=str(e))
+        except sqlite3.Error as e:
+            raise mysql.connector.DatabaseError(msg=str(e))
+
+    def execute(self, sql, params=()):
+        self._run(self._cursor.execute, sql, tuple(params or ()))
+
+    def executemany(self, sql, rows):
+        self._run(self._cursor.executemany, sql, [tuple(row) for row in rows])
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """The part of a mysql.connector connection the app and the pool use."""
+
+    def __init__(self, path):
+        # Autocommit like the pool's MySQL config; start_transaction() opens one explicitly
+        self._cnx = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._cnx.create_function("LN", 1, math.log, deterministic=True)
+        self._cnx.create_function("NOW", 0, lambda: datetime.datetime.now().isoformat(sep=" "))
+
+    def cursor(self, **kwargs):
+        return SQLiteCursor(self._cnx.cursor())
+
+    def start_transaction(self):
+        self._cnx.execute("BEGIN")
+
+    def commit(self):
+        if self._cnx.in_transaction:
+            self._cnx.execute("COMMIT")
+
+    def rollback(self):
+        if self._cnx.in_transaction:
+            self._cnx.execute("ROLLBACK")
+
+    def is_connected(self):
+        return True
+
+    def reconnect(self, attempts=1, delay=0):
+        pass
+
+    def close(self):
+        self._cnx.close()
+
+
+class FakeResult(list):
+    """Records as dicts, with the neo4j Result helpers the app might call."""
+
+    def single(self):
+        return self[0] if self else None
+
+    def data(self):
+        return [dict(row) for row in self]
+
+
+class FakeGraph:
+    """Labelled nodes with properties and typed, directed relationships."""
+
+    def __init__(self):
+        self.labels = []
+        self.props = []
+        self.out = []
+        self.faculty_by_id = {}
+
+    def add_node(self, label, **props):
+        self.labels.append(label)
+        self.props.append(props)
+        self.out.append([])
+        return len(self.labels) - 1
+
+    def add_edge(self, src, rel_type, dst, **props):
+        self.out[src].append((rel_type, dst, props))
+
+    def nodes(self, label):
+        return [n for n, node_label in enumerate(self.labels) if node_label == label]
+
+    def interested_in(self):
+        """{keyword node: [(faculty node, score)]}, built once on first use."""
+        if not hasattr(self, "_interested"):
+            self._interested = {}
+            for node in self.nodes("FACULTY"):
+                for rel_type, dst, props in self.out[node]:
+                    if rel_type == "INTERESTED_IN":
+                        self._interested.setdefault(dst, []).append((node, props.get("score", 0)))
+        return self._interested
+
+    def name(self, node):
+        return self.props[node].get("name")
+
+    def keywords_of(self, faculty):
+        return [dst for rel_type, dst, _ in self.out[faculty] if rel_type == "INTERESTED_IN"]
+
+
+def _network_rows(graph, keyword_nodes):
+    rows = []
+    for k in keyword_nodes:
+        for f, _ in graph.interested_in().get(k, []):
+            others = []
+            for other in graph.keywords_of(f):
+                if other != k and graph.name(other) not in others:
+                    others.append(graph.name(other))
+            rows.append({"faculty": graph.name(f), "keyword": graph.name(k), "co_keywords": others})
+    return rows[:20]
+
+
+def _network_by_name(graph, kw):
+    return _network_rows(graph, [k for k in graph.nodes("KEYWORD") if (graph.name(k) or "").lower() == kw.lower()])
+
+
+def _network_by_id(graph, node_id):
+    return _network_rows(graph, [node_id] if 0 <= node_id < len(graph.labels) else [])
+
+
+def _ego_hop(graph, frontier, faculty_limit):
+    rows = []
+    for k in frontier:
+        faculty = sorted(graph.interested_in().get(k, []), key=lambda fs: (-fs[1], fs[0]))[:faculty_limit]
+        for f, _ in faculty:
+            for other in graph.keywords_of(f):
+                if other != k:
+                    rows.append({
+                        "source": k, "source_name": graph.name(k),
+                        "faculty_id": f, "faculty": graph.name(f),
+                        "other_id": other, "other": graph.name(other),
+                    })
+    return rows
+
+
+def _keyword_node_ids(graph):
+    return [{"node_id": k, "keyword": graph.name(k)} for k in graph.nodes("KEYWORD")]
+
+
+def _faculty_node_ids(graph):
+    rows = []
+    for f in graph.nodes("FACULTY"):
+        institutes = [graph.name(dst) for rel_type, dst, _ in graph.out[f] if rel_type == "AFFILIATION_WITH"]
+        rows.append({"node_id": f, "faculty": graph.name(f), "institute": institutes[0] if institutes else None})
+    return rows
+
+
+def _interest_pairs(graph):
+    return [{"faculty_id": f, "keyword_id": k} for k, faculty in graph.interested_in().items() for f, _ in faculty]
+
+
+def _interested_keywords(graph):
+    return [{"keyword": name} for name in sorted({graph.name(k) for k in graph.interested_in()})]
+
+
+# (fragment that identifies the query, handler(graph, **params)); first match wins
+QUERY_HANDLERS = [
+    ("UNWIND $frontier", lambda g, frontier, faculty_limit: _ego_hop(g, frontier, faculty_limit)),
+    ("toLower(k.name) = toLower($kw)", lambda g, kw: _network_by_name(g, kw)),
+    ("id(k) = $node_id", lambda g, node_id: _network_by_id(g, node_id)),
+    ("RETURN id(k) AS node_id", lambda g: _keyword_node_ids(g)),
+    ("AFFILIATION_WITH", lambda g: _faculty_node_ids(g)),
+    ("RETURN DISTINCT k.name AS keyword", lambda g: _interested_keywords(g)),
+    ("RETURN id(f) AS faculty_id, id(k) AS keyword_id", lambda g: _interest_pairs(g)),
+    ("RETURN 1", lambda g: [{"1": 1}]),
+]
+
+
+class FakeSession:
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, parameters=None, **params):
+        params = {**(parameters or {}), **params}
+        for fragment, handler in QUERY_HANDLERS:
+            if fragment in query:
+                return FakeResult(handler(self._graph, **params))
+        raise NotImplementedError(f"FakeGraph has no handler for query:\n{query}")
+
+    def close(self):
+        pass
+
+
+class FakeGraphDriver:
+    def __init__(self, graph):
+        self._graph = graph
+
+    def session(self, **kwargs):
+        return FakeSession(self._graph)
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PhotoServer:
+    """Serves /photos/<id>.jpg (400x500 JPEG) and /logos/<id>.png (300x150 PNG with alpha).
+
+    Every `missing_every`-th id is a 404, and each response waits `delay`
+    seconds first, like a slow third-party host. `requests` counts hits.
+    """
+
+    def __init__(self, delay=0.0, missing_every=7):
+        self.delay = delay
+        self.missing_every = missing_every
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.delay)
+                body, content_type = server.image(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def image(self, path):
+        from PIL import Image
+
+        match = re.fullmatch(r"/(photos|logos)/(\d+)\.(jpg|png)", path)
+        if match is None or int(match.group(2)) % self.missing_every == 0:
+            return None, None
+        kind, n = match.group(1), int(match.group(2))
+        color = (n * 37 % 256, n * 91 % 256, n * 53 % 256)
+        out = io.BytesIO()
+        if kind == "photos":
+            Image.new("RGB", (400, 500), color).save(out, format="JPEG")
+            return out.getvalue(), "image/jpeg"
+        Image.new("RGBA", (300, 150), color + (200,)).save(out, format="PNG")
+        return out.getvalue(), "image/png"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def _accept_bulk_sort():
+    """Drop the `sort` pymongo passes to mongomock's bulk builder, which doesn't take it."""
+    from mongomock.collection import BulkOperationBuilder
+
+    for name in ("add_replace", "add_update"):
+        method = getattr(BulkOperationBuilder, name)
+        if getattr(method, "drops_sort", False):
+            continue
+
+        def without_sort(self, *args, _method=method, sort=None, **kwargs):
+            return _method(self, *args, **kwargs)
+        without_sort.drops_sort = True
+        setattr(BulkOperationBuilder, name, without_sort)
+
+
+def install(data, workdir):
+    """Load `data` into the stand-ins and point the app's clients at them."""
+    import mongomock
+
+    import mysql_pool
+    from backends import get_manager
+
+    sqlite_path = os.path.join(workdir, "academicworld.sqlite")
+    cnx = sqlite3.connect(sqlite_path)
+    synthetic.load_sqlite(data, cnx)
+    cnx.close()
+    pool = mysql_pool.ConnectionPool(connect=lambda **config: SQLiteConnection(sqlite_path))
+    # mysql_utils asks mysql_pool for its pool directly
+    mysql_pool._pool = pool
+
+    _accept_bulk_sort()
+    mongo = mongomock.MongoClient()
+    synthetic.load_mongo(data, mongo["academicworld"])
+
+    graph = FakeGraph()
+    synthetic.load_graph(data, graph)
+    driver = FakeGraphDriver(graph)
+
+    manager = get_manager()
+    manager.configure("mysql", lambda: pool)
+    manager.configure("mongodb", lambda: mongo)
+    manager.configure("neo4j", lambda: driver)
+    return StandIns(sqlite_path, mongo, graph)
@@ -0,0 +1,180 @@
+"""Synthetic academicworld data, shaped like the real MySQL, MongoDB and Neo4j copies.
+
+generate(n_faculty) builds one consistent dataset in memory: the same
+universities, faculty, keywords and publications, with the same ids and
+names, are then loaded into each stand-in store by the load_* functions.
+Keyword popularity and publication counts are skewed (a few keywords and
+faculty account for most links), as in the real data, so "popular keyword"
+benchmarks hit large result sets.
+"""
+import datetime
+import random
+from collections import namedtuple
+
+Dataset = namedtuple("Dataset", [
+    "universities",   # [(id, name, photo_url)]
+    "faculty",        # [(id, name, position, email, photo_url, university_id)]
+    "keywords",       # [(id, name)]
+    "publications",   # [(id, title, venue, year, num_citations)]
+    "faculty_keyword",      # [(faculty_id, keyword_id, score)]
+    "faculty_publication",  # [(faculty_id, publication_id)]
+    "publication_keyword",  # [(publication_id, keyword_id, score)]
+])
+
+# Refused immediately, so photo loading takes its fallback path without touching the network
+PHOTO_HOST = "http://127.0.0.1:9"
+POSITIONS = ("Professor", "Associate Professor", "Assistant Professor", "Lecturer")
+VENUES = ("KDD", "SIGMOD", "VLDB", "ICML", "NeurIPS", "CHI", "ICSE", "WWW", "ACL", "CVPR")
+WORDS = (
+    "learning", "data", "graph", "network", "systems", "query", "neural", "language",
+    "vision", "security", "privacy", "optimization", "distributed", "database", "mining",
+    "retrieval", "robotics", "quantum", "compiler", "verification", "analytics", "stream",
+    "cloud", "energy", "signal", "wireless", "biology", "health", "social", "economics",
+)
+
+
+def _keyword_names(n, rng):
+    names = set()
+    while len(names) < n:
+        name = " ".join(rng.sample(WORDS, rng.choice((1, 2, 2, 3))))
+        if name in names:
+            # Once the short combinations run out, numbered variants keep names unique
+            name = f"{name} {len(names)}"
+        names.add(name)
+    return sorted(names)
+
+
+def _skewed(rng, n, exponent=1.2):
+    """Index in [0, n) with a Zipf-like bias towards small indices."""
+    return min(n - 1, int(n * rng.random() ** (exponent * 2)))
+
+
+def generate(n_faculty=1000, seed=0, photo_host=PHOTO_HOST):
+    """Build a dataset with n_faculty faculty and proportional everything else.
+
+    Photo and logo URLs point at photo_host (see standins.PhotoServer).
+    """
+    rng = random.Random(seed)
+    n_universities = max(5, n_faculty // 25)
+    n_keywords = max(60, n_faculty // 2)
+    n_publications = n_faculty * 8
+    this_year = datetime.date.today().year
+
+    universities = [
+        (i, f"University {i}", f"{photo_host}/logos/{i}.png")
+        for i in range(1, n_universities + 1)
+    ]
+    faculty = [
+        (i, f"Faculty Member {i}", rng.choice(POSITIONS), f"faculty{i}@example.org",
+         f"{photo_host}/photos/{i}.jpg", rng.randint(1, n_universities))
+        for i in range(1, n_faculty + 1)
+    ]
+    keywords = list(enumerate(_keyword_names(n_keywords, rng), start=1))
+
+    faculty_keyword = []
+    for fid, *_ in faculty:
+        chosen = {_skewed(rng, n_keywords) + 1 for _ in range(rng.randint(3, 12))}
+        faculty_keyword.extend((fid, kid, round(rng.random(), 4)) for kid in sorted(chosen))
+
+    publications = []
+    faculty_publication = set()
+    publication_keyword = []
+    for pid in range(1, n_publications + 1):
+        year = this_year - _skewed(rng, 35, exponent=0.6)
+        publications.append((pid, f"Publication {pid}", rng.choice(VENUES), year,
+                             int(rng.paretovariate(1.3)) - 1))
+        for _ in range(rng.randint(1, 3)):
+            faculty_publication.add((_skewed(rng, n_faculty, exponent=0.8) + 1, pid))
+        chosen = {_skewed(rng, n_keywords) + 1 for _ in range(rng.randint(1, 5))}
+        publication_keyword.extend((pid, kid, round(rng.random(), 4)) for kid in sorted(chosen))
+
+    return Dataset(universities, faculty, keywords, publications, faculty_keyword,
+                   sorted(faculty_publication), publication_keyword)
+
+
+MYSQL_SCHEMA = """
+CREATE TABLE university (id INTEGER PRIMARY KEY, name TEXT COLLATE NOCASE, photo_url TEXT);
+CREATE TABLE faculty (
+    id INTEGER PRIMARY KEY, name TEXT COLLATE NOCASE, position TEXT, research_interest TEXT,
+    email TEXT, phone TEXT, photo_url TEXT, university_id INTEGER
+);
+CREATE TABLE keyword (id INTEGER PRIMARY KEY, name TEXT COLLATE NOCASE);
+CREATE TABLE publication (ID INTEGER PRIMARY KEY, title TEXT, venue TEXT, year INTEGER, num_citations INTEGER);
+CREATE TABLE faculty_keyword (faculty_id INTEGER, keyword_id INTEGER, score REAL, PRIMARY KEY (faculty_id, keyword_id));
+CREATE TABLE faculty_publication (faculty_id INTEGER, publication_id INTEGER, PRIMARY KEY (faculty_id, publication_id));
+CREATE TABLE Publication_Keyword (publication_id INTEGER, keyword_id INTEGER, score REAL, PRIMARY KEY (publication_id, keyword_id));
+CREATE INDEX keyword_name ON keyword (name);
+CREATE INDEX faculty_keyword_keyword ON faculty_keyword (keyword_id);
+CREATE INDEX faculty_publication_publication ON faculty_publication (publication_id);
+CREATE INDEX publication_keyword_keyword ON Publication_Keyword (keyword_id);
+CREATE INDEX faculty_university ON faculty (university_id);
+"""
+
+
+def load_sqlite(data, cnx):
+    """Create the MySQL academicworld tables in a sqlite3 connection and fill them."""
+    cnx.executescript(MYSQL_SCHEMA)
+    cnx.executemany("INSERT INTO university VALUES (?, ?, ?)", data.universities)
+    cnx.executemany(
+        "INSERT INTO faculty (id, name, position, email, photo_url, university_id) VALUES (?, ?, ?, ?, ?, ?)",
+        data.faculty,
+    )
+    cnx.executemany("INSERT INTO keyword VALUES (?, ?)", data.keywords)
+    cnx.executemany("INSERT INTO publication VALUES (?, ?, ?, ?, ?)", data.publications)
+    cnx.executemany("INSERT INTO faculty_keyword VALUES (?, ?, ?)", data.faculty_keyword)
+    cnx.executemany("INSERT INTO faculty_publication VALUES (?, ?)", data.faculty_publication)
+    cnx.executemany("INSERT INTO Publication_Keyword VALUES (?, ?, ?)", data.publication_keyword)
+    cnx.commit()
+
+
+def load_mongo(data, db):
+    """Fill `faculty` and `publications` the way the academicworld MongoDB dump shapes them."""
+    universities = {uid: (name, photo) for uid, name, photo in data.universities}
+    keyword_names = dict(data.keywords)
+
+    faculty_keywords = {}
+    for fid, kid, score in data.faculty_keyword:
+        faculty_keywords.setdefault(fid, []).append({"name": keyword_names[kid], "score": score})
+    faculty_pubs = {}
+    for fid, pid in data.faculty_publication:
+        faculty_pubs.setdefault(fid, []).append(pid)
+    pub_keywords = {}
+    for pid, kid, score in data.publication_keyword:
+        pub_keywords.setdefault(pid, []).append({"name": keyword_names[kid], "score": score})
+
+    db["faculty"].insert_many([
+        {
+            "id": fid,
+            "name": name,
+            "position": position,
+            "email": email,
+            "photoUrl": photo,
+            "affiliation": {"id": uid, "name": universities[uid][0], "photoUrl": universities[uid][1]},
+            "keywords": faculty_keywords.get(fid, []),
+            "publications": faculty_pubs.get(fid, []),
+        }
+        for fid, name, position, email, photo, uid in data.faculty
+    ])
+    db["publications"].insert_many([
+        {
+            "id": pid,
+            "title": title,
+            "venue": venue,
+            "year": year,
+            "numCitations": citations,
+            "keywords": pub_keywords.get(pid, []),
+        }
+        for pid, title, venue, year, citations in data.publications
+    ])
+
+
+def load_graph(data, graph):
+    """Add KEYWORD, FACULTY and INSTITUTE nodes and their relationships to a FakeGraph."""
+    institutes = {uid: graph.add_node("INSTITUTE", id=uid, name=name) for uid, name, _ in data.universities}
+    keywords = {kid: graph.add_node("KEYWORD", id=kid, name=name) for kid, name in data.keywords}
+    for fid, name, position, email, photo, uid in data.faculty:
+        node = graph.add_node("FACULTY", id=fid, name=name, position=position, email=email)
+        graph.add_edge(node, "AFFILIATION_WITH", institutes[uid])
+        graph.faculty_by_id[fid] = node
+    for fid, kid, score in data.faculty_keyword:
+        graph.add_edge(graph.faculty_by_id[fid], "INTERESTED_IN", keywords[kid], score=score)
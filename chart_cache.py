@@ -0,0 +1,102 @@
+"""Rendered chart and image cache.
+
+Charts are drawn once per (chart type, key, data hash) into PNG bytes and
+kept in a memory-bounded LRU shared by every session, so reruns don't redraw
+identical charts. Figures are built with matplotlib's object API rather than
+pyplot, so nothing is registered globally and each figure is released as
+soon as it has been saved.
+"""
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+
+from matplotlib.figure import Figure
+
+from metrics import register_cache
+
+CHART_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class ByteLRU:
+    """Thread-safe LRU of bytes values, bounded by their total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+_cache = ByteLRU(CHART_CACHE_BYTES)
+register_cache("charts", "app", _cache.stats)
+
+
+def data_hash(data):
+    """Stable hash of the JSON-able data a chart is drawn from."""
+    payload = json.dumps(data, sort_keys=True, default=str).encode()
+    return hashlib.sha1(payload).hexdigest()
+
+
+def render_chart(chart_type, key, data, draw, figsize=(10, 6), dpi=100):
+    """PNG bytes for a chart, drawn by `draw(fig, ax, data)` only on a cache miss."""
+    cache_key = ("chart", chart_type, key, data_hash(data), figsize, dpi)
+    png = _cache.get(cache_key)
+    if png is not None:
+        return png
+
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax = fig.subplots()
+    draw(fig, ax, data)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    # Drop the figure's references right away instead of waiting for the GC
+    fig.clear()
+    png = buf.getvalue()
+    _cache.put(cache_key, png)
+    return png
+
+
+def cache_stats():
+    return _cache.stats()
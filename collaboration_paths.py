@@ -0,0 +1,184 @@
+import heapq
+from collections import namedtuple
+
+import numpy as np
+
+from neo4j_utils import (
+    NODE_FACULTY,
+    NODE_KEYWORD,
+    get_faculty_keyword_node_pairs,
+    get_faculty_node_ids,
+    get_keyword_node_ids,
+)
+
+# Longest connection searched for, in keywords: a - k1 - b - k2 - c - k3 - d - k4 - e
+MAX_KEYWORDS = 4
+
+PathNode = namedtuple("PathNode", ["kind", "node_id", "name"])
+
+
+class CollaborationGraph:
+    """Neo4j's FACULTY-[:INTERESTED_IN]->KEYWORD edges as one undirected CSR graph.
+
+    Faculty are nodes 0..F-1 and keywords F..F+K-1, so every path between
+    two faculty alternates faculty and keywords. Shortest paths come from a
+    bidirectional BFS that expands whole frontiers with array operations,
+    always from the smaller side; k_shortest() runs Yen's algorithm on top
+    of it for the next-shortest simple paths. Among equally short paths,
+    ones through less common keywords are preferred.
+    """
+
+    def __init__(self, faculty, keywords, indptr, indices):
+        self.faculty = faculty        # [(node id, name)]
+        self.keywords = keywords      # [(node id, name)]
+        self.indptr = indptr
+        self.indices = indices
+        self.degree = np.diff(indptr).astype(np.int32)
+        self._faculty_index = {node_id: i for i, (node_id, _) in enumerate(faculty)}
+
+    @classmethod
+    def from_pairs(cls, pairs, faculty_rows, keyword_rows):
+        """Build from (faculty node id, keyword node id) pairs and (node id, name, ...) rows.
+
+        Pairs naming an unknown node are dropped, and duplicates count once.
+        """
+        faculty = sorted((row[0], row[1]) for row in faculty_rows)
+        keywords = sorted((row[0], row[1]) for row in keyword_rows)
+        n_faculty = len(faculty)
+        n_nodes = n_faculty + len(keywords)
+        faculty_ids = np.array([node_id for node_id, _ in faculty], dtype=np.int64)
+        keyword_ids = np.array([node_id for node_id, _ in keywords], dtype=np.int64)
+
+        pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+        if faculty_ids.size and keyword_ids.size and pairs.size:
+            f = np.searchsorted(faculty_ids, pairs[:, 0]).clip(max=faculty_ids.size - 1)
+            k = np.searchsorted(keyword_ids, pairs[:, 1]).clip(max=keyword_ids.size - 1)
+            known = (faculty_ids[f] == pairs[:, 0]) & (keyword_ids[k] == pairs[:, 1])
+            edges = np.unique(np.stack([f[known], k[known] + n_faculty], axis=1), axis=0)
+        else:
+            edges = np.zeros((0, 2), dtype=np.int64)
+
+        # Both directions, sorted by source then target
+        sources = np.concatenate([edges[:, 0], edges[:, 1]])
+        targets = np.concatenate([edges[:, 1], edges[:, 0]])
+        order = np.lexsort((targets, sources))
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n_nodes), out=indptr[1:])
+        return cls(faculty, keywords, indptr, targets[order].astype(np.int32))
+
+    def __len__(self):
+        return len(self.faculty)
+
+    def __contains__(self, faculty_node_id):
+        return faculty_node_id in self._faculty_index
+
+    def node(self, i):
+        if i < len(self.faculty):
+            return PathNode(NODE_FACULTY, *self.faculty[i])
+        return PathNode(NODE_KEYWORD, *self.keywords[i - len(self.faculty)])
+
+    def _expand(self, frontier, dist, blocked):
+        """Unvisited, unblocked neighbours of `frontier`, each once, and the frontier node reaching it."""
+        starts, stops = self.indptr[frontier], self.indptr[frontier + 1]
+        lengths = stops - starts
+        positions = np.repeat(stops - np.cumsum(lengths), lengths) + np.arange(lengths.sum())
+        neighbours = self.indices[positions]
+        parents = np.repeat(frontier, lengths)
+        fresh = (dist[neighbours] < 0) & ~blocked[neighbours]
+        neighbours, first = np.unique(neighbours[fresh], return_index=True)
+        return neighbours, parents[fresh][first]
+
+    def shortest_path(self, source, target, max_length, blocked=None, first_blocked=()):
+        """Node indices of a shortest source-target path of at most max_length edges, or None.
+
+        Paths avoid the `blocked` mask and never take source -> n for n in `first_blocked`.
+        """
+        if source == target:
+            return [source]
+        n = len(self.indptr) - 1
+        blocked = np.zeros(n, dtype=bool) if blocked is None else blocked.copy()
+        dist = [np.full(n, -1, dtype=np.int32), np.full(n, -1, dtype=np.int32)]
+        parent = [np.full(n, -1, dtype=np.int64), np.full(n, -1, dtype=np.int64)]
+        frontier = [np.array([source]), np.array([target])]
+        dist[0][source] = 0
+        dist[1][target] = 0
+        blocked[[source, target]] = False
+
+        depth = [0, 0]
+        while frontier[0].size and frontier[1].size and depth[0] + depth[1] < max_length:
+            # Grow the side with less to expand; with first_blocked, the source's first step
+            # is taken from the source side, and the other side may not reach the source after it
+            side = 0 if self.degree[frontier[0]].sum() <= self.degree[frontier[1]].sum() else 1
+            if first_blocked and depth[0] == 0:
+                side = 0
+            other = 1 - side
+            reached, parents = self._expand(frontier[side], dist[side], blocked)
+            if first_blocked and side == 0 and depth[0] == 0:
+                keep = ~np.isin(reached, list(first_blocked))
+                reached, parents = reached[keep], parents[keep]
+                blocked[source] = True
+            depth[side] += 1
+            dist[side][reached] = depth[side]
+            parent[side][reached] = parents
+            frontier[side] = reached
+
+            met = reached[dist[other][reached] >= 0]
+            if met.size:
+                # Shortest through the other side first, then the least common node
+                best = met[np.lexsort((met, self.degree[met], dist[other][met]))[0]]
+                path = [best]
+                while path[-1] != source:
+                    path.append(int(parent[0][path[-1]]))
+                path.reverse()
+                while path[-1] != target:
+                    path.append(int(parent[1][path[-1]]))
+                return [int(i) for i in path]
+        return None
+
+    def _rarity(self, path):
+        return int(self.degree[path[1::2]].sum())
+
+    def k_shortest(self, source, target, k=3, max_length=2 * MAX_KEYWORDS):
+        """Up to k simple paths (node indices) by increasing length, with Yen's algorithm."""
+        first = self.shortest_path(source, target, max_length)
+        if first is None:
+            return []
+        found = [first]
+        seen = {tuple(first)}
+        candidates = []
+        n = len(self.indptr) - 1
+        while len(found) < k:
+            previous = found[-1]
+            for i in range(len(previous) - 1):
+                root = previous[:i + 1]
+                # Next steps already taken from this root by a found path
+                first_blocked = {path[i + 1] for path in found if len(path) > i + 1 and path[:i + 1] == root}
+                blocked = np.zeros(n, dtype=bool)
+                blocked[root[:-1]] = True
+                spur = self.shortest_path(root[-1], target, max_length - i, blocked, first_blocked)
+                if spur is None:
+                    continue
+                path = root[:-1] + spur
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (len(path), self._rarity(path), path))
+            if not candidates:
+                break
+            found.append(heapq.heappop(candidates)[2])
+        return found
+
+    def paths(self, faculty_a, faculty_b, k=3, max_keywords=MAX_KEYWORDS):
+        """Up to k shortest connections between two faculty node ids, as lists of PathNodes.
+
+        Returns [] if either is unknown or they aren't connected within max_keywords keywords.
+        """
+        a, b = self._faculty_index.get(faculty_a), self._faculty_index.get(faculty_b)
+        if a is None or b is None or a == b:
+            return []
+        return [[self.node(i) for i in path] for path in self.k_shortest(a, b, k, 2 * max_keywords)]
+
+
+def build_collaboration_graph():
+    """Read Neo4j's INTERESTED_IN edges once and return the CollaborationGraph."""
+    return CollaborationGraph.from_pairs(get_faculty_keyword_node_pairs(), get_faculty_node_ids(),
+                                         get_keyword_node_ids())
@@ -0,0 +1,178 @@
+import threading
+
+import numpy as np
+from scipy import sparse
+
+from keyword_registry import normalize_keyword
+from mysql_utils import get_faculty_ids, get_faculty_keyword_scores, get_keyword_ids
+from query_cache import invalidate
+
+# Rows updated since the last build are kept apart until there are this many,
+# then folded back into the main matrix
+COMPACT_ROWS = 2000
+
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix)
+
+
+def _unit(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class FacultyRecommender:
+    """Faculty as L2-normalized faculty_keyword score vectors, for top-k cosine search.
+
+    A user's query vector is their interests (one-hot over keywords) plus
+    the centroid of their favorites' vectors, each normalized so neither
+    swamps the other. Recommending is one sparse matrix-vector product and
+    an argpartition over every faculty member.
+
+    update_faculty() replaces individual rows without a rebuild: new rows go
+    to a small delta matrix and the rows they supersede are masked out of
+    the main one, until COMPACT_ROWS of them have piled up.
+    """
+
+    def __init__(self, keyword_rows, faculty_rows):
+        keyword_rows = sorted(keyword_rows)
+        self.keyword_ids = np.array([kid for kid, _ in keyword_rows], dtype=np.int64)
+        self.keywords = [name for _, name in keyword_rows]
+        self._keyword_index = {}
+        for i, name in enumerate(self.keywords):
+            self._keyword_index.setdefault(normalize_keyword(name), i)
+        self.faculty = {fid: (name, university) for fid, name, university in faculty_rows}
+
+        self._lock = threading.Lock()
+        self._base_ids = np.zeros(0, dtype=np.int64)
+        self._base = sparse.csr_matrix((0, len(self.keywords)))
+        self._stale = np.zeros(0, dtype=bool)
+        self._delta_ids = np.zeros(0, dtype=np.int64)
+        self._delta = sparse.csr_matrix((0, len(self.keywords)))
+
+    def _matrix(self, score_rows):
+        """(sorted faculty ids, their normalized rows) from (faculty id, keyword id, score) rows."""
+        score_rows = list(score_rows)
+        faculty = np.fromiter((fid for fid, _, _ in score_rows), dtype=np.int64, count=len(score_rows))
+        keyword = np.fromiter((kid for _, kid, _ in score_rows), dtype=np.int64, count=len(score_rows))
+        scores = np.fromiter((score or 0.0 for _, _, score in score_rows), dtype=np.float64,
+                             count=len(score_rows))
+        if not len(self.keyword_ids):
+            return np.zeros(0, dtype=np.int64), sparse.csr_matrix((0, 0))
+        columns = np.searchsorted(self.keyword_ids, keyword).clip(max=len(self.keyword_ids) - 1)
+        known = self.keyword_ids[columns] == keyword
+        ids, rows = np.unique(faculty[known], return_inverse=True)
+        matrix = sparse.csr_matrix((scores[known], (rows, columns[known])),
+                                   shape=(ids.size, len(self.keywords)))
+        return ids, _normalize_rows(matrix)
+
+    @classmethod
+    def from_rows(cls, score_rows, keyword_rows, faculty_rows):
+        recommender = cls(keyword_rows, faculty_rows)
+        recommender._base_ids, recommender._base = recommender._matrix(score_rows)
+        recommender._stale = np.zeros(recommender._base_ids.size, dtype=bool)
+        return recommender
+
+    def __len__(self):
+        return int(self._base_ids.size - self._stale.sum() + self._delta_ids.size)
+
+    def update_faculty(self, faculty_ids, score_rows, faculty_rows=()):
+        """Replace the rows of `faculty_ids` with `score_rows`; faculty without rows are dropped."""
+        ids, matrix = self._matrix(score_rows)
+        faculty_ids = np.unique(np.asarray(list(faculty_ids), dtype=np.int64))
+        with self._lock:
+            self.faculty.update((fid, (name, university)) for fid, name, university in faculty_rows)
+            stale = self._stale.copy()
+            stale[np.isin(self._base_ids, faculty_ids)] = True
+            keep = ~np.isin(self._delta_ids, faculty_ids)
+            delta_ids = np.concatenate([self._delta_ids[keep], ids])
+            delta = sparse.vstack([self._delta[np.flatnonzero(keep)], matrix], format="csr")
+            if delta_ids.size > COMPACT_ROWS:
+                live = np.flatnonzero(~stale)
+                base_ids = np.concatenate([self._base_ids[live], delta_ids])
+                base = sparse.vstack([self._base[live], delta], format="csr")
+                order = np.argsort(base_ids, kind="stable")
+                self._base_ids, self._base = base_ids[order], base[order]
+                self._stale = np.zeros(base_ids.size, dtype=bool)
+                self._delta_ids = np.zeros(0, dtype=np.int64)
+                self._delta = sparse.csr_matrix((0, len(self.keywords)))
+            else:
+                self._stale, self._delta_ids, self._delta = stale, delta_ids, delta
+
+    def _state(self):
+        """The matrices as of now; update_faculty() swaps them, never edits them in place."""
+        with self._lock:
+            return self._base_ids, self._base, self._stale, self._delta_ids, self._delta
+
+    def _rows(self, state, faculty_ids):
+        """Current rows for the given faculty, stacked; unknown ids are skipped."""
+        base_ids, base, stale, delta_ids, delta = state
+        wanted = np.asarray(list(faculty_ids), dtype=np.int64)
+        base_pos = np.flatnonzero(np.isin(base_ids, wanted) & ~stale)
+        delta_pos = np.flatnonzero(np.isin(delta_ids, wanted))
+        return sparse.vstack([base[base_pos], delta[delta_pos]], format="csr")
+
+    def query_vector(self, interests=(), favorite_ids=(), state=None):
+        """Unit-length keyword vector for a profile; all zeros if nothing in it is known."""
+        interest_vector = np.zeros(len(self.keywords))
+        for name in interests:
+            i = self._keyword_index.get(normalize_keyword(name))
+            if i is not None:
+                interest_vector[i] = 1.0
+        favorite_vector = np.zeros(len(self.keywords))
+        if len(favorite_ids):
+            favorites = self._rows(state or self._state(), favorite_ids)
+            if favorites.shape[0]:
+                favorite_vector = np.asarray(favorites.mean(axis=0)).ravel()
+        return _unit(_unit(interest_vector) + _unit(favorite_vector))
+
+    def recommend(self, interests=(), favorite_ids=(), top_n=5, reasons=3):
+        """Top faculty by cosine similarity to the profile, favorites excluded.
+
+        Returns [(faculty id, name, university, score, [keywords explaining the match])].
+        """
+        state = self._state()
+        base_ids, base, stale, delta_ids, delta = state
+        query = self.query_vector(interests, favorite_ids, state)
+        if not query.any():
+            return []
+
+        ids = np.concatenate([base_ids, delta_ids])
+        scores = np.concatenate([base @ query, delta @ query])
+        scores[:base_ids.size][stale] = 0.0
+        scores[np.isin(ids, np.asarray(list(favorite_ids), dtype=np.int64))] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if not candidates.size:
+            return []
+        top_n = min(top_n, candidates.size)
+        top = candidates[np.argpartition(-scores[candidates], top_n - 1)[:top_n]]
+        top = top[np.lexsort((ids[top], -scores[top]))]
+
+        results = []
+        for position in top:
+            row = base[position] if position < base_ids.size else delta[position - base_ids.size]
+            contribution = row.multiply(query).tocsr()
+            best = contribution.indices[np.argsort(-contribution.data, kind="stable")[:reasons]]
+            name, university = self.faculty.get(int(ids[position]), (None, None))
+            results.append((int(ids[position]), name, university, float(scores[position]),
+                            [self.keywords[i] for i in best]))
+        return results
+
+    def refresh_faculty(self, faculty_ids):
+        """Re-read some faculty members' keyword scores from MySQL and update their rows."""
+        faculty_ids = list(faculty_ids)
+        wanted = set(faculty_ids)
+        # The rows changed, so cached reads of them are stale too
+        invalidate("faculty")
+        self.update_faculty(
+            faculty_ids,
+            get_faculty_keyword_scores(faculty_ids),
+            [row for row in get_faculty_ids() if row[0] in wanted],
+        )
+
+
+def build_faculty_recommender():
+    """Read faculty_keyword once and return a FacultyRecommender over every faculty member."""
+    return FacultyRecommender.from_rows(get_faculty_keyword_scores(), get_keyword_ids(), get_faculty_ids())
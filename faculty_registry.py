@@ -0,0 +1,75 @@
+"""Cross-store faculty id map.
+
+MySQL and MongoDB both carry a numeric faculty id, and Neo4j FACULTY nodes
+have their own node ids. The map is built once and lets a MySQL result row
+be joined to its MongoDB profile and Neo4j node by id, instead of looking a
+profile up by name (which is unindexed and not unique).
+"""
+from collections import defaultdict, namedtuple
+
+from mongodb_utils import get_faculty_ids as get_mongo_faculty_ids
+from mysql_utils import get_faculty_ids as get_mysql_faculty_ids
+from neo4j_utils import get_faculty_node_ids
+
+FacultyEntry = namedtuple("FacultyEntry", ["mysql_id", "mongo_id", "neo4j_id", "name", "university"])
+
+
+def _person_key(name, university):
+    return (" ".join((name or "").lower().split()), " ".join((university or "").lower().split()))
+
+
+class FacultyRegistry:
+    def __init__(self, mysql_rows, mongo_rows, neo4j_rows):
+        mongo_ids = {fid for fid, _, _ in mongo_rows}
+
+        # Name + university only links records when it is unambiguous
+        mongo_by_person = defaultdict(list)
+        for fid, name, university in mongo_rows:
+            mongo_by_person[_person_key(name, university)].append(fid)
+        neo4j_by_person = defaultdict(list)
+        for node_id, name, university in neo4j_rows:
+            neo4j_by_person[_person_key(name, university)].append(node_id)
+
+        self._by_mysql = {}
+        self._by_mongo = {}
+        self._by_neo4j = {}
+        self.ambiguous = []
+        for mysql_id, name, university in mysql_rows:
+            key = _person_key(name, university)
+            if mysql_id in mongo_ids:
+                mongo_id = mysql_id
+            else:
+                candidates = mongo_by_person.get(key, [])
+                mongo_id = candidates[0] if len(candidates) == 1 else None
+            nodes = neo4j_by_person.get(key, [])
+            neo4j_id = nodes[0] if len(nodes) == 1 else None
+            if len(nodes) > 1:
+                self.ambiguous.append(name)
+
+            entry = FacultyEntry(mysql_id, mongo_id, neo4j_id, name, university)
+            self._by_mysql[mysql_id] = entry
+            if mongo_id is not None:
+                self._by_mongo[mongo_id] = entry
+            if neo4j_id is not None:
+                self._by_neo4j[neo4j_id] = entry
+
+    def __len__(self):
+        return len(self._by_mysql)
+
+    def by_mysql_id(self, mysql_id):
+        return self._by_mysql.get(mysql_id)
+
+    def by_mongo_id(self, mongo_id):
+        return self._by_mongo.get(mongo_id)
+
+    def by_neo4j_id(self, node_id):
+        return self._by_neo4j.get(node_id)
+
+    def mongo_id(self, mysql_id):
+        entry = self._by_mysql.get(mysql_id)
+        return entry.mongo_id if entry else None
+
+
+def build_faculty_registry():
+    """Read every store's faculty ids once and join them."""
+    return FacultyRegistry(get_mysql_faculty_ids(), get_mongo_faculty_ids(), get_faculty_node_ids())
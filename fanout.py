@@ -0,0 +1,107 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Seconds each store gets before its section gives up and renders a warning
+BACKEND_TIMEOUTS = {
+    "mongodb": 8.0,
+    "mysql": 8.0,
+    "neo4j": 10.0,
+}
+DEFAULT_TIMEOUT = 10.0
+
+# Worker threads per store. A query that times out keeps its worker until it
+# returns, so a store that hangs can only use up its own workers
+BACKEND_WORKERS = {
+    "mongodb": 4,
+    "mysql": 4,
+    "neo4j": 4,
+}
+DEFAULT_WORKERS = 4
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def executor_for(backend):
+    """The thread pool `backend`'s queries run on, shared by every session."""
+    with _executors_lock:
+        executor = _executors.get(backend)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=BACKEND_WORKERS.get(backend, DEFAULT_WORKERS),
+                                          thread_name_prefix=f"fanout-{backend}")
+            _executors[backend] = executor
+        return executor
+
+
+class QueryResult:
+    """Outcome of one query in a fan-out: a value, an error or a timeout."""
+
+    def __init__(self, name, backend, value=None, error=None, timed_out=False, elapsed=0.0, started=True):
+        self.name = name
+        self.backend = backend
+        self.value = value
+        self.error = error
+        self.timed_out = timed_out
+        self.elapsed = elapsed
+        # False for a query that timed out still queued behind its store's busy workers
+        self.started = started
+
+    @property
+    def ok(self):
+        return self.error is None and not self.timed_out
+
+    def __repr__(self):
+        state = "ok" if self.ok else ("timeout" if self.timed_out else f"error={self.error!r}")
+        return f"QueryResult({self.name!r}, {self.backend}, {state}, {self.elapsed:.3f}s)"
+
+
+def fan_out(queries, timeouts=None, executor=None):
+    """Run independent queries concurrently and yield their results as they finish.
+
+    `queries` maps a section name to `(backend, fn, args)`. Every query is
+    submitted at once to its backend's pool (or to `executor`), so the total
+    wait is the slowest backend rather than the sum of all of them. A query's
+    timeout counts from when a worker picks it up; one still queued when the
+    timeout has passed since it was submitted is cancelled, and both are
+    yielded as timed out while the rest keep going. A worker that is still
+    blocked keeps running in the background and its result is discarded.
+    """
+    timeouts = {**BACKEND_TIMEOUTS, **(timeouts or {})}
+    started = time.monotonic()
+    # Section name -> when a worker started it
+    running = {}
+
+    def run(name, fn, args):
+        running[name] = time.monotonic()
+        return fn(*args)
+
+    pending = {}
+    for name, (backend, fn, args) in queries.items():
+        future = (executor or executor_for(backend)).submit(run, name, fn, args)
+        pending[future] = (name, backend, timeouts.get(backend, DEFAULT_TIMEOUT))
+
+    def deadline(name, timeout):
+        return running.get(name, started) + timeout
+
+    while pending:
+        now = time.monotonic()
+        for future, (name, backend, timeout) in list(pending.items()):
+            if not future.done() and deadline(name, timeout) <= now:
+                del pending[future]
+                queued = future.cancel()
+                yield QueryResult(name, backend, timed_out=True, elapsed=now - started, started=not queued)
+        if not pending:
+            break
+
+        next_deadline = min(deadline(name, timeout) for name, _, timeout in pending.values())
+        done, _ = wait(pending, timeout=max(0.0, next_deadline - time.monotonic()),
+                       return_when=FIRST_COMPLETED)
+        for future in done:
+            name, backend, _ = pending.pop(future)
+            elapsed = time.monotonic() - started
+            error = future.exception()
+            if error is None:
+                yield QueryResult(name, backend, value=future.result(), elapsed=elapsed)
+            else:
+                yield QueryResult(name, backend, error=error, elapsed=elapsed)
@@ -0,0 +1,237 @@
+"""Server-side layout for the research network graph.
+
+Positions are computed here with a vectorized force-directed layout and sent
+to the browser with physics off, so vis.js draws the graph immediately
+instead of running its own simulation on every rerun. Large ego networks are
+held to a node budget that counts every drawn node, clusters included: the
+least shared co-keywords are collapsed into one cluster node per shared-by
+count until the user expands them, and past that the least connected
+faculty into a single "more faculty" node.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from metrics import register_cache
+from neo4j_utils import EDGE_CO_KEYWORD, NODE_FACULTY
+
+LAYOUT_CACHE_SIZE = 256
+# Dense spectral initialisation is O(n^3); past this size start from random
+SPECTRAL_INIT_MAX_NODES = 600
+
+NODE_CLUSTER = "cluster"
+NODE_FACULTY_CLUSTER = "faculty_cluster"
+
+# Parallel arrays describing what to draw; x/y are pixel offsets from the centre
+LayoutGraph = namedtuple("LayoutGraph", [
+    "ids", "labels", "kinds", "weights", "members",
+    "sources", "targets",
+    "x", "y",
+])
+
+
+def _spectral_init(n, sources, targets):
+    adjacency = np.zeros((n, n))
+    adjacency[sources, targets] = 1.0
+    adjacency[targets, sources] = 1.0
+    laplacian = np.diag(adjacency.sum(axis=1)) - adjacency
+    _, vectors = np.linalg.eigh(laplacian)
+    # Skip the constant eigenvector; the next two give the first spectral embedding
+    pos = vectors[:, 1:3] if n > 2 else np.zeros((n, 2))
+    return pos
+
+
+def force_layout(n, sources, targets, iterations=60, seed=0, pinned=None):
+    """Fruchterman-Reingold layout of n nodes, vectorized over all node pairs.
+
+    Returns an (n, 2) array in [-1, 1]. `pinned` is an optional node index
+    held at the origin (the ego network's centre keyword).
+    """
+    if n == 0:
+        return np.zeros((0, 2))
+    if n == 1:
+        return np.zeros((1, 2))
+
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+
+    if n <= SPECTRAL_INIT_MAX_NODES and len(sources):
+        pos = _spectral_init(n, sources, targets)
+        # Nodes the spectrum puts on top of each other still need to separate
+        pos = pos + rng.normal(scale=1e-3, size=pos.shape)
+    else:
+        pos = rng.uniform(-1, 1, size=(n, 2))
+
+    k2 = 1.0 / n
+    k = np.sqrt(k2)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    x, y = pos[:, 0].copy(), pos[:, 1].copy()
+    for _ in range(iterations):
+        dx = x[:, None] - x[None, :]
+        dy = y[:, None] - y[None, :]
+        dist2 = dx * dx + dy * dy
+        np.fill_diagonal(dist2, 1.0)
+        np.maximum(dist2, 1e-8, out=dist2)
+        # Repulsion k^2/d between every pair, along the unit vector
+        repel = k2 / dist2
+        disp_x = (dx * repel).sum(axis=1)
+        disp_y = (dy * repel).sum(axis=1)
+
+        if len(sources):
+            # Attraction d^2/k along each edge
+            ex = x[sources] - x[targets]
+            ey = y[sources] - y[targets]
+            pull = np.sqrt(ex * ex + ey * ey) / k
+            np.add.at(disp_x, sources, -ex * pull)
+            np.add.at(disp_x, targets, ex * pull)
+            np.add.at(disp_y, sources, -ey * pull)
+            np.add.at(disp_y, targets, ey * pull)
+
+        length = np.sqrt(disp_x * disp_x + disp_y * disp_y) + 1e-9
+        step = np.minimum(length, temperature) / length
+        x += disp_x * step
+        y += disp_y * step
+        if pinned is not None:
+            x[pinned] = y[pinned] = 0.0
+        temperature -= cooling
+
+    pos = np.column_stack([x, y])
+    pos -= pos[pinned] if pinned is not None else pos.mean(axis=0)
+    extent = np.abs(pos).max()
+    return pos / extent if extent > 0 else pos
+
+
+def _keyword_weights(network):
+    """Largest shared-by count on any co-keyword edge into each node."""
+    weights = {}
+    for dst, weight, kind in zip(network.targets, network.weights, network.edge_kinds):
+        if kind == EDGE_CO_KEYWORD:
+            weights[dst] = max(weights.get(dst, 0), weight)
+    return weights
+
+
+def _interest_degree(network):
+    """Number of faculty-keyword interest edges at each node."""
+    degree = [0] * len(network.node_ids)
+    for src, dst, kind in zip(network.sources, network.targets, network.edge_kinds):
+        if kind != EDGE_CO_KEYWORD:
+            degree[src] += 1
+            degree[dst] += 1
+    return degree
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def layout_ego_network(network, node_budget=150, expanded=frozenset(), width=800, height=600):
+    """Collapse an EgoNetwork to at most `node_budget` drawn nodes and lay it out.
+
+    Every node counts against the budget, cluster nodes included. The
+    centre keyword is always shown. Keywords whose shared-by count is in
+    `expanded` come before the rest, and the rest are kept most-shared
+    first. When the budget runs out, the least connected node is collapsed
+    first. For a keyword that means the fewest faculty sharing it; for a
+    faculty member, the fewest interest edges. Keywords go into one cluster
+    node per shared-by count, and faculty into one "more faculty" node.
+    Expanded keywords are collapsed last. If the keyword clusters alone
+    still don't fit, the least shared of them are merged. Cached per (network, budget,
+    expanded, size), so reruns and other sessions viewing the same keyword
+    reuse the positions.
+    """
+    center = network.node_ids.index(network.center) if network.center in network.node_ids else None
+    weights = _keyword_weights(network)
+    degree = _interest_degree(network)
+
+    faculty, keywords = [], []
+    for i, kind in enumerate(network.kinds):
+        if i == center:
+            continue
+        (faculty if kind == NODE_FACULTY else keywords).append(i)
+    faculty.sort(key=lambda i: (-degree[i], network.labels[i]))
+    keywords.sort(key=lambda i: (weights.get(i, 1) not in expanded, -weights.get(i, 1), network.labels[i]))
+    n_expanded = sum(1 for i in keywords if weights.get(i, 1) in expanded)
+
+    # Keep keywords[:n_keywords] and faculty[:n_faculty]; the rest become cluster nodes
+    n_keywords, n_faculty = len(keywords), len(faculty)
+    cluster_weights = set()
+
+    def drawn():
+        return ((center is not None) + n_keywords + n_faculty + len(cluster_weights)
+                + (n_faculty < len(faculty)))
+
+    # The least connected node goes first: a keyword shared by fewer faculty than
+    # the least connected faculty member has interests, or else that member
+    while drawn() > node_budget and (n_keywords > n_expanded or n_faculty > 0):
+        if n_keywords > n_expanded and (
+                n_faculty == 0 or weights.get(keywords[n_keywords - 1], 1) <= degree[faculty[n_faculty - 1]]):
+            n_keywords -= 1
+            cluster_weights.add(weights.get(keywords[n_keywords], 1))
+        else:
+            n_faculty -= 1
+    while drawn() > node_budget and n_keywords > 0:
+        n_keywords -= 1
+        cluster_weights.add(weights.get(keywords[n_keywords], 1))
+
+    keep = ([center] if center is not None else []) + faculty[:n_faculty] + keywords[:n_keywords]
+    collapsed = {}
+    for i in keywords[n_keywords:]:
+        collapsed.setdefault(weights.get(i, 1), []).append(i)
+    # Too many shared-by counts to give each a node: the least shared share the last one
+    room = max(1, node_budget - (len(keep) + (n_faculty < len(faculty))))
+    groups = sorted(collapsed.items(), reverse=True)
+    if len(groups) > room:
+        merged = [i for _, group in groups[room - 1:] for i in group]
+        groups = groups[:room - 1] + [(groups[room - 1][0], merged)]
+
+    ids, labels, kinds, node_weights, members = [], [], [], [], []
+    position = {}
+    for i in keep:
+        position[i] = len(ids)
+        prefix = "f" if network.kinds[i] == NODE_FACULTY else "k"
+        ids.append(f"{prefix}{network.node_ids[i]}")
+        labels.append(network.labels[i])
+        kinds.append(network.kinds[i])
+        node_weights.append(weights.get(i, 0))
+        members.append(())
+    for weight, group in groups:
+        cluster = len(ids)
+        for i in group:
+            position[i] = cluster
+        ids.append(f"c{weight}")
+        noun = "keyword" if len(group) == 1 else "keywords"
+        fewer = " or fewer" if any(weights.get(i, 1) != weight for i in group) else ""
+        labels.append(f"+{len(group)} {noun} shared by {weight}{fewer}")
+        kinds.append(NODE_CLUSTER)
+        node_weights.append(weight)
+        members.append(tuple(network.labels[i] for i in group))
+    hidden = faculty[n_faculty:]
+    if hidden:
+        for i in hidden:
+            position[i] = len(ids)
+        ids.append("fc")
+        labels.append(f"+{len(hidden)} more faculty")
+        kinds.append(NODE_FACULTY_CLUSTER)
+        node_weights.append(0)
+        members.append(tuple(network.labels[i] for i in hidden))
+
+    # Draw faculty -> keyword interest edges; many collapse onto the same cluster
+    edges = set()
+    for src, dst, kind in zip(network.sources, network.targets, network.edge_kinds):
+        if kind != EDGE_CO_KEYWORD:
+            a, b = position[src], position[dst]
+            if a != b:
+                edges.add((a, b))
+    edges = sorted(edges)
+    sources = tuple(a for a, _ in edges)
+    targets = tuple(b for _, b in edges)
+
+    pos = force_layout(len(ids), sources, targets,
+                       pinned=position.get(center) if center is not None else None)
+    x = tuple(float(v) for v in pos[:, 0] * width * 0.45) if len(ids) else ()
+    y = tuple(float(v) for v in pos[:, 1] * height * 0.45) if len(ids) else ()
+    return LayoutGraph(tuple(ids), tuple(labels), tuple(kinds), tuple(node_weights),
+                       tuple(members), sources, targets, x, y)
+
+
+register_cache("network_layout", "app", layout_ego_network.cache_info)
@@ -0,0 +1,136 @@
+import numpy as np
+from scipy import sparse
+
+from keyword_registry import normalize_keyword
+from mysql_utils import get_faculty_keyword_pairs, get_keyword_ids
+from neo4j_utils import get_faculty_keyword_node_pairs, get_keyword_node_ids
+
+MEASURES = ("cosine", "pmi")
+
+
+class KeywordCooccurrence:
+    """Sparse keyword x keyword co-occurrence counts over faculty interests.
+
+    `counts[i, j]` is the number of faculty interested in both keywords i
+    and j, and `faculty_counts[i]` the number interested in keyword i. Both
+    similarity measures are precomputed over the same CSR structure, so a
+    related-keywords lookup is one row slice plus a partial sort and
+    suggestions for several interests are one sparse row sum.
+
+    cosine(i, j) = n_ij / sqrt(n_i * n_j)
+    pmi(i, j)    = log(n_ij * N / (n_i * n_j)), N = faculty with any keyword
+    """
+
+    def __init__(self, keywords, counts, faculty_counts, n_faculty):
+        self.keywords = list(keywords)
+        self.counts = counts
+        self.faculty_counts = faculty_counts
+        self.n_faculty = n_faculty
+        self._index = {}
+        for i, name in enumerate(self.keywords):
+            self._index.setdefault(normalize_keyword(name), i)
+
+        rows = np.repeat(np.arange(len(self.keywords)), np.diff(counts.indptr))
+        n_i = faculty_counts[rows].astype(np.float64)
+        n_j = faculty_counts[counts.indices].astype(np.float64)
+        shared = counts.data.astype(np.float64)
+        self.similarity = {
+            "cosine": self._with_data(shared / np.sqrt(n_i * n_j)),
+            "pmi": self._with_data(np.log(shared * n_faculty / (n_i * n_j))),
+        }
+
+    def _with_data(self, data):
+        return sparse.csr_matrix((data, self.counts.indices, self.counts.indptr), shape=self.counts.shape)
+
+    @classmethod
+    def from_pairs(cls, pairs, keyword_rows):
+        """Build from (faculty id, keyword id) pairs and (keyword id, name) rows in one pass.
+
+        Duplicate pairs count once, and pairs whose keyword id has no name are dropped.
+        """
+        keyword_rows = sorted(keyword_rows)
+        keyword_ids = np.fromiter((kid for kid, _ in keyword_rows), dtype=np.int64, count=len(keyword_rows))
+        names = [name for _, name in keyword_rows]
+        pairs = list(pairs)
+        if not pairs or not names:
+            empty = sparse.csr_matrix((len(names), len(names)), dtype=np.int32)
+            return cls(names, empty, np.zeros(len(names), dtype=np.int32), 0)
+
+        faculty = np.fromiter((fid for fid, _ in pairs), dtype=np.int64, count=len(pairs))
+        keyword = np.fromiter((kid for _, kid in pairs), dtype=np.int64, count=len(pairs))
+        columns = np.searchsorted(keyword_ids, keyword).clip(max=len(keyword_ids) - 1)
+        known = keyword_ids[columns] == keyword
+        faculty_ids, rows = np.unique(faculty[known], return_inverse=True)
+
+        # faculty x keyword incidence, then keyword x keyword = its Gram matrix
+        incidence = sparse.csr_matrix(
+            (np.ones(rows.size, dtype=np.int32), (rows, columns[known])),
+            shape=(faculty_ids.size, len(names)),
+        )
+        incidence.sum_duplicates()
+        incidence.data[:] = 1
+        counts = (incidence.T @ incidence).tocsr()
+        faculty_counts = counts.diagonal().astype(np.int32)
+        counts.setdiag(0)
+        counts.eliminate_zeros()
+        counts.sort_indices()
+        return cls(names, counts, faculty_counts, int(faculty_ids.size))
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def __contains__(self, keyword):
+        return normalize_keyword(keyword) in self._index
+
+    def _top(self, scores, candidates, top_n):
+        if not candidates.size or top_n <= 0:
+            return candidates[:0]
+        top_n = min(top_n, candidates.size)
+        top = np.argpartition(-scores, top_n - 1)[:top_n]
+        # Ties go to the keyword more faculty are interested in, then the lower id
+        order = np.lexsort((candidates[top], -self.faculty_counts[candidates[top]], -scores[top]))
+        return top[order]
+
+    def related(self, keyword, top_n=10, measure="cosine", min_count=2):
+        """Keywords most similar to `keyword`: [(name, score, shared faculty)], best first.
+
+        Pairs shared by fewer than `min_count` faculty are skipped; with PMI
+        especially, rare keywords otherwise dominate on one coincidence.
+        """
+        i = self._index.get(normalize_keyword(keyword))
+        if i is None:
+            return []
+        start, stop = self.counts.indptr[i], self.counts.indptr[i + 1]
+        candidates = self.counts.indices[start:stop]
+        shared = self.counts.data[start:stop]
+        scores = self.similarity[measure].data[start:stop]
+        keep = shared >= min_count
+        candidates, shared, scores = candidates[keep], shared[keep], scores[keep]
+        top = self._top(scores, candidates, top_n)
+        return [(self.keywords[candidates[t]], float(scores[t]), int(shared[t])) for t in top]
+
+    def suggest(self, interests, top_n=10, min_count=2):
+        """Keywords to suggest for a set of interests: [(name, score)], best first.
+
+        A keyword's score is its summed cosine similarity to every interest,
+        so keywords close to several interests rank above ones close to one.
+        Interests themselves, and unknown names, are left out.
+        """
+        rows = sorted({self._index[k] for k in map(normalize_keyword, interests) if k in self._index})
+        if not rows:
+            return []
+        cosine = self.similarity["cosine"][rows]
+        if min_count > 1:
+            cosine = cosine.multiply(self.counts[rows] >= min_count)
+        scores = np.asarray(cosine.sum(axis=0)).ravel()
+        scores[rows] = 0
+        candidates = np.flatnonzero(scores > 0)
+        top = self._top(scores[candidates], candidates, top_n)
+        return [(self.keywords[candidates[t]], float(scores[candidates[t]])) for t in top]
+
+
+def build_keyword_cooccurrence(store="mysql"):
+    """Read the faculty-keyword relation once, from MySQL or Neo4j, and return its KeywordCooccurrence."""
+    if store == "neo4j":
+        return KeywordCooccurrence.from_pairs(get_faculty_keyword_node_pairs(), get_keyword_node_ids())
+    return KeywordCooccurrence.from_pairs(get_faculty_keyword_pairs(), get_keyword_ids())
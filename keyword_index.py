@@ -0,0 +1,171 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from mysql_utils import get_all_keywords, get_keyword_table_signature
+from query_cache import invalidate
+
+# How often the shared index asks MySQL whether the keyword table changed
+SIGNATURE_CHECK_SECONDS = 60.0
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance, giving up early once it must exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class KeywordIndex:
+    """Sorted, in-memory keyword vocabulary with prefix and typo-tolerant search.
+
+    Full-name prefix matches rank first, then keywords with a word starting
+    with the query ("learn" finds "machine learning"), then fuzzy matches
+    within a small edit distance found through a trigram index.
+    """
+
+    def __init__(self, keywords, signature=None):
+        names = sorted(set(keywords), key=lambda k: (_normalize(k), k))
+        self.names = names
+        self.signature = signature
+        self._keys = [_normalize(name) for name in names]
+
+        words = []
+        self._trigram_postings = defaultdict(list)
+        for i, key in enumerate(self._keys):
+            for word in set(key.split()):
+                words.append((word, i))
+            for gram in _trigrams(key):
+                self._trigram_postings[gram].append(i)
+        words.sort()
+        self._words = [w for w, _ in words]
+        self._word_owner = [i for _, i in words]
+
+    def __len__(self):
+        return len(self.names)
+
+    def _prefix_range(self, keys, prefix):
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + "\uffff", lo)
+        return lo, hi
+
+    def prefix(self, query):
+        """Indices of keywords whose full name starts with query, in name order."""
+        lo, hi = self._prefix_range(self._keys, _normalize(query))
+        return range(lo, hi)
+
+    def _word_prefix(self, query):
+        lo, hi = self._prefix_range(self._words, _normalize(query))
+        return sorted({self._word_owner[j] for j in range(lo, hi)})
+
+    def _fuzzy(self, query, max_distance):
+        grams = _trigrams(query)
+        shared = defaultdict(int)
+        for gram in grams:
+            for i in self._trigram_postings.get(gram, ()):
+                shared[i] += 1
+
+        # One edit changes at most 3 trigrams, so a name within max_distance
+        # edits still shares most of the query's trigrams; skip the rest
+        # before paying for an edit distance.
+        needed = max(1, len(grams) - 3 * max_distance)
+        scored = []
+        for i, count in shared.items():
+            if count < needed:
+                continue
+            key = self._keys[i]
+            # Compare against the whole name and, for multi-word names, each word
+            distance = min(
+                _edit_distance(query, candidate, max_distance)
+                for candidate in [key, *key.split()]
+            )
+            if distance <= max_distance:
+                scored.append((distance, key, i))
+        scored.sort()
+        return [i for _, _, i in scored]
+
+    def search(self, query, page=0, page_size=20, max_distance=None):
+        """Return (names on this page, total matches) for a free-text query.
+
+        An empty query pages through the whole vocabulary alphabetically.
+        """
+        query = _normalize(query or "")
+        if not query:
+            matches = range(len(self.names))
+        else:
+            if max_distance is None:
+                max_distance = 0 if len(query) < 4 else (1 if len(query) < 8 else 2)
+            matches = []
+            seen = set()
+            candidates = [self.prefix(query), self._word_prefix(query)]
+            if max_distance:
+                candidates.append(self._fuzzy(query, max_distance))
+            for group in candidates:
+                for i in group:
+                    if i not in seen:
+                        seen.add(i)
+                        matches.append(i)
+
+        start = page * page_size
+        return [self.names[i] for i in matches[start:start + page_size]], len(matches)
+
+
+class SharedKeywordIndex:
+    """Process-wide holder that rebuilds the index when the keyword table changes."""
+
+    def __init__(self, check_every=SIGNATURE_CHECK_SECONDS):
+        self.check_every = check_every
+        self._index = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.check_every:
+            return self._index
+
+        with self._lock:
+            if self._index is not None and now - self._checked_at < self.check_every:
+                return self._index
+            signature = get_keyword_table_signature()
+            if self._index is None or self._index.signature != signature:
+                if self._index is not None:
+                    # The cached keyword lists predate the change
+                    invalidate("keywords")
+                self._index = KeywordIndex(get_all_keywords(), signature)
+            self._checked_at = time.monotonic()
+            return self._index
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+
+_shared = SharedKeywordIndex()
+
+
+def get_keyword_index():
+    """Keyword index shared by every session in this process."""
+    return _shared.get()
@@ -0,0 +1,259 @@
+"""Precomputed keyword x university publication rankings.
+
+The university ranking widget used to run a six-way join with
+COUNT(DISTINCT ...) for every keyword a user picked. This job computes the
+ranking for every keyword in one grouped scan and stores it in
+`keyword_university_rank`, keyed by (keyword_id, position), so the widget
+reads any top-N slice with a primary key range scan.
+
+It also scores every faculty member for every keyword, with and without
+the publication-count weighting, into `keyword_faculty_rank`, keyed in
+(score DESC, faculty id) order, so the faculty search reads a page from
+wherever its cursor left off instead of scoring every match again.
+
+Incremental refreshes pick up publications by id, so new publications are
+folded in cheaply; re-linking existing publications to other faculty or
+keywords, or adding faculty keywords, needs a full rebuild.
+
+Run it from cron or by hand:
+
+    python keyword_rankings.py          # incremental refresh
+    python keyword_rankings.py --full   # rebuild every keyword
+"""
+import argparse
+import math
+from collections import defaultdict
+
+from mysql_pool import get_pool
+from query_cache import invalidate
+
+CREATE_SUMMARY_TABLE = """
+CREATE TABLE IF NOT EXISTS keyword_university_rank (
+    keyword_id INT NOT NULL,
+    position INT NOT NULL,
+    university_id INT NOT NULL,
+    university_name VARCHAR(512) NOT NULL,
+    total INT NOT NULL,
+    PRIMARY KEY (keyword_id, position)
+)
+"""
+
+# One row per keyword, weighting (0 plain, 1 by publication count) and faculty member
+CREATE_FACULTY_TABLE = """
+CREATE TABLE IF NOT EXISTS keyword_faculty_rank (
+    keyword_id INT NOT NULL,
+    weighted TINYINT NOT NULL,
+    score DOUBLE NOT NULL,
+    faculty_id INT NOT NULL,
+    PRIMARY KEY (keyword_id, weighted, score DESC, faculty_id)
+)
+"""
+
+CREATE_STATE_TABLE = """
+CREATE TABLE IF NOT EXISTS keyword_university_rank_state (
+    id TINYINT NOT NULL PRIMARY KEY,
+    last_publication_id BIGINT NOT NULL,
+    refreshed_at DATETIME NOT NULL
+)
+"""
+
+# Same counting rule as the live ranking query, grouped over every keyword
+RANKING_SCAN = """
+SELECT pk.keyword_id, u.id, u.name, COUNT(DISTINCT p.ID) AS total
+FROM publication p
+JOIN Publication_Keyword pk ON pk.publication_id = p.ID
+JOIN faculty_publication fp ON fp.publication_id = p.ID
+JOIN faculty f ON f.id = fp.faculty_id
+JOIN university u ON u.id = f.university_id
+{where}
+GROUP BY pk.keyword_id, u.id, u.name
+"""
+
+# Summed keyword scores and publication counts, as the live faculty search computes them
+FACULTY_SCAN = """
+SELECT fk.keyword_id, fk.faculty_id, SUM(fk.score), COALESCE(MAX(pubs.total), 0)
+FROM faculty_keyword fk
+LEFT JOIN (
+    SELECT faculty_id, COUNT(*) AS total FROM faculty_publication GROUP BY faculty_id
+) pubs ON pubs.faculty_id = fk.faculty_id
+{where}
+GROUP BY fk.keyword_id, fk.faculty_id
+"""
+
+
+def ensure_tables(cur):
+    cur.execute(CREATE_SUMMARY_TABLE)
+    cur.execute(CREATE_FACULTY_TABLE)
+    cur.execute(CREATE_STATE_TABLE)
+
+
+def _rank(rows):
+    """Group scan rows by keyword and number each keyword's universities 1..n."""
+    by_keyword = defaultdict(list)
+    for keyword_id, university_id, university_name, total in rows:
+        by_keyword[keyword_id].append((university_id, university_name, int(total)))
+
+    ranked = []
+    for keyword_id, universities in by_keyword.items():
+        # Ties break on university id so positions are stable between refreshes
+        universities.sort(key=lambda u: (-u[2], u[0]))
+        for position, (university_id, university_name, total) in enumerate(universities, start=1):
+            ranked.append((keyword_id, position, university_id, university_name, total))
+    return ranked
+
+
+def _score_faculty(rows):
+    """Two rows per scanned (keyword, faculty) pair: the plain and the weighted score."""
+    scored = []
+    for keyword_id, faculty_id, score, publications in rows:
+        score = float(score or 0)
+        scored.append((keyword_id, 0, round(score, 6), faculty_id))
+        scored.append((keyword_id, 1, round(score * math.log(2 + int(publications)), 6), faculty_id))
+    return scored
+
+
+def _faculty_scan(cur, faculty_ids=None):
+    if faculty_ids is None:
+        cur.execute(FACULTY_SCAN.format(where=""))
+    else:
+        placeholders = ','.join(['%s'] * len(faculty_ids))
+        cur.execute(FACULTY_SCAN.format(where=f"WHERE fk.faculty_id IN ({placeholders})"), list(faculty_ids))
+    return _score_faculty(cur.fetchall())
+
+
+def _write(cnx, ranked, keyword_ids=None, watermark=None, scored=(), faculty_ids=None):
+    cur = cnx.cursor()
+    try:
+        cnx.start_transaction()
+        if keyword_ids is None:
+            cur.execute("DELETE FROM keyword_university_rank")
+        elif keyword_ids:
+            placeholders = ','.join(['%s'] * len(keyword_ids))
+            cur.execute(
+                f"DELETE FROM keyword_university_rank WHERE keyword_id IN ({placeholders})",
+                list(keyword_ids),
+            )
+        if ranked:
+            cur.executemany(
+                "INSERT INTO keyword_university_rank "
+                "(keyword_id, position, university_id, university_name, total) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                ranked,
+            )
+        if faculty_ids is None:
+            cur.execute("DELETE FROM keyword_faculty_rank")
+        elif faculty_ids:
+            placeholders = ','.join(['%s'] * len(faculty_ids))
+            cur.execute(
+                f"DELETE FROM keyword_faculty_rank WHERE faculty_id IN ({placeholders})",
+                list(faculty_ids),
+            )
+        if scored:
+            cur.executemany(
+                "INSERT INTO keyword_faculty_rank (keyword_id, weighted, score, faculty_id) "
+                "VALUES (%s, %s, %s, %s)",
+                scored,
+            )
+        if watermark is not None:
+            cur.execute(
+                "REPLACE INTO keyword_university_rank_state (id, last_publication_id, refreshed_at) "
+                "VALUES (1, %s, NOW())",
+                (watermark,),
+            )
+        cnx.commit()
+    except Exception:
+        cnx.rollback()
+        raise
+    finally:
+        cur.close()
+    # Reaches the app's processes through the shared disk tier, if there is one
+    invalidate("rankings")
+
+
+def rebuild_all():
+    """Recompute the ranking for every keyword. Returns the number of keywords written."""
+    with get_pool().connection() as cnx:
+        cur = cnx.cursor()
+        try:
+            ensure_tables(cur)
+            cur.execute("SELECT COALESCE(MAX(ID), 0) FROM publication")
+            watermark = cur.fetchone()[0]
+            cur.execute(RANKING_SCAN.format(where=""))
+            ranked = _rank(cur.fetchall())
+            scored = _faculty_scan(cur)
+        finally:
+            cur.close()
+        _write(cnx, ranked, watermark=watermark, scored=scored)
+    return len({row[0] for row in ranked})
+
+
+def refresh_incremental():
+    """Re-rank only the keywords attached to publications added since the last refresh.
+
+    Faculty with new publications get their weighted scores recomputed; if
+    the faculty scores have never been built, they are built in full.
+
+    Returns the number of keywords re-ranked, or None when the summary has
+    never been built and a full rebuild is needed first.
+    """
+    with get_pool().connection() as cnx:
+        cur = cnx.cursor()
+        try:
+            ensure_tables(cur)
+            cur.execute("SELECT last_publication_id FROM keyword_university_rank_state WHERE id = 1")
+            state = cur.fetchone()
+            if state is None:
+                return None
+            last_seen = state[0]
+
+            cur.execute("SELECT COALESCE(MAX(ID), 0) FROM publication")
+            watermark = cur.fetchone()[0]
+            cur.execute("SELECT 1 FROM keyword_faculty_rank LIMIT 1")
+            faculty_built = cur.fetchone() is not None
+            if watermark <= last_seen and faculty_built:
+                return 0
+
+            cur.execute(
+                "SELECT DISTINCT keyword_id FROM Publication_Keyword WHERE publication_id > %s",
+                (last_seen,),
+            )
+            keyword_ids = [row[0] for row in cur.fetchall()]
+            ranked = []
+            if keyword_ids:
+                placeholders = ','.join(['%s'] * len(keyword_ids))
+                cur.execute(
+                    RANKING_SCAN.format(where=f"WHERE pk.keyword_id IN ({placeholders})"),
+                    keyword_ids,
+                )
+                ranked = _rank(cur.fetchall())
+
+            if faculty_built:
+                cur.execute(
+                    "SELECT DISTINCT faculty_id FROM faculty_publication WHERE publication_id > %s",
+                    (last_seen,),
+                )
+                faculty_ids = [row[0] for row in cur.fetchall()]
+                scored = _faculty_scan(cur, faculty_ids) if faculty_ids else []
+            else:
+                faculty_ids = None
+                scored = _faculty_scan(cur)
+        finally:
+            cur.close()
+
+        _write(cnx, ranked, keyword_ids=keyword_ids, watermark=watermark, scored=scored, faculty_ids=faculty_ids)
+    return len(keyword_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="rebuild every keyword instead of refreshing")
+    args = parser.parse_args()
+
+    count = None if args.full else refresh_incremental()
+    if count is None:
+        count = rebuild_all()
+    print(f"Ranked {count} keyword(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Cross-store keyword registry.
+
+MySQL, MongoDB and Neo4j each hold their own copy of the keyword vocabulary,
+and the names don't always agree on case or spacing. The registry is built
+once at startup and maps a normalized name to the keyword's MySQL id, its
+exact MongoDB name and its Neo4j node id, so every query can use indexed
+equality on an id instead of LOWER()/toLower() over a whole table or label.
+
+    python keyword_registry.py   # report keywords missing from a store
+"""
+from collections import namedtuple
+
+from mongodb_utils import get_all_publication_keywords
+from mysql_utils import get_keyword_ids
+from neo4j_utils import get_keyword_node_ids
+
+STORES = ("mysql", "mongodb", "neo4j")
+
+KeywordEntry = namedtuple("KeywordEntry", ["key", "name", "mysql_id", "mongo_name", "neo4j_id"])
+
+
+def normalize_keyword(name):
+    return " ".join(name.lower().split())
+
+
+class KeywordRegistry:
+    def __init__(self, mysql_rows, mongo_names, neo4j_rows):
+        ids = {}
+        for keyword_id, name in mysql_rows:
+            ids.setdefault(normalize_keyword(name), {})["mysql"] = (keyword_id, name)
+        for name in mongo_names:
+            if name:
+                ids.setdefault(normalize_keyword(name), {})["mongodb"] = name
+        for node_id, name in neo4j_rows:
+            if name:
+                ids.setdefault(normalize_keyword(name), {})["neo4j"] = (node_id, name)
+
+        self._entries = {}
+        for key, found in ids.items():
+            mysql_id, mysql_name = found.get("mysql", (None, None))
+            neo4j_id, neo4j_name = found.get("neo4j", (None, None))
+            mongo_name = found.get("mongodb")
+            # Prefer the MySQL spelling for display since the selector lists MySQL keywords
+            name = mysql_name or mongo_name or neo4j_name
+            self._entries[key] = KeywordEntry(key, name, mysql_id, mongo_name, neo4j_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return normalize_keyword(name) in self._entries
+
+    def resolve(self, name):
+        """KeywordEntry for a keyword name in any store's spelling, or None."""
+        return self._entries.get(normalize_keyword(name))
+
+    def missing(self):
+        """{store: [keyword names absent from that store]} for every store."""
+        fields = {"mysql": "mysql_id", "mongodb": "mongo_name", "neo4j": "neo4j_id"}
+        report = {store: [] for store in STORES}
+        for entry in self._entries.values():
+            for store, field in fields.items():
+                if getattr(entry, field) is None:
+                    report[store].append(entry.name)
+        for names in report.values():
+            names.sort()
+        return report
+
+
+def build_keyword_registry():
+    """Read each store's keyword vocabulary once and join them by normalized name."""
+    return KeywordRegistry(get_keyword_ids(), get_all_publication_keywords(), get_keyword_node_ids())
+
+
+def main():
+    registry = build_keyword_registry()
+    print(f"{len(registry)} distinct keywords across {', '.join(STORES)}")
+    for store, names in registry.missing().items():
+        print(f"\nMissing from {store} ({len(names)}):")
+        for name in names:
+            print(f"  {name}")
+
+
+if __name__ == "__main__":
+    main()
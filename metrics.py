@@ -0,0 +1,244 @@
+"""Latency, result size, error and cache metrics for the data-access layer.
+
+Every query function in mysql_utils, mongodb_utils and neo4j_utils is
+wrapped with @instrumented(backend). A call costs two perf_counter() reads,
+a bisect into fixed histogram buckets and a few integer adds under a
+per-function lock, so it is left on in production; set DASHBOARD_METRICS=0
+to turn the wrappers into no-ops at import time.
+
+Caches register a stats function with register_cache() and are read only
+when a snapshot is taken. snapshot() returns plain data, to_json() and
+to_prometheus() export it.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+ENABLED = os.environ.get("DASHBOARD_METRICS", "1") != "0"
+
+# Upper bounds in seconds, as in the Prometheus client defaults
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = "academicworld"
+
+
+class QueryStats:
+    """Counters and latency histogram for one function."""
+
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.max_rows = 0
+        # One slot per bucket plus +Inf
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._lock = threading.Lock()
+
+    def record(self, elapsed, rows, failed):
+        slot = bisect_left(LATENCY_BUCKETS, elapsed)
+        with self._lock:
+            self.calls += 1
+            self.seconds += elapsed
+            self.buckets[slot] += 1
+            if failed:
+                self.errors += 1
+            else:
+                self.rows += rows
+                if rows > self.max_rows:
+                    self.max_rows = rows
+
+    def quantile(self, q):
+        """Latency at quantile q, estimated as the upper bound of its bucket."""
+        if not self.calls:
+            return None
+        target = q * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "function": self.name,
+                "calls": self.calls,
+                "errors": self.errors,
+                "seconds": self.seconds,
+                "rows": self.rows,
+                "max_rows": self.max_rows,
+                "buckets": list(self.buckets),
+                "p50": self.quantile(0.5),
+                "p95": self.quantile(0.95),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.errors = self.rows = self.max_rows = 0
+            self.seconds = 0.0
+            self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+
+_stats = {}
+_caches = {}
+_registry_lock = threading.Lock()
+# Set while an instrumented call runs on this thread, so calls nested in it aren't recorded
+_active = threading.local()
+
+
+def _result_size(result):
+    if result is None:
+        return 0
+    if isinstance(result, (list, dict, set, frozenset)):
+        return len(result)
+    return 1
+
+
+def instrumented(backend, size=_result_size):
+    """Decorator recording latency, result size and errors of a data-access function.
+
+    `size(result)` gives the number of rows/documents/nodes returned; the
+    default counts list, dict and set results and treats anything else as one.
+    A call made from inside another instrumented function (get_user_interests
+    reading get_user_profile, say) is part of the outer call and isn't
+    recorded again.
+    """
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        stats = QueryStats(backend, fn.__qualname__)
+        with _registry_lock:
+            _stats[(backend, fn.__qualname__)] = stats
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_active, "inside", False):
+                return fn(*args, **kwargs)
+            _active.inside = True
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                stats.record(time.perf_counter() - started, 0, True)
+                raise
+            finally:
+                _active.inside = False
+            elapsed = time.perf_counter() - started
+            try:
+                rows = size(result)
+            except Exception:
+                rows = 0
+            stats.record(elapsed, rows, False)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def register_cache(name, backend, stats_fn):
+    """Report a cache's hits and misses; `stats_fn()` returns an object or dict with both."""
+    with _registry_lock:
+        _caches[name] = (backend, stats_fn)
+
+
+def _cache_counts(stats_fn):
+    info = stats_fn()
+    if isinstance(info, dict):
+        return info.get("hits", 0), info.get("misses", 0)
+    return info.hits, info.misses
+
+
+def snapshot():
+    """Plain-data copy of every function's and cache's counters."""
+    with _registry_lock:
+        stats = list(_stats.values())
+        caches = dict(_caches)
+
+    cache_rows = []
+    for name, (backend, stats_fn) in sorted(caches.items()):
+        try:
+            hits, misses = _cache_counts(stats_fn)
+        except Exception:
+            continue
+        total = hits + misses
+        cache_rows.append({
+            "cache": name,
+            "backend": backend,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else None,
+        })
+
+    functions = sorted((s.snapshot() for s in stats), key=lambda s: (s["backend"], s["function"]))
+    backends = {}
+    for row in functions:
+        total = backends.setdefault(row["backend"], {"calls": 0, "errors": 0, "seconds": 0.0, "rows": 0})
+        for field in total:
+            total[field] += row[field]
+    return {
+        "buckets": list(LATENCY_BUCKETS),
+        "functions": functions,
+        "backends": backends,
+        "caches": cache_rows,
+    }
+
+
+def reset():
+    with _registry_lock:
+        stats = list(_stats.values())
+    for s in stats:
+        s.reset()
+
+
+def to_json(data=None):
+    return json.dumps(data if data is not None else snapshot(), indent=2, default=str)
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def to_prometheus(data=None):
+    """Render a snapshot in the Prometheus text exposition format."""
+    data = data if data is not None else snapshot()
+    query = f"{METRIC_PREFIX}_query"
+    lines = [
+        f"# HELP {query}_duration_seconds Data-access call latency.",
+        f"# TYPE {query}_duration_seconds histogram",
+    ]
+    for row in data["functions"]:
+        labels = _labels(backend=row["backend"], function=row["function"])
+        cumulative = 0
+        for bound, count in zip(data["buckets"] + ["+Inf"], row["buckets"]):
+            cumulative += count
+            lines.append(f'{query}_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{query}_duration_seconds_sum{{{labels}}} {row['seconds']}")
+        lines.append(f"{query}_duration_seconds_count{{{labels}}} {row['calls']}")
+
+    for metric, field, help_text in (
+        ("errors_total", "errors", "Data-access calls that raised."),
+        ("result_rows_total", "rows", "Rows, documents or nodes returned."),
+    ):
+        lines.append(f"# HELP {query}_{metric} {help_text}")
+        lines.append(f"# TYPE {query}_{metric} counter")
+        for row in data["functions"]:
+            labels = _labels(backend=row["backend"], function=row["function"])
+            lines.append(f"{query}_{metric}{{{labels}}} {row[field]}")
+
+    cache = f"{METRIC_PREFIX}_cache"
+    for field in ("hits", "misses"):
+        lines.append(f"# HELP {cache}_{field}_total Cache {field}.")
+        lines.append(f"# TYPE {cache}_{field}_total counter")
+        for row in data["caches"]:
+            labels = _labels(cache=row["cache"], backend=row["backend"])
+            lines.append(f"{cache}_{field}_total{{{labels}}} {row[field]}")
+    return "\n".join(lines) + "\n"
@@ -1,37 +1,107 @@
-from pymongo import MongoClient
 from datetime import datetime
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["academicworld"]
+from backends import LazyCollection, LazyDatabase
+from metrics import instrumented
+from query_cache import PROFILE_TTL, QUERY_TTL, STATIC_TTL, cached, invalidates
+from snapshot import served
 
-faculty_col = db["faculty"]
-pub_col = db["publications"]
+# Connects on first use through the backend manager, not at import time
+db = LazyDatabase()
+
+faculty_col = LazyCollection("faculty")
+pub_col = LazyCollection("publications")
 # Removed separate favorites collection so everything goes in user_profile now
-user_profile_col = db["user_profile"]  # Single collection for all user data
+user_profile_col = LazyCollection("user_profile")  # Single collection for all user data
+
+@instrumented("mongodb")
+def ensure_indexes():
+    """Create the indexes the id-based lookups rely on (no-op if they already exist)"""
+    faculty_col.create_index("id")
+    pub_col.create_index("id")
+    pub_col.create_index("keywords.name")
+    user_profile_col.create_index("email")
 
+@served
+@cached("mongodb", STATIC_TTL, tags=("faculty",))
+@instrumented("mongodb")
 def get_all_universities():
     return sorted(faculty_col.distinct("affiliation.name"))
 
+@served
+@cached("mongodb", STATIC_TTL, tags=("faculty",))
+@instrumented("mongodb")
 def get_faculty_by_university(univ_name):
     return list(faculty_col.find({"affiliation.name": univ_name}))
 
+@served
+@cached("mongodb", STATIC_TTL, tags=("faculty",))
+@instrumented("mongodb")
 def get_all_faculty_names():
     return sorted([f["name"] for f in faculty_col.find({}, {"name": 1})])
 
+@served
+@cached("mongodb", STATIC_TTL, tags=("faculty",))
+@instrumented("mongodb")
 def get_faculty_by_name(name):
     return faculty_col.find_one({"name": name})
 
+@served
+@cached("mongodb", STATIC_TTL, tags=("faculty",))
+@instrumented("mongodb")
 def get_faculty_by_id(fid):
     return faculty_col.find_one({"id": fid})
 
+@served
+@cached("mongodb", STATIC_TTL, tags=("faculty",))
+@instrumented("mongodb")
+def get_faculty_by_ids(fids, fields=("id", "name")):
+    """Fetch several faculty members in one $in query, returning only the given fields in fids order"""
+    if not fids:
+        return []
+    projection = {field: 1 for field in fields}
+    projection["id"] = 1
+    projection["_id"] = 0
+    found = {doc["id"]: doc for doc in faculty_col.find({"id": {"$in": list(fids)}}, projection)}
+    return [found[fid] for fid in fids if fid in found]
+
+# Publications come from top_publications, so the (possibly huge) id list is left out
+PROFILE_FIELDS = ("id", "name", "position", "photoUrl", "affiliation.name")
+
+@instrumented("mongodb")
+def get_faculty_profiles_by_ids(fids):
+    """Profiles for several faculty members in one indexed $in query, keyed by id"""
+    return {doc["id"]: doc for doc in get_faculty_by_ids(fids, fields=PROFILE_FIELDS)}
+
+@served
+@cached("mongodb", STATIC_TTL, tags=("faculty",))
+@instrumented("mongodb")
+def get_faculty_ids():
+    """(id, name, university name) for every faculty document, for the cross-store faculty map"""
+    return [
+        (doc["id"], doc.get("name"), (doc.get("affiliation") or {}).get("name"))
+        for doc in faculty_col.find({}, {"_id": 0, "id": 1, "name": 1, "affiliation.name": 1})
+    ]
+
+@served
+@cached("mongodb", QUERY_TTL, tags=("publications",))
+@instrumented("mongodb")
 def get_publications_by_ids(pub_ids, limit=5):
     return list(pub_col.find({"id": {"$in": pub_ids}}).sort("numCitations", -1).limit(limit))
 
-def get_publication_counts_by_keyword(keyword, start_year):
+@served
+@cached("mongodb", STATIC_TTL, tags=("publications",))
+@instrumented("mongodb")
+def get_publication_counts_by_keyword(keyword, start_year, end_year=None):
+    """Publications per year for a keyword, from start_year up to (not including) end_year.
+
+    end_year defaults to the current year so the chart stops at the last full year.
+    """
+    if end_year is None:
+        end_year = datetime.utcnow().year
     pipeline = [
         {"$match": {
             "keywords.name": keyword,
-            "year": {"$gte": start_year}
+            "year": {"$gte": start_year, "$lt": end_year}
         }},
         {"$group": {
             "_id": "$year",
@@ -41,12 +111,41 @@ def get_publication_counts_by_keyword(keyword, start_year):
     ]
     results = list(pub_col.aggregate(pipeline))
 
-    years = list(range(start_year, 2025))
+    years = list(range(start_year, end_year))
     year_counts = {r["_id"]: r["count"] for r in results}
     return [year_counts.get(year, 0) for year in years], years
 
+@served
+@cached("mongodb", STATIC_TTL, tags=("publications", "keywords"))
+@instrumented("mongodb")
+def get_all_publication_keywords():
+    """Every keyword name used on a publication, as stored in MongoDB"""
+    return pub_col.distinct("keywords.name")
+
+@served
+@cached("mongodb", STATIC_TTL, tags=("publications", "keywords"))
+@instrumented("mongodb")
+def get_keyword_year_counts():
+    """Publication counts for every (keyword, year) pair in one pass over the collection"""
+    pipeline = [
+        {"$match": {"year": {"$type": "number"}}},
+        # A keyword listed twice on one publication still counts it once
+        {"$project": {"year": 1, "names": {"$setUnion": ["$keywords.name", []]}}},
+        {"$unwind": "$names"},
+        {"$group": {
+            "_id": {"keyword": "$names", "year": "$year"},
+            "count": {"$sum": 1}
+        }}
+    ]
+    return [
+        (r["_id"]["keyword"], int(r["_id"]["year"]), r["count"])
+        for r in pub_col.aggregate(pipeline, allowDiskUse=True)
+    ]
+
 # update the user profile functions so that everything in one collection now
 
+@invalidates("user_profile")
+@instrumented("mongodb")
 def create_or_update_user_profile(user_email, first_name=None, last_name=None):
     """Create or update basic user profile information"""
     update_data = {
@@ -67,11 +166,14 @@ def create_or_update_user_profile(user_email, first_name=None, last_name=None):
                 "interests": [],
                 "favorite_faculty": [],
                 "created_at": datetime.utcnow()
-            }
+            },
+            "$inc": {"version": 1}
         },
         upsert=True
     )
 
+@cached("mongodb", PROFILE_TTL, tags=("user_profile",))
+@instrumented("mongodb")
 def get_user_profile(user_email):
     """Get complete user profile"""
     profile = user_profile_col.find_one({"email": user_email})
@@ -80,6 +182,8 @@ def get_user_profile(user_email):
         profile = user_profile_col.find_one({"email": user_email})
     return profile
 
+@invalidates("user_profile")
+@instrumented("mongodb")
 def save_user_interests(user, interests):
     """Save user's research interests to their profile"""
     user_email = user.get("email") if isinstance(user, dict) else user
@@ -90,17 +194,22 @@ def save_user_interests(user, interests):
             "$set": {
                 "interests": interests,
                 "last_updated": datetime.utcnow()
-            }
+            },
+            "$inc": {"version": 1}
         },
         upsert=True
     )
 
+@cached("mongodb", PROFILE_TTL, tags=("user_profile",))
+@instrumented("mongodb")
 def get_user_interests(user):
     """Get user's research interests from their profile"""
     user_email = user.get("email") if isinstance(user, dict) else user
     profile = get_user_profile(user_email)
     return profile.get("interests", [])
 
+@invalidates("user_profile")
+@instrumented("mongodb")
 def add_user_interest(user, interest):
     """Add a single interest to user's profile"""
     user_email = user.get("email") if isinstance(user, dict) else user
@@ -109,11 +218,14 @@ def add_user_interest(user, interest):
         {"email": user_email},
         {
             "$addToSet": {"interests": interest},
-            "$set": {"last_updated": datetime.utcnow()}
+            "$set": {"last_updated": datetime.utcnow()},
+            "$inc": {"version": 1}
         },
         upsert=True
     )
 
+@invalidates("user_profile")
+@instrumented("mongodb")
 def remove_user_interest(user, interest):
     """Remove a single interest from user's profile"""
     user_email = user.get("email") if isinstance(user, dict) else user
@@ -122,15 +234,19 @@ def remove_user_interest(user, interest):
         {"email": user_email},
         {
             "$pull": {"interests": interest},
-            "$set": {"last_updated": datetime.utcnow()}
+            "$set": {"last_updated": datetime.utcnow()},
+            "$inc": {"version": 1}
         }
     )
 
+@invalidates("user_profile")
+@instrumented("mongodb")
 def save_to_favorites(user_email, faculty_id):
     """Add a faculty member to user's favorites with both ID and name"""
-    faculty = get_faculty_by_id(faculty_id)
-    if not faculty:
+    found = get_faculty_by_ids([faculty_id], fields=("name", "affiliation.name"))
+    if not found:
         return False 
+    faculty = found[0]
     
     profile = get_user_profile(user_email)
     current_favorites = profile.get("favorite_faculty", [])
@@ -152,17 +268,20 @@ def save_to_favorites(user_email, faculty_id):
             {"email": user_email},
             {
                 "$addToSet": {"favorite_faculty": favorite_obj},
-                "$set": {"last_updated": datetime.utcnow()}
+                "$set": {"last_updated": datetime.utcnow()},
+                "$inc": {"version": 1}
             },
             upsert=True
         )
         return True  
     return False  
 
+@cached("mongodb", PROFILE_TTL, tags=("user_profile",))
+@instrumented("mongodb")
 def get_favorites(user_email):
     """Get user's favorite faculty members"""
-    profile = get_user_profile(user_email)
-    favorite_faculty = profile.get("favorite_faculty", [])
+    profile = user_profile_col.find_one({"email": user_email}, {"favorite_faculty": 1})
+    favorite_faculty = profile.get("favorite_faculty", []) if profile else []
     
     formatted_favorites = []
     for fav in favorite_faculty:
@@ -175,6 +294,8 @@ def get_favorites(user_email):
             })
     return formatted_favorites
 
+@invalidates("user_profile")
+@instrumented("mongodb")
 def remove_from_favorites(user_email, faculty_id):
     """Remove a faculty member from user's favorites (handles both old and new format)"""
     user_profile_col.update_one(
@@ -185,10 +306,13 @@ def remove_from_favorites(user_email, faculty_id):
                     {"id": faculty_id}
                 ]}
             },
-            "$set": {"last_updated": datetime.utcnow()}
+            "$set": {"last_updated": datetime.utcnow()},
+            "$inc": {"version": 1}
         }
     )
 
+@invalidates("user_profile")
+@instrumented("mongodb")
 def clear_favorites(user_email):
     """Clear all favorites for a user"""
     user_profile_col.update_one(
@@ -197,15 +321,20 @@ def clear_favorites(user_email):
             "$set": {
                 "favorite_faculty": [],
                 "last_updated": datetime.utcnow()
-            }
+            },
+            "$inc": {"version": 1}
         }
     )
 
 
+@invalidates("user_profile")
+@instrumented("mongodb")
 def clear_user_profile(user_email):
     """Completely remove a user's profile (for testing/cleanup)"""
     user_profile_col.delete_one({"email": user_email})
 
+@cached("mongodb", PROFILE_TTL, tags=("user_profile",))
+@instrumented("mongodb")
 def get_user_stats(user_email):
     """Get summary statistics for a user"""
     profile = get_user_profile(user_email)
@@ -216,15 +345,18 @@ def get_user_stats(user_email):
         "last_updated": profile.get("last_updated")
     }
 
+@instrumented("mongodb")
 def save_user_profile(user, first_name, last_name, email):
     """Legacy function - now uses unified profile system"""
     create_or_update_user_profile(email, first_name, last_name)
 
+@instrumented("mongodb")
 def add_favorite_to_profile(user, faculty_id):
     """Legacy function - now uses unified profile system"""
     user_email = user.get("email") if isinstance(user, dict) else user
     save_to_favorites(user_email, faculty_id)
 
+@instrumented("mongodb")
 def remove_favorite_from_profile(user, faculty_id):
     """Legacy function - now uses unified profile system"""
     user_email = user.get("email") if isinstance(user, dict) else user
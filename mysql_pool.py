@@ -0,0 +1,175 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+
+MYSQL_CONFIG = {
+    "user": "root",
+    "password": "Apb_0328",
+    "host": "localhost",
+    "database": "academicworld",
+    # Pooled connections are reused across reruns, so every read must see
+    # freshly committed rows instead of an old REPEATABLE READ snapshot.
+    "autocommit": True,
+}
+
+POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", "5"))
+POOL_TIMEOUT = float(os.environ.get("MYSQL_POOL_TIMEOUT", "10"))
+# Idle connections older than this are pinged before being handed out again
+POOL_STALE_AFTER = float(os.environ.get("MYSQL_POOL_STALE_AFTER", "30"))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the pool timeout."""
+
+
+class ConnectionPool:
+    """Bounded pool of reusable MySQL connections."""
+
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 stale_after=POOL_STALE_AFTER, config=None, connect=None):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.size = size
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self._config = dict(config or MYSQL_CONFIG)
+        self._connect = connect or mysql.connector.connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "reconnects": 0,
+            "created": 0,
+            "discarded": 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """Snapshot of the pool counters plus current occupancy."""
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["size"] = self.size
+        snapshot["idle"] = self._idle.qsize()
+        return snapshot
+
+    def acquire(self):
+        """Check out a healthy connection, blocking while the pool is exhausted."""
+        if not self._slots.acquire(blocking=False):
+            self._count("waits")
+            if not self._slots.acquire(timeout=self.timeout):
+                raise PoolTimeout(
+                    f"no MySQL connection available after {self.timeout}s "
+                    f"(pool size {self.size})"
+                )
+        try:
+            cnx = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        self._count("checkouts")
+        return cnx
+
+    def _checkout(self):
+        while True:
+            try:
+                cnx, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                self._count("created")
+                return self._connect(**self._config)
+
+            if time.monotonic() - last_used < self.stale_after:
+                return cnx
+
+            # is_connected() pings the server, so only pay for it on connections
+            # that have been sitting idle long enough to have been dropped.
+            try:
+                if cnx.is_connected():
+                    return cnx
+                cnx.reconnect(attempts=1, delay=0)
+                self._count("reconnects")
+                return cnx
+            except mysql.connector.Error:
+                self._discard(cnx)
+
+    def release(self, cnx, discard=False):
+        """Return a connection to the pool, or close it if it is no longer usable."""
+        try:
+            if discard:
+                self._discard(cnx)
+            else:
+                self._idle.put((cnx, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def _discard(self, cnx):
+        self._count("discarded")
+        try:
+            cnx.close()
+        except mysql.connector.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        cnx = self.acquire()
+        try:
+            yield cnx
+        except mysql.connector.Error:
+            self.release(cnx, discard=not _is_alive(cnx))
+            raise
+        except Exception:
+            self.release(cnx)
+            raise
+        else:
+            self.release(cnx)
+
+    @contextmanager
+    def cursor(self, **kwargs):
+        with self.connection() as cnx:
+            cur = cnx.cursor(**kwargs)
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    def close(self):
+        """Close every idle connection; checked-out ones close on release."""
+        while True:
+            try:
+                cnx, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(cnx)
+
+
+def _is_alive(cnx):
+    try:
+        return cnx.is_connected()
+    except mysql.connector.Error:
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool shared by every query in mysql_utils."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def pool_stats():
+    return get_pool().stats()
@@ -1,34 +1,30 @@
 import mysql.connector
+from mysql.connector import errorcode
 
+from metrics import instrumented
+from mysql_pool import get_pool
+from query_cache import QUERY_TTL, STATIC_TTL, cached
+from snapshot import served
+
+@served
+@cached("mysql", STATIC_TTL, tags=("faculty",))
+@instrumented("mysql")
 def get_all_universities():
-    cnx = mysql.connector.connect(
-        user='root',
-        password='Apb_0328',
-        host='localhost',
-        database='academicworld'
-    )
-    cursor = cnx.cursor()
-    cursor.execute("SELECT DISTINCT name FROM university ORDER BY name;")
-    results = [row[0] for row in cursor.fetchall()]
-    cursor.close()
-    cnx.close()
+    with get_pool().cursor() as cursor:
+        cursor.execute("SELECT DISTINCT name FROM university ORDER BY name;")
+        results = [row[0] for row in cursor.fetchall()]
     return results
 
 
+@served
+@cached("mysql", QUERY_TTL, tags=("faculty", "keywords"))
+@instrumented("mysql")
 def get_faculty_by_keywords(keywords):
-    cnx = mysql.connector.connect(
-        user='root',
-        password='Apb_0328',
-        host='localhost',
-        database='academicworld'
-    )
-    cursor = cnx.cursor()
-
     placeholders = ','.join(['%s'] * len(keywords))
 
     base_query = f"""
-        SELECT 
-            f.name, f.position, f.photo_url,
+        SELECT
+            f.id, f.name, f.position, f.photo_url,
             f.email,
             u.name, u.photo_url
         FROM faculty f
@@ -46,37 +42,224 @@ def get_faculty_by_keywords(keywords):
         LIMIT 10;
     """
 
-    cursor.execute(base_query, params)
-    results = cursor.fetchall()
-    cursor.close()
-    cnx.close()
+    with get_pool().cursor() as cursor:
+        cursor.execute(base_query, params)
+        results = cursor.fetchall()
     return results
 
 
+@served
+@cached("mysql", STATIC_TTL, tags=("keywords",))
+@instrumented("mysql")
 def get_all_keywords():
-    cnx = mysql.connector.connect(
-        user='root',
-        password='Apb_0328',
-        host='localhost',
-        database='academicworld'
-    )
-    cursor = cnx.cursor()
-    cursor.execute("SELECT DISTINCT name FROM keyword ORDER BY name")
-    keywords = [row[0] for row in cursor.fetchall()]
-    cursor.close()
-    cnx.close()
+    with get_pool().cursor() as cursor:
+        cursor.execute("SELECT DISTINCT name FROM keyword ORDER BY name")
+        keywords = [row[0] for row in cursor.fetchall()]
     return keywords
 
 
-def get_university_pub_counts_by_keyword(keyword, top_n=10):
-    cnx = mysql.connector.connect(
-        user="root",
-        password="Apb_0328",
-        host="localhost",
-        database="academicworld",
-    )
-    cur = cnx.cursor()
+@served
+@cached("mysql", STATIC_TTL, tags=("keywords",))
+@instrumented("mysql")
+def get_keyword_ids():
+    """(id, name) for every keyword, for building the cross-store keyword registry"""
+    with get_pool().cursor() as cursor:
+        cursor.execute("SELECT id, name FROM keyword")
+        rows = cursor.fetchall()
+    return rows
+
+
+@served
+@cached("mysql", QUERY_TTL, tags=("faculty", "keywords"))
+@instrumented("mysql")
+def get_faculty_by_keyword_ids(keyword_ids):
+    """Same rows as get_faculty_by_keywords, matched on indexed keyword ids instead of names"""
+    placeholders = ','.join(['%s'] * len(keyword_ids))
+    sql = f"""
+        SELECT
+            f.id, f.name, f.position, f.photo_url,
+            f.email,
+            u.name, u.photo_url
+        FROM faculty f
+        JOIN faculty_keyword fk ON f.id = fk.faculty_id
+        JOIN university u ON f.university_id = u.id
+        WHERE fk.keyword_id IN ({placeholders})
+        GROUP BY f.id
+        LIMIT 10;
+    """
+
+    with get_pool().cursor() as cursor:
+        cursor.execute(sql, list(keyword_ids))
+        results = cursor.fetchall()
+    return results
+
+
+@served
+@cached("mysql", QUERY_TTL, tags=("faculty", "keywords", "publications", "rankings"))
+@instrumented("mysql", size=lambda page: len(page[0]))
+def search_faculty_by_keyword_ids(keyword_ids, weight_by_publications=False, page_size=10, after=None):
+    """Faculty ranked by their summed faculty_keyword score over keyword_ids.
+
+    With weight_by_publications the score is scaled by ln(2 + publication
+    count). Rows come back in (score DESC, id ASC) order, so the order is
+    deterministic and pages are fetched by keyset: pass the cursor returned
+    with one page as `after` to get the next one, with no OFFSET to skip
+    over. Returns (rows, next_cursor); next_cursor is None on the last page.
+
+    A single keyword is read from keyword_faculty_rank, built by
+    keyword_rankings.py, with a primary key range scan starting at the
+    cursor, so a deep page costs what the first one does. Several keywords,
+    or a summary that has not been built, are scored live.
+    """
+    keyword_ids = list(keyword_ids)
+    # One extra row tells us whether there is a next page
+    limit = page_size + 1
+    rows = None
+    if len(keyword_ids) == 1:
+        try:
+            rows = _ranked_faculty_page(keyword_ids[0], weight_by_publications, limit, after)
+        except mysql.connector.ProgrammingError as e:
+            if e.errno != errorcode.ER_NO_SUCH_TABLE:
+                raise
+    if rows is None:
+        rows = _scored_faculty_page(keyword_ids, weight_by_publications, limit, after)
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1][7], rows[-1][0])
+    return rows, next_cursor
+
+
+def _ranked_faculty_page(keyword_id, weight_by_publications, limit, after):
+    sql = """
+        SELECT
+            f.id, f.name, f.position, f.photo_url,
+            f.email,
+            u.name, u.photo_url,
+            r.score
+        FROM keyword_faculty_rank r
+        JOIN faculty f ON f.id = r.faculty_id
+        JOIN university u ON f.university_id = u.id
+        WHERE r.keyword_id = %s AND r.weighted = %s
+    """
+    params = [keyword_id, int(bool(weight_by_publications))]
+    if after is not None:
+        last_score, last_id = after
+        sql += """
+          AND (r.score < %s OR (r.score = %s AND r.faculty_id > %s))
+        """
+        params += [last_score, last_score, last_id]
+    sql += """
+        ORDER BY r.score DESC, r.faculty_id ASC
+        LIMIT %s;
+    """
+    params.append(limit)
+
+    with get_pool().cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _scored_faculty_page(keyword_ids, weight_by_publications, limit, after):
+    placeholders = ','.join(['%s'] * len(keyword_ids))
+    score = "SUM(fk.score)"
+    if weight_by_publications:
+        score += """ * LN(2 + (
+            SELECT COUNT(*) FROM faculty_publication fp WHERE fp.faculty_id = fk.faculty_id
+        ))"""
+
+    sql = f"""
+        SELECT
+            f.id, f.name, f.position, f.photo_url,
+            f.email,
+            u.name, u.photo_url,
+            ranked.score
+        FROM (
+            SELECT fk.faculty_id, ROUND({score}, 6) AS score
+            FROM faculty_keyword fk
+            WHERE fk.keyword_id IN ({placeholders})
+            GROUP BY fk.faculty_id
+        ) ranked
+        JOIN faculty f ON f.id = ranked.faculty_id
+        JOIN university u ON f.university_id = u.id
+    """
+    params = list(keyword_ids)
+    if after is not None:
+        last_score, last_id = after
+        sql += """
+        WHERE ranked.score < %s OR (ranked.score = %s AND f.id > %s)
+        """
+        params += [last_score, last_score, last_id]
+    sql += """
+        ORDER BY ranked.score DESC, f.id ASC
+        LIMIT %s;
+    """
+    params.append(limit)
 
+    with get_pool().cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+@served
+@cached("mysql", STATIC_TTL, tags=("faculty",))
+@instrumented("mysql")
+def get_faculty_ids():
+    """(id, name, university name) for every faculty member, for the cross-store faculty map"""
+    with get_pool().cursor() as cursor:
+        cursor.execute("""
+            SELECT f.id, f.name, u.name
+            FROM faculty f
+            LEFT JOIN university u ON u.id = f.university_id
+        """)
+        rows = cursor.fetchall()
+    return rows
+
+
+@served
+@cached("mysql", STATIC_TTL, tags=("faculty", "keywords"))
+@instrumented("mysql")
+def get_faculty_keyword_pairs():
+    """(faculty id, keyword id) for every faculty interest, for the keyword co-occurrence matrix"""
+    with get_pool().cursor() as cursor:
+        cursor.execute("SELECT faculty_id, keyword_id FROM faculty_keyword")
+        rows = cursor.fetchall()
+    return rows
+
+
+@served
+@cached("mysql", STATIC_TTL, tags=("faculty", "keywords"))
+@instrumented("mysql")
+def get_faculty_keyword_scores(faculty_ids=None):
+    """(faculty id, keyword id, score) for every faculty interest, or only those of faculty_ids"""
+    sql = "SELECT faculty_id, keyword_id, score FROM faculty_keyword"
+    params = ()
+    if faculty_ids is not None:
+        if not faculty_ids:
+            return []
+        sql += f" WHERE faculty_id IN ({','.join(['%s'] * len(faculty_ids))})"
+        params = list(faculty_ids)
+    with get_pool().cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return rows
+
+
+@served
+@instrumented("mysql")
+def get_keyword_table_signature():
+    """Cheap fingerprint of the keyword table, used to notice when it changes"""
+    with get_pool().cursor() as cursor:
+        cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM keyword")
+        count, max_id = cursor.fetchone()
+    return (count, max_id)
+
+
+@served
+@cached("mysql", STATIC_TTL, tags=("keywords", "publications"))
+@instrumented("mysql")
+def get_university_pub_counts_by_keyword(keyword, top_n=10):
     sql = """
     SELECT u.name AS university, COUNT(DISTINCT p.ID) AS total
     FROM publication p
@@ -85,14 +268,64 @@ def get_university_pub_counts_by_keyword(keyword, top_n=10):
     JOIN faculty_publication fp ON fp.publication_id = p.ID
     JOIN faculty f ON f.id = fp.faculty_id
     JOIN university u ON u.id = f.university_id
-    WHERE LOWER(k.name) = LOWER(%s)           -- exact, case-insensitive match
+    WHERE LOWER(k.name) = LOWER(%s)           -- exact, case-insensitive match, whatever the collation
     GROUP BY u.id, u.name
     ORDER BY total DESC
     LIMIT %s;
     """
 
-    cur.execute(sql, (keyword, top_n))
-    rows = cur.fetchall()
-    cur.close()
-    cnx.close()
+    with get_pool().cursor() as cur:
+        cur.execute(sql, (keyword, top_n))
+        rows = cur.fetchall()
+    return rows
+
+
+@served
+@cached("mysql", STATIC_TTL, tags=("keywords", "publications"))
+@instrumented("mysql")
+def get_university_pub_counts_by_keyword_id(keyword_id, top_n=10):
+    sql = """
+    SELECT u.name AS university, COUNT(DISTINCT p.ID) AS total
+    FROM publication p
+    JOIN Publication_Keyword pk ON pk.publication_id = p.ID
+    JOIN faculty_publication fp ON fp.publication_id = p.ID
+    JOIN faculty f ON f.id = fp.faculty_id
+    JOIN university u ON u.id = f.university_id
+    WHERE pk.keyword_id = %s
+    GROUP BY u.id, u.name
+    ORDER BY total DESC
+    LIMIT %s;
+    """
+
+    with get_pool().cursor() as cur:
+        cur.execute(sql, (keyword_id, top_n))
+        rows = cur.fetchall()
+    return rows
+
+
+@served
+@cached("mysql", STATIC_TTL, tags=("rankings",))
+@instrumented("mysql")
+def get_university_rankings(keyword_id, top_n=10, offset=0):
+    """Read a keyword's ranking from the table built by keyword_rankings.py.
+
+    Serves any slice of the ranking, not just the top 10, with a primary key
+    range scan. Falls back to the live join if the summary has not been built.
+    """
+    sql = """
+    SELECT university_name, total
+    FROM keyword_university_rank
+    WHERE keyword_id = %s
+      AND position > %s AND position <= %s
+    ORDER BY position;
+    """
+
+    try:
+        with get_pool().cursor() as cur:
+            cur.execute(sql, (keyword_id, offset, offset + top_n))
+            rows = cur.fetchall()
+    except mysql.connector.ProgrammingError as e:
+        if e.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+        return get_university_pub_counts_by_keyword_id(keyword_id, top_n=offset + top_n)[offset:]
     return rows
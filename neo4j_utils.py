@@ -1,7 +1,19 @@
-from neo4j import GraphDatabase
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
 
-driver = GraphDatabase.driver("bolt://localhost:7687", auth=("neo4j", "Apb_0328"))
+from backends import LazyDriver
+from metrics import instrumented, register_cache
+from query_cache import STATIC_TTL, cached
+import snapshot
+from snapshot import served
 
+# Connects on the first session through the backend manager, not at import time
+driver = LazyDriver()
+
+@served
+@cached("neo4j", STATIC_TTL, tags=("faculty", "keywords"))
+@instrumented("neo4j")
 def get_keyword_faculty_network(selected_keyword):
     selected_keyword = selected_keyword.lower() 
     query = """
@@ -22,14 +34,79 @@ def get_keyword_faculty_network(selected_keyword):
                 "co_keywords": row["co_keywords"]
             })
         return data
-    
 
-driver = GraphDatabase.driver(
-    "bolt://localhost:7687", 
-    auth=("neo4j", "Apb_0328"), 
-    encrypted=False
-)
 
+@served
+@cached("neo4j", STATIC_TTL, tags=("faculty", "keywords"))
+@instrumented("neo4j")
+def get_keyword_faculty_network_by_id(keyword_node_id):
+    """Same rows as get_keyword_faculty_network, starting from the keyword's node id"""
+    query = """
+    MATCH (k:KEYWORD)
+    WHERE id(k) = $node_id
+    WITH k
+    MATCH (k)<-[:INTERESTED_IN]-(f:FACULTY)-[:INTERESTED_IN]->(other:KEYWORD)
+    RETURN f.name AS faculty, k.name AS keyword, collect(DISTINCT other.name) AS co_keywords
+    LIMIT 20
+    """
+    with driver.session(database="academicworld") as session:
+        result = session.run(query, node_id=keyword_node_id)
+        return [
+            {
+                "faculty": row["faculty"],
+                "keyword": row["keyword"],
+                "co_keywords": row["co_keywords"]
+            }
+            for row in result
+        ]
+
+
+@served
+@cached("neo4j", STATIC_TTL, tags=("keywords",))
+@instrumented("neo4j")
+def get_keyword_node_ids():
+    """(node id, name) for every KEYWORD node, for the cross-store keyword registry"""
+    query = """
+    MATCH (k:KEYWORD)
+    RETURN id(k) AS node_id, k.name AS keyword
+    """
+    with driver.session(database="academicworld") as session:
+        result = session.run(query)
+        return [(row["node_id"], row["keyword"]) for row in result]
+
+
+@served
+@cached("neo4j", STATIC_TTL, tags=("faculty",))
+@instrumented("neo4j")
+def get_faculty_node_ids():
+    """(node id, name, institute name) for every FACULTY node, for the cross-store faculty map"""
+    query = """
+    MATCH (f:FACULTY)
+    OPTIONAL MATCH (f)-[:AFFILIATION_WITH]->(i:INSTITUTE)
+    RETURN id(f) AS node_id, f.name AS faculty, head(collect(i.name)) AS institute
+    """
+    with driver.session(database="academicworld") as session:
+        result = session.run(query)
+        return [(row["node_id"], row["faculty"], row["institute"]) for row in result]
+
+
+@served
+@cached("neo4j", STATIC_TTL, tags=("faculty", "keywords"))
+@instrumented("neo4j")
+def get_faculty_keyword_node_pairs():
+    """(faculty node id, keyword node id) for every INTERESTED_IN edge, for the co-occurrence matrix"""
+    query = """
+    MATCH (f:FACULTY)-[:INTERESTED_IN]->(k:KEYWORD)
+    RETURN id(f) AS faculty_id, id(k) AS keyword_id
+    """
+    with driver.session(database="academicworld") as session:
+        result = session.run(query)
+        return [(row["faculty_id"], row["keyword_id"]) for row in result]
+
+
+@served
+@cached("neo4j", STATIC_TTL, tags=("faculty", "keywords"))
+@instrumented("neo4j")
 def get_all_neo4j_keywords():
     query = """
     MATCH (f:FACULTY)-[:INTERESTED_IN]->(k:KEYWORD)
@@ -41,8 +118,136 @@ def get_all_neo4j_keywords():
         return [row["keyword"] for row in result]
 
 
+# Ego networks are shared by every session. Each hop expands at most
+# EGO_MAX_FRONTIER keywords by at most EGO_MAX_FACULTY faculty each, so every
+# cached entry, and with it the whole cache, has a bounded size.
+EGO_CACHE_SIZE = 256
+EGO_MAX_FACULTY = 200
+EGO_MAX_FRONTIER = 25
+EGO_MAX_DEPTH = 3
+
+NODE_KEYWORD = "keyword"
+NODE_FACULTY = "faculty"
+EDGE_INTEREST = "interest"
+EDGE_CO_KEYWORD = "co_keyword"
+
+# Compact adjacency: parallel node arrays, and edges as index pairs into them.
+# Co-keyword edge weights count the faculty who link the two keywords.
+EgoNetwork = namedtuple("EgoNetwork", [
+    "center",
+    "node_ids", "labels", "kinds", "hops",
+    "sources", "targets", "weights", "edge_kinds",
+])
+
+EGO_HOP_QUERY = """
+UNWIND $frontier AS kid
+MATCH (k:KEYWORD)<-[r:INTERESTED_IN]-(f:FACULTY)
+WHERE id(k) = kid
+WITH k, f, r
+ORDER BY r.score DESC, id(f)
+WITH k, collect(f)[..$faculty_limit] AS faculty
+UNWIND faculty AS f
+MATCH (f)-[:INTERESTED_IN]->(other:KEYWORD)
+WHERE other <> k
+RETURN id(k) AS source, k.name AS source_name,
+       id(f) AS faculty_id, f.name AS faculty,
+       id(other) AS other_id, other.name AS other
+"""
+
+
+@contextmanager
+def _ego_hops():
+    """A function running EGO_HOP_QUERY for (frontier, faculty_limit), on one session or the snapshot."""
+    current = snapshot.current()
+    if current is not None:
+        yield current.ego_hop
+        return
+    with driver.session(database="academicworld") as session:
+        yield lambda frontier, faculty_limit: list(
+            session.run(EGO_HOP_QUERY, frontier=frontier, faculty_limit=faculty_limit)
+        )
+
+
+@lru_cache(maxsize=EGO_CACHE_SIZE)
+@instrumented("neo4j", size=lambda network: len(network.node_ids))
+def get_keyword_ego_network(keyword_node_id, depth=1, faculty_limit=20, min_weight=1):
+    """Faculty and co-keywords around a keyword node, up to `depth` keyword hops out.
+
+    Each hop takes up to `faculty_limit` faculty (highest INTERESTED_IN score
+    first) per frontier keyword, and keeps the co-keywords shared by at least
+    `min_weight` of them; the kept co-keywords are the next hop's frontier.
+    Returns an immutable EgoNetwork, LRU-cached across sessions.
+    """
+    depth = max(1, min(depth, EGO_MAX_DEPTH))
+    faculty_limit = max(1, min(faculty_limit, EGO_MAX_FACULTY))
+
+    index = {}
+    node_ids, labels, kinds, hops = [], [], [], []
+    edges = {}
+
+    def node(kind, node_id, label, hop):
+        key = (kind, node_id)
+        if key not in index:
+            index[key] = len(node_ids)
+            node_ids.append(node_id)
+            labels.append(label)
+            kinds.append(kind)
+            hops.append(hop)
+        return index[key]
+
+    frontier = [keyword_node_id]
+    visited = {keyword_node_id}
+    with _ego_hops() as run_hop:
+        for hop in range(1, depth + 1):
+            rows = run_hop(frontier, faculty_limit)
+            if not rows:
+                break
+
+            shared = {}
+            for row in rows:
+                source = node(NODE_KEYWORD, row["source"], row["source_name"], hop - 1)
+                faculty = node(NODE_FACULTY, row["faculty_id"], row["faculty"], hop)
+                edges[(faculty, source, EDGE_INTEREST)] = 1
+                pair = (row["source"], row["other_id"])
+                shared.setdefault(pair, [row["other"], set()])[1].add(row["faculty_id"])
+
+            next_frontier = {}
+            for (source_id, other_id), (other_name, faculty_ids) in shared.items():
+                if len(faculty_ids) < min_weight:
+                    continue
+                source = index[(NODE_KEYWORD, source_id)]
+                other = node(NODE_KEYWORD, other_id, other_name, hop)
+                edges[(source, other, EDGE_CO_KEYWORD)] = len(faculty_ids)
+                for faculty_id in faculty_ids:
+                    edges[(index[(NODE_FACULTY, faculty_id)], other, EDGE_INTEREST)] = 1
+                if other_id not in visited:
+                    next_frontier[other_id] = max(next_frontier.get(other_id, 0), len(faculty_ids))
+            # Expand the most widely shared co-keywords first
+            frontier = sorted(next_frontier, key=lambda k: (-next_frontier[k], k))[:EGO_MAX_FRONTIER]
+            visited.update(frontier)
+            if not frontier:
+                break
+
+    ordered = sorted(edges.items())
+    return EgoNetwork(
+        center=keyword_node_id,
+        node_ids=tuple(node_ids),
+        labels=tuple(labels),
+        kinds=tuple(kinds),
+        hops=tuple(hops),
+        sources=tuple(src for (src, _, _), _ in ordered),
+        targets=tuple(dst for (_, dst, _), _ in ordered),
+        weights=tuple(weight for _, weight in ordered),
+        edge_kinds=tuple(kind for (_, _, kind), _ in ordered),
+    )
+
 
+def ego_network_cache_info():
+    return get_keyword_ego_network.cache_info()
 
 
+def clear_ego_network_cache():
+    get_keyword_ego_network.cache_clear()
 
 
+register_cache("ego_network", "neo4j", ego_network_cache_info)
@@ -0,0 +1,198 @@
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from metrics import instrumented
+from mongodb_utils import create_or_update_user_profile, user_profile_col
+from query_cache import invalidate
+
+# How many times flush() reloads and replays after losing a version race
+MAX_FLUSH_RETRIES = 3
+
+
+class ProfileConflict(Exception):
+    """Raised when pending changes keep losing to concurrent writers."""
+
+
+class ProfileStore:
+    """Session-local, write-through copy of one user's user_profile document.
+
+    The document is read once, interest and favorite checks are answered from
+    memory, and mutations are applied to memory right away and queued. flush()
+    sends every queued change in one ordered bulk_write. Each write is guarded
+    by the document's `version` field and bumps it, so if another tab wrote in
+    the meantime the guard stops matching, and the store reloads the document
+    and replays the unsent changes on top of it instead of overwriting them.
+    """
+
+    def __init__(self, email, collection=None):
+        self.email = email
+        self._col = collection if collection is not None else user_profile_col
+        self._pending = []
+        self.reload()
+
+    @instrumented("mongodb")
+    def reload(self):
+        doc = self._col.find_one({"email": self.email})
+        if not doc:
+            create_or_update_user_profile(self.email)
+            doc = self._col.find_one({"email": self.email})
+        if "version" not in doc:
+            # Profiles written before versioning start at 0
+            self._col.update_one(
+                {"email": self.email, "version": {"$exists": False}},
+                {"$set": {"version": 0}},
+            )
+            doc = self._col.find_one({"email": self.email})
+        self._doc = doc
+        # Replay unsent changes, dropping any a concurrent writer already made
+        self._pending = [op for op in self._pending if op[2](doc)]
+        for apply, _, _ in self._pending:
+            apply(doc)
+
+    @property
+    def version(self):
+        return self._doc.get("version", 0)
+
+    @property
+    def dirty(self):
+        return bool(self._pending)
+
+    # Reads
+
+    def get_interests(self):
+        return list(self._doc.get("interests", []))
+
+    def has_interest(self, interest):
+        return interest in self._doc.get("interests", [])
+
+    def get_favorites(self):
+        """Same shape as mongodb_utils.get_favorites"""
+        return [
+            {
+                "faculty_id": fav["id"],
+                "name": fav["name"],
+                "university": fav.get("university", "Unknown"),
+                "added_at": fav.get("added_at"),
+            }
+            for fav in self._doc.get("favorite_faculty", [])
+            if isinstance(fav, dict)
+        ]
+
+    def is_favorite(self, faculty_id):
+        return any(
+            isinstance(fav, dict) and fav.get("id") == faculty_id
+            for fav in self._doc.get("favorite_faculty", [])
+        )
+
+    # Mutations
+
+    def _queue(self, apply, update, needed=lambda doc: True):
+        apply(self._doc)
+        self._pending.append((apply, update, needed))
+
+    def save_interests(self, interests):
+        interests = list(interests)
+
+        def apply(doc):
+            doc["interests"] = list(interests)
+
+        self._queue(apply, {"$set": {"interests": interests}})
+
+    def add_interest(self, interest):
+        if self.has_interest(interest):
+            return False
+
+        def apply(doc):
+            doc.setdefault("interests", []).append(interest)
+
+        def needed(doc):
+            return interest not in doc.get("interests", [])
+
+        self._queue(apply, {"$addToSet": {"interests": interest}}, needed)
+        return True
+
+    def remove_interest(self, interest):
+        def apply(doc):
+            doc["interests"] = [i for i in doc.get("interests", []) if i != interest]
+
+        self._queue(apply, {"$pull": {"interests": interest}})
+
+    def save_to_favorites(self, faculty_id, name, university="Unknown University"):
+        if self.is_favorite(faculty_id):
+            return False
+        favorite_obj = {
+            "id": faculty_id,
+            "name": name,
+            "university": university,
+            "added_at": datetime.utcnow(),
+        }
+
+        def apply(doc):
+            doc.setdefault("favorite_faculty", []).append(favorite_obj)
+
+        def needed(doc):
+            return not any(
+                isinstance(f, dict) and f.get("id") == faculty_id
+                for f in doc.get("favorite_faculty", [])
+            )
+
+        self._queue(apply, {"$push": {"favorite_faculty": favorite_obj}}, needed)
+        return True
+
+    def remove_from_favorites(self, faculty_id):
+        def apply(doc):
+            doc["favorite_faculty"] = [
+                f for f in doc.get("favorite_faculty", [])
+                if not (isinstance(f, dict) and f.get("id") == faculty_id)
+            ]
+
+        self._queue(apply, {"$pull": {"favorite_faculty": {"id": faculty_id}}})
+
+    # Write-back
+
+    @instrumented("mongodb", size=lambda written: written)
+    def flush(self):
+        """Write queued changes back in one bulk_write. Returns how many were written."""
+        written = 0
+        for _ in range(MAX_FLUSH_RETRIES + 1):
+            if not self._pending:
+                return written
+
+            base = self.version
+            ops = []
+            token = None
+            for i, (_, update, _) in enumerate(self._pending):
+                # Each op requires the version and the token the previous op
+                # left behind, so once one op misses, every later op misses too
+                # even if another writer bumps the version in between.
+                guard = {"email": self.email, "version": base + i}
+                if token is not None:
+                    guard["write_token"] = token
+                token = ObjectId()
+                update = dict(update)
+                update["$set"] = {
+                    **update.get("$set", {}),
+                    "write_token": token,
+                    "last_updated": datetime.utcnow(),
+                }
+                update["$inc"] = {"version": 1}
+                ops.append(UpdateOne(guard, update))
+
+            result = self._col.bulk_write(ops, ordered=True)
+            applied = result.modified_count
+            written += applied
+            if applied:
+                invalidate("user_profile")
+            self._pending = self._pending[applied:]
+            self._doc["version"] = base + applied
+
+            if self._pending:
+                # Someone else wrote first: pick up their changes, replay ours
+                self.reload()
+
+        raise ProfileConflict(
+            f"could not write {len(self._pending)} profile change(s) for {self.email} "
+            f"after {MAX_FLUSH_RETRIES} retries"
+        )
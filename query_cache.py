@@ -0,0 +1,471 @@
+"""Shared result cache for the read functions in mysql_utils, mongodb_utils and neo4j_utils.
+
+Read functions are wrapped with @cached(backend, ttl, tags). Results are
+pickled and kept in a process-wide LRU bounded by their total size, so
+every session shares them and every hit hands out its own copy. Each
+function has its own TTL: catalog data that only changes on a reload is
+kept for an hour, user profiles for a minute.
+
+Set QUERY_CACHE_PATH to a file to add an on-disk tier (SQLite). Results
+written there survive a restart, so a new process starts warm, and several
+processes (app workers, the keyword_rankings cron job) share it.
+
+Write paths call invalidate(tag) for the data they changed; every cached
+function that declared the tag is dropped from memory and disk. With the
+disk tier, other processes notice the invalidation within
+INVALIDATION_POLL_SECONDS. Set QUERY_CACHE=0 to turn caching off.
+
+    python query_cache.py --stats
+    python query_cache.py --invalidate user_profile
+    python query_cache.py --clear
+"""
+import argparse
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import register_cache
+
+ENABLED = os.environ.get("QUERY_CACHE", "1") != "0"
+MEMORY_BYTES = int(os.environ.get("QUERY_CACHE_BYTES", 64 * 1024 * 1024))
+DISK_PATH = os.environ.get("QUERY_CACHE_PATH")
+DISK_BYTES = int(os.environ.get("QUERY_CACHE_DISK_BYTES", 512 * 1024 * 1024))
+INVALIDATION_POLL_SECONDS = 5.0
+# Prune expired and least recently used disk entries every this many writes
+DISK_PRUNE_EVERY = 200
+
+# TTLs in seconds
+STATIC_TTL = 3600
+QUERY_TTL = 600
+PROFILE_TTL = 60
+
+# Bump when a cached function's return shape changes, so old disk entries are ignored
+CACHE_FORMAT = 1
+
+DISK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_cache (
+    key TEXT PRIMARY KEY,
+    function TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS query_cache_accessed ON query_cache (accessed);
+CREATE TABLE IF NOT EXISTS query_cache_generation (
+    tag TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+);
+"""
+
+
+class FunctionStats:
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.name = name
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+
+    def snapshot(self):
+        return {
+            "backend": self.backend,
+            "function": self.name,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+        }
+
+
+class DiskTier:
+    """SQLite table of pickled results, shared by every process pointed at the same file."""
+
+    def __init__(self, path, max_bytes):
+        self.max_bytes = max_bytes
+        self._cnx = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._cnx.execute("PRAGMA journal_mode=WAL")
+        self._cnx.executescript(DISK_SCHEMA)
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key, now):
+        with self._lock:
+            row = self._cnx.execute(
+                "SELECT function, tags, expires, value FROM query_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] <= now:
+                self._cnx.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+                return None
+            self._cnx.execute("UPDATE query_cache SET accessed = ? WHERE key = ?", (now, key))
+        function, tags, expires, value = row
+        return function, tuple(t for t in tags.split(",") if t), expires, value
+
+    def put(self, key, function, tags, expires, value, now):
+        with self._lock:
+            self._cnx.execute(
+                "INSERT OR REPLACE INTO query_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, function, "," + ",".join(tags) + ",", expires, now, len(value), value),
+            )
+            self._writes += 1
+            if self._writes % DISK_PRUNE_EVERY == 0:
+                self._prune(now)
+
+    def _prune(self, now):
+        self._cnx.execute("DELETE FROM query_cache WHERE expires <= ?", (now,))
+        total = self._cnx.execute("SELECT COALESCE(SUM(size), 0) FROM query_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self._cnx.execute("SELECT key, size FROM query_cache ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self._cnx.executemany("DELETE FROM query_cache WHERE key = ?", victims)
+
+    def invalidate(self, tag):
+        """Drop the tag's entries and bump its generation, so other processes drop theirs."""
+        with self._lock:
+            self._cnx.execute("BEGIN IMMEDIATE")
+            try:
+                self._cnx.execute("DELETE FROM query_cache WHERE tags LIKE ?", (f"%,{tag},%",))
+                self._cnx.execute(
+                    "INSERT INTO query_cache_generation VALUES (?, 1) "
+                    "ON CONFLICT(tag) DO UPDATE SET generation = generation + 1",
+                    (tag,),
+                )
+                self._cnx.execute("COMMIT")
+            except Exception:
+                self._cnx.execute("ROLLBACK")
+                raise
+
+    def generations(self):
+        with self._lock:
+            return dict(self._cnx.execute("SELECT tag, generation FROM query_cache_generation"))
+
+    def clear(self, function=None):
+        with self._lock:
+            if function is None:
+                self._cnx.execute("DELETE FROM query_cache")
+            else:
+                self._cnx.execute("DELETE FROM query_cache WHERE function = ?", (function,))
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._cnx.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM query_cache"
+            ).fetchone()
+        return {"disk_entries": entries, "disk_bytes": size, "disk_max_bytes": self.max_bytes}
+
+
+class QueryCache:
+    """Memory LRU of pickled results, bounded by bytes, over an optional DiskTier."""
+
+    def __init__(self, max_bytes=MEMORY_BYTES, disk=None):
+        self.max_bytes = max_bytes
+        self.disk = disk
+        # key -> (function, tags, expires, pickled value)
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._functions = {}
+        # Bumped by invalidate(); a miss computed across a bump isn't stored
+        self._generations = {}
+        self._disk_generations = {}
+        self._polled_at = 0.0
+        self.evictions = 0
+        self.invalidations = 0
+        if disk is not None:
+            self._disk_generations = self._read_disk_generations()
+            self._polled_at = time.monotonic()
+
+    def register(self, backend, name):
+        stats = FunctionStats(backend, name)
+        with self._lock:
+            self._functions[name] = stats
+        return stats
+
+    # Memory tier
+
+    def _get_memory(self, key, now):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= now:
+                self._drop(key)
+                return None
+            self._items.move_to_end(key)
+            return entry
+
+    def _put_memory(self, key, entry):
+        size = len(entry[3])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._items)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        entry = self._items.pop(key)
+        self._size -= len(entry[3])
+
+    def _drop_tag(self, tag):
+        with self._lock:
+            for key in [k for k, entry in self._items.items() if tag in entry[1]]:
+                self._drop(key)
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    # Cross-process invalidation, through the disk tier's generation table
+
+    def _read_disk_generations(self):
+        try:
+            return self.disk.generations()
+        except sqlite3.Error:
+            return dict(self._disk_generations)
+
+    def _poll_invalidations(self):
+        if self.disk is None or time.monotonic() - self._polled_at < INVALIDATION_POLL_SECONDS:
+            return
+        self._polled_at = time.monotonic()
+        current = self._read_disk_generations()
+        for tag, generation in current.items():
+            if self._disk_generations.get(tag) != generation:
+                self._drop_tag(tag)
+        self._disk_generations = current
+
+    # Lookups
+
+    def generation(self, tags):
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def get(self, key, stats):
+        """(True, value) on a hit, (False, None) on a miss."""
+        self._poll_invalidations()
+        now = time.time()
+        entry = self._get_memory(key, now)
+        if entry is not None:
+            stats.hits += 1
+            return True, pickle.loads(entry[3])
+        if self.disk is not None:
+            try:
+                entry = self.disk.get(key, now)
+            except sqlite3.Error:
+                entry = None
+            if entry is not None:
+                self._put_memory(key, entry)
+                stats.disk_hits += 1
+                return True, pickle.loads(entry[3])
+        stats.misses += 1
+        return False, None
+
+    def put(self, key, function, tags, ttl, value, generation):
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        if self.generation(tags) != generation:
+            # A write invalidated these tags while the query ran; its result may be stale
+            return
+        now = time.time()
+        entry = (function, tuple(tags), now + ttl, blob)
+        self._put_memory(key, entry)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, function, entry[1], entry[2], blob, now)
+            except sqlite3.Error:
+                pass
+
+    def invalidate(self, tag):
+        self.invalidations += 1
+        self._drop_tag(tag)
+        if self.disk is not None:
+            try:
+                self.disk.invalidate(tag)
+                # Our own bump needs no second drop on the next poll
+                self._disk_generations = self._read_disk_generations()
+            except sqlite3.Error:
+                pass
+
+    def clear(self, function=None):
+        """Drop every entry, or only one function's."""
+        with self._lock:
+            for key in [k for k, entry in self._items.items() if function in (None, entry[0])]:
+                self._drop(key)
+        if self.disk is not None:
+            try:
+                self.disk.clear(function)
+            except sqlite3.Error:
+                pass
+
+    # Statistics
+
+    def function_stats(self):
+        with self._lock:
+            functions = list(self._functions.values())
+        return sorted((s.snapshot() for s in functions), key=lambda s: (s["backend"], s["function"]))
+
+    def backend_stats(self, backend):
+        """Hits (memory and disk) and misses summed over one backend's functions, for metrics."""
+        rows = [s for s in self.function_stats() if s["backend"] == backend]
+        return {
+            "hits": sum(s["hits"] + s["disk_hits"] for s in rows),
+            "misses": sum(s["misses"] for s in rows),
+        }
+
+    def stats(self):
+        with self._lock:
+            data = {
+                "entries": len(self._items),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+        if self.disk is not None:
+            try:
+                data.update(self.disk.stats())
+            except sqlite3.Error:
+                pass
+        rows = self.function_stats()
+        for field in ("hits", "disk_hits", "misses", "uncacheable"):
+            data[field] = sum(s[field] for s in rows)
+        return data
+
+
+def _open_disk():
+    if not DISK_PATH:
+        return None
+    try:
+        return DiskTier(DISK_PATH, DISK_BYTES)
+    except sqlite3.Error:
+        return None
+
+
+_cache = QueryCache(disk=_open_disk())
+_registered_backends = set()
+
+
+def _key(name, bound):
+    payload = pickle.dumps((CACHE_FORMAT, name, tuple(bound.arguments.items())), protocol=4)
+    return hashlib.sha1(payload).hexdigest()
+
+
+def cached(backend, ttl=QUERY_TTL, tags=()):
+    """Decorator caching a read function's results for `ttl` seconds.
+
+    Arguments are bound to the signature, defaults included, so f(1) and
+    f(1, top_n=10) share an entry. invalidate() on any of `tags` drops the
+    function's entries. Results must be picklable; calls whose arguments
+    aren't are passed straight through.
+    """
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        signature = inspect.signature(fn)
+        stats = _cache.register(backend, name)
+        if backend not in _registered_backends:
+            _registered_backends.add(backend)
+            register_cache(f"query_results_{backend}", backend,
+                           functools.partial(_cache.backend_stats, backend))
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = _key(name, bound)
+            except Exception:
+                stats.uncacheable += 1
+                return fn(*args, **kwargs)
+
+            hit, value = _cache.get(key, stats)
+            if hit:
+                return value
+            generation = _cache.generation(tags)
+            value = fn(*args, **kwargs)
+            _cache.put(key, name, tags, ttl, value, generation)
+            return value
+
+        # Same hooks as functools.lru_cache, so callers can bypass or reset it alike
+        wrapper.cache_info = lambda: stats.snapshot()
+        wrapper.cache_clear = lambda: _cache.clear(name)
+        return wrapper
+
+    return decorate
+
+
+def invalidate(*tags):
+    """Drop every cached result of functions declaring any of `tags`."""
+    if not ENABLED:
+        return
+    for tag in tags:
+        _cache.invalidate(tag)
+
+
+def invalidates(*tags):
+    """Decorator for write functions: invalidate `tags` once the write has returned."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                # Also after a failed write, which may have been partly applied
+                invalidate(*tags)
+
+        return wrapper
+
+    return decorate
+
+
+def stats():
+    return _cache.stats()
+
+
+def function_stats():
+    return _cache.function_stats()
+
+
+def clear():
+    _cache.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--invalidate", nargs="+", metavar="TAG", help="drop the results of these tags")
+    parser.add_argument("--clear", action="store_true", help="drop every cached result")
+    parser.add_argument("--stats", action="store_true", help="print entry counts and sizes")
+    args = parser.parse_args()
+
+    if _cache.disk is None:
+        parser.error("set QUERY_CACHE_PATH to the disk tier's file")
+    if args.clear:
+        _cache.clear()
+    if args.invalidate:
+        invalidate(*args.invalidate)
+    if args.stats or not (args.clear or args.invalidate):
+        for field, value in _cache.disk.stats().items():
+            print(f"{field}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,840 @@
+"""Offline snapshot of the academicworld data, served from memory-mapped arrays.
+
+export() dumps the university, faculty, keyword and publication tables
+and their links from MySQL into a directory of .npy columns: numbers as
+plain arrays, strings as UTF-8 bytes plus offsets, and every relation as
+CSR adjacency (indptr/indices/data) in both directions. The MySQL tables
+are the source for all three stores' reads, since academicworld holds the
+same data in each.
+
+With DASHBOARD_SNAPSHOT pointing at that directory, the read functions
+of mysql_utils, mongodb_utils and neo4j_utils (and
+top_publications.get_top_publications) keep their signatures and return
+shapes, but answer from the snapshot instead of the servers. Columns are
+mapped with mmap when a generation is opened, so startup reads no data,
+and worker processes share the same page-cache pages. Only user profiles
+still need a live MongoDB. Faculty and keyword node ids are their MySQL
+ids in snapshot mode.
+
+Exports are written to a new generation directory, then published by
+swapping the CURRENT file, so running processes keep reading a complete
+snapshot and switch to the new one within RELOAD_CHECK_SECONDS.
+Incremental exports fetch only universities, faculty, keywords and
+publications added since the last export (by id), plus their links.
+Changes to existing rows, such as new citation counts or re-linked
+keywords, need a full export.
+
+    python snapshot.py export snapshots/          # incremental when possible
+    python snapshot.py export snapshots/ --full
+"""
+import argparse
+import functools
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from metrics import instrumented
+
+SNAPSHOT_PATH = os.environ.get("DASHBOARD_SNAPSHOT")
+FORMAT_VERSION = 1
+RELOAD_CHECK_SECONDS = 30.0
+GENERATIONS_KEPT = 2
+
+# Columns: table -> (column, kind), kind "int" or "str".
+# Rows of every table are sorted by id.
+TABLES = {
+    "university": (("id", "int"), ("name", "str"), ("photo_url", "str")),
+    "faculty": (("id", "int"), ("name", "str"), ("position", "str"), ("email", "str"),
+                ("photo_url", "str"), ("university", "int")),
+    "keyword": (("id", "int"), ("name", "str")),
+    "publication": (("id", "int"), ("title", "str"), ("venue", "str"), ("year", "int"),
+                    ("citations", "int")),
+}
+
+# Relations: name -> (source table, target table, has scores), each stored in both directions
+RELATIONS = {
+    "faculty_keyword": ("faculty", "keyword", True),
+    "faculty_publication": ("faculty", "publication", False),
+    "publication_keyword": ("publication", "keyword", True),
+}
+
+EXPORT_QUERIES = {
+    "university": "SELECT id, name, photo_url FROM university {where} ORDER BY id",
+    "faculty": "SELECT id, name, position, email, photo_url, university_id FROM faculty {where} ORDER BY id",
+    "keyword": "SELECT id, name FROM keyword {where} ORDER BY id",
+    "publication": "SELECT ID, title, venue, year, COALESCE(num_citations, 0) FROM publication {where} ORDER BY ID",
+    "faculty_keyword": "SELECT faculty_id, keyword_id, score FROM faculty_keyword {where}",
+    "faculty_publication": "SELECT faculty_id, publication_id FROM faculty_publication {where}",
+    "publication_keyword": "SELECT publication_id, keyword_id, score FROM Publication_Keyword {where}",
+}
+
+# Which rows an incremental export fetches, given the previous export's max ids
+DELTA_FILTERS = {
+    "university": ("WHERE id > %s", ("university",)),
+    "faculty": ("WHERE id > %s", ("faculty",)),
+    "keyword": ("WHERE id > %s", ("keyword",)),
+    "publication": ("WHERE ID > %s", ("publication",)),
+    "faculty_keyword": ("WHERE faculty_id > %s OR keyword_id > %s", ("faculty", "keyword")),
+    "faculty_publication": ("WHERE faculty_id > %s OR publication_id > %s", ("faculty", "publication")),
+    "publication_keyword": ("WHERE publication_id > %s OR keyword_id > %s", ("publication", "keyword")),
+}
+
+
+class StringColumn:
+    """Strings as one UTF-8 byte array plus offsets; None is stored as a negative length."""
+
+    def __init__(self, offsets, data, nulls):
+        self.offsets = offsets
+        self.data = data
+        self.nulls = nulls
+
+    @classmethod
+    def from_values(cls, values):
+        encoded = [b"" if v is None else str(v).encode() for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        nulls = np.array([v is None for v in values], dtype=bool)
+        return cls(offsets, data, nulls)
+
+    @classmethod
+    def concat(cls, first, second):
+        offsets = np.concatenate([first.offsets[:-1], second.offsets + first.offsets[-1]])
+        return cls(offsets, np.concatenate([first.data, second.data]),
+                   np.concatenate([first.nulls, second.nulls]))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if self.nulls[i]:
+            return None
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode()
+
+    def tolist(self):
+        data = self.data.tobytes()
+        bounds = self.offsets.tolist()
+        return [None if null else data[start:stop].decode()
+                for start, stop, null in zip(bounds, bounds[1:], self.nulls.tolist())]
+
+
+def _csr(sources, targets, n_sources, data=None):
+    """(indptr, indices, data) with each source's targets in ascending order."""
+    order = np.lexsort((targets, sources))
+    indptr = np.zeros(n_sources + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n_sources), out=indptr[1:])
+    return indptr, targets[order].astype(np.int64), None if data is None else data[order]
+
+
+def _locate(ids, values):
+    """(rows of `values` in the sorted `ids`, which of them were found)."""
+    values = np.asarray(values, dtype=np.int64)
+    if not len(ids):
+        return np.zeros(values.size, dtype=np.int64), np.zeros(values.size, dtype=bool)
+    rows = np.searchsorted(ids, values).clip(max=len(ids) - 1)
+    return rows, np.asarray(ids)[rows] == values
+
+
+def _edges(indptr, indices):
+    """(sources, targets) of a CSR adjacency."""
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr)), np.asarray(indices)
+
+
+# Export
+
+def _fetch(cur, table, watermarks=None):
+    where, params = "", ()
+    if watermarks is not None:
+        where, tables = DELTA_FILTERS[table]
+        params = tuple(watermarks[t] for t in tables)
+    cur.execute(EXPORT_QUERIES[table].format(where=where), params)
+    return cur.fetchall()
+
+
+def _table_columns(table, rows):
+    columns = {}
+    for i, (column, kind) in enumerate(TABLES[table]):
+        values = [row[i] for row in rows]
+        if kind == "str":
+            columns[column] = StringColumn.from_values(values)
+        else:
+            # NULL numbers (e.g. a publication without a year) are stored as -1
+            columns[column] = np.array([-1 if v is None else v for v in values], dtype=np.int64)
+    return columns
+
+
+def _save(directory, tables, relations, meta):
+    os.makedirs(directory)
+    for table, columns in tables.items():
+        for column, values in columns.items():
+            base = os.path.join(directory, f"{table}.{column}")
+            if isinstance(values, StringColumn):
+                np.save(base + ".offsets.npy", values.offsets)
+                np.save(base + ".data.npy", values.data)
+                np.save(base + ".nulls.npy", values.nulls)
+            else:
+                np.save(base + ".npy", values)
+    for name, arrays in relations.items():
+        for part, values in arrays.items():
+            if values is not None:
+                np.save(os.path.join(directory, f"{name}.{part}.npy"), values)
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _build_relations(tables, edges):
+    """CSR arrays for every relation, both directions, from (source id, target id[, score]) rows."""
+    relations = {}
+    for name, (source, target, scored) in RELATIONS.items():
+        source_ids, target_ids = tables[source]["id"], tables[target]["id"]
+        src, dst, score = edges[name]
+        src_rows, src_found = _locate(source_ids, src)
+        dst_rows, dst_found = _locate(target_ids, dst)
+        # Links to rows that don't exist (dangling foreign keys) are dropped
+        known = src_found & dst_found
+        src_rows, dst_rows = src_rows[known], dst_rows[known]
+        score = score[known] if scored else None
+        # Each link once, keeping the first score seen
+        _, first = np.unique(src_rows * len(target_ids) + dst_rows, return_index=True)
+        src_rows, dst_rows = src_rows[first], dst_rows[first]
+        score = score[first] if scored else None
+
+        forward = _csr(src_rows, dst_rows, len(source_ids), score)
+        backward = _csr(dst_rows, src_rows, len(target_ids), score)
+        relations[name] = {"indptr": forward[0], "indices": forward[1], "data": forward[2]}
+        relations[name + "_reverse"] = {"indptr": backward[0], "indices": backward[1], "data": backward[2]}
+    return relations
+
+
+def _edge_arrays(rows, scored):
+    src = np.array([row[0] for row in rows], dtype=np.int64)
+    dst = np.array([row[1] for row in rows], dtype=np.int64)
+    score = np.array([row[2] or 0.0 for row in rows], dtype=np.float64) if scored else None
+    return src, dst, score
+
+
+def _current_generation(root):
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _publish(root, generation):
+    pointer = os.path.join(root, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(generation)
+    os.replace(pointer + ".tmp", pointer)
+    generations = sorted(d for d in os.listdir(root) if d.startswith("gen-"))
+    for old in generations[:-GENERATIONS_KEPT]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def export(root, full=False):
+    """Write a new snapshot generation under `root` and publish it. Returns its meta dict."""
+    from mysql_pool import get_pool
+
+    os.makedirs(root, exist_ok=True)
+    previous = None if full else _current_generation(root)
+    base = Snapshot(os.path.join(root, previous)) if previous else None
+    if base is not None and base.meta.get("format") != FORMAT_VERSION:
+        base = None
+    watermarks = dict(base.meta["max_ids"]) if base is not None else None
+
+    with get_pool().cursor() as cur:
+        fetched = {table: _fetch(cur, table, watermarks) for table in EXPORT_QUERIES}
+
+    tables = {}
+    for table in TABLES:
+        delta = _table_columns(table, fetched[table])
+        if table == "faculty":
+            # Faculty reference their university by row, like the relations do;
+            # universities only ever get appended, so existing rows stay valid
+            rows, found = _locate(tables["university"]["id"], delta["university"])
+            delta["university"] = np.where(found, rows, -1)
+        if base is None:
+            tables[table] = delta
+            continue
+        tables[table] = {
+            column: StringColumn.concat(base.column(table, column), delta[column]) if kind == "str"
+            else np.concatenate([np.asarray(base.column(table, column)), delta[column]])
+            for column, kind in TABLES[table]
+        }
+
+    edges = {}
+    for name, (source, target, scored) in RELATIONS.items():
+        src, dst, score = _edge_arrays(fetched[name], scored)
+        if base is not None:
+            # Existing links come back out of the old CSR, as ids
+            rel = base.relation(name)
+            old_src, old_dst = _edges(rel.indptr, rel.indices)
+            src = np.concatenate([np.asarray(base.column(source, "id"))[old_src], src])
+            dst = np.concatenate([np.asarray(base.column(target, "id"))[old_dst], dst])
+            if scored:
+                score = np.concatenate([np.asarray(rel.data), score])
+        edges[name] = (src, dst, score)
+
+    relations = _build_relations(tables, edges)
+    meta = {
+        "format": FORMAT_VERSION,
+        "exported_at": datetime.utcnow().isoformat(),
+        "incremental": base is not None,
+        "counts": {table: int(len(tables[table]["id"])) for table in TABLES},
+        "max_ids": {table: int(tables[table]["id"].max()) if len(tables[table]["id"]) else 0
+                    for table in TABLES},
+    }
+    numbers = [int(d[4:]) for d in os.listdir(root) if d.startswith("gen-") and d[4:].isdigit()]
+    generation = f"gen-{max(numbers, default=0) + 1:06d}"
+    _save(os.path.join(root, generation), tables, relations, meta)
+    _publish(root, generation)
+    return meta
+
+
+# Serving
+
+class Relation:
+    """One direction of a relation as CSR: row i's targets are indices[indptr[i]:indptr[i + 1]]."""
+
+    def __init__(self, indptr, indices, data):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    def targets(self, row):
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def scores(self, row):
+        return self.data[self.indptr[row]:self.indptr[row + 1]]
+
+    def gather(self, rows):
+        """Targets (and scores) of several rows, concatenated, plus each one's source row."""
+        rows = np.asarray(rows, dtype=np.int64)
+        starts, stops = self.indptr[rows], self.indptr[rows + 1]
+        lengths = stops - starts
+        positions = np.repeat(stops - np.cumsum(lengths), lengths) + np.arange(lengths.sum())
+        sources = np.repeat(rows, lengths)
+        data = self.data[positions] if self.data is not None else None
+        return sources, self.indices[positions], data
+
+    def degree(self):
+        return np.diff(self.indptr)
+
+
+def _normalize(name):
+    # Case-insensitive, like MySQL's collation and the toLower() match in Neo4j
+    return (name or "").lower()
+
+
+class Snapshot:
+    """One exported generation, opened read-only with mmap."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        # Every file is mapped now rather than on first use: _publish deletes a
+        # generation once newer ones replace it, which may be before this process
+        # reloads, and files already mapped stay readable after they are deleted
+        self._arrays = {entry[:-len(".npy")]: np.load(os.path.join(directory, entry), mmap_mode="r")
+                        for entry in os.listdir(directory) if entry.endswith(".npy")}
+        self._columns = {}
+        self._relations = {}
+        # Reentrant, since one lookup can be built from another
+        self._lock = threading.RLock()
+        self._lookups = {}
+
+    def _load(self, name):
+        return self._arrays[name]
+
+    def column(self, table, column):
+        key = (table, column)
+        if key not in self._columns:
+            kind = dict(TABLES[table])[column]
+            base = f"{table}.{column}"
+            if kind == "str":
+                value = StringColumn(self._load(base + ".offsets"), self._load(base + ".data"),
+                                     self._load(base + ".nulls"))
+            else:
+                value = self._load(base)
+            self._columns[key] = value
+        return self._columns[key]
+
+    def relation(self, name):
+        if name not in self._relations:
+            data = None
+            if f"{name}.data" in self._arrays:
+                data = self._load(f"{name}.data")
+            self._relations[name] = Relation(self._load(f"{name}.indptr"), self._load(f"{name}.indices"), data)
+        return self._relations[name]
+
+    def _lookup(self, key, build):
+        """Small per-process indexes (names to rows), built on first use."""
+        if key not in self._lookups:
+            with self._lock:
+                if key not in self._lookups:
+                    self._lookups[key] = build()
+        return self._lookups[key]
+
+    def strings(self, table, column):
+        """A string column decoded into a list, for columns read whole (names)."""
+        return self._lookup(("strings", table, column), lambda: self.column(table, column).tolist())
+
+    def _row(self, table, id_):
+        rows = self._rows(table, [id_])
+        return int(rows[0]) if rows.size else None
+
+    def _rows(self, table, ids):
+        rows, found = _locate(self.column(table, "id"), list(ids))
+        return rows[found]
+
+    def _keyword_rows_by_name(self, names, case_sensitive=False):
+        if case_sensitive:
+            index = self._lookup("keyword_exact", lambda: self._name_index("keyword", str))
+            normalize = str
+        else:
+            index = self._lookup("keyword_folded", lambda: self._name_index("keyword", _normalize))
+            normalize = _normalize
+        rows = [row for name in names for row in index.get(normalize(name), ())]
+        return np.array(sorted(set(rows)), dtype=np.int64)
+
+    def _name_index(self, table, normalize):
+        index = {}
+        for row, name in enumerate(self.strings(table, "name")):
+            index.setdefault(normalize(name or ""), []).append(row)
+        return index
+
+    def _university_of(self, faculty_rows):
+        return np.asarray(self.column("faculty", "university"))[faculty_rows]
+
+    def _str(self, table, column, row):
+        return self.column(table, column)[int(row)] if row >= 0 else None
+
+    # mysql_utils
+
+    def mysql_faculty_row(self, row):
+        university = int(self.column("faculty", "university")[row])
+        return (
+            int(self.column("faculty", "id")[row]),
+            self._str("faculty", "name", row),
+            self._str("faculty", "position", row),
+            self._str("faculty", "photo_url", row),
+            self._str("faculty", "email", row),
+            self._str("university", "name", university),
+            self._str("university", "photo_url", university),
+        )
+
+    def mysql_get_all_universities(self):
+        names = {name for name in self.strings("university", "name") if name is not None}
+        return sorted(names, key=lambda n: (n.lower(), n))
+
+    def _faculty_for_keyword_rows(self, keyword_rows, limit=10):
+        _, faculty, _ = self.relation("faculty_keyword_reverse").gather(keyword_rows)
+        faculty = np.unique(faculty)
+        # The MySQL queries inner-join university
+        faculty = faculty[self._university_of(faculty) >= 0]
+        return [self.mysql_faculty_row(row) for row in faculty[:limit]]
+
+    def mysql_get_faculty_by_keywords(self, keywords):
+        return self._faculty_for_keyword_rows(self._keyword_rows_by_name(keywords))
+
+    def mysql_get_all_keywords(self):
+        names = {name for name in self.strings("keyword", "name") if name is not None}
+        return sorted(names, key=lambda n: (n.lower(), n))
+
+    def mysql_get_keyword_ids(self):
+        return list(zip(np.asarray(self.column("keyword", "id")).tolist(), self.strings("keyword", "name")))
+
+    def mysql_get_faculty_by_keyword_ids(self, keyword_ids):
+        return self._faculty_for_keyword_rows(self._rows("keyword", keyword_ids))
+
+    def mysql_search_faculty_by_keyword_ids(self, keyword_ids, weight_by_publications=False, page_size=10,
+                                            after=None):
+        _, faculty, scores = self.relation("faculty_keyword_reverse").gather(self._rows("keyword", keyword_ids))
+        if not faculty.size:
+            return [], None
+        rows, inverse = np.unique(faculty, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores)
+        affiliated = self._university_of(rows) >= 0
+        rows, totals = rows[affiliated], totals[affiliated]
+        if weight_by_publications:
+            totals = totals * np.log(2 + self.relation("faculty_publication").degree()[rows])
+        totals = np.round(totals, 6)
+        ids = np.asarray(self.column("faculty", "id"))[rows]
+        if after is not None:
+            last_score, last_id = after
+            keep = (totals < last_score) | ((totals == last_score) & (ids > last_id))
+            rows, totals, ids = rows[keep], totals[keep], ids[keep]
+        order = np.lexsort((ids, -totals))[:page_size + 1]
+        page = [self.mysql_faculty_row(rows[i]) + (float(totals[i]),) for i in order]
+        next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            next_cursor = (page[-1][7], page[-1][0])
+        return page, next_cursor
+
+    def mysql_get_faculty_ids(self):
+        universities = self.strings("university", "name")
+        return [
+            (fid, name, universities[u] if u >= 0 else None)
+            for fid, name, u in zip(np.asarray(self.column("faculty", "id")).tolist(), self.strings("faculty", "name"),
+                                    np.asarray(self.column("faculty", "university")).tolist())
+        ]
+
+    def mysql_get_faculty_keyword_pairs(self):
+        sources, targets = _edges(self.relation("faculty_keyword").indptr, self.relation("faculty_keyword").indices)
+        faculty_ids = np.asarray(self.column("faculty", "id"))
+        keyword_ids = np.asarray(self.column("keyword", "id"))
+        return list(zip(faculty_ids[sources].tolist(), keyword_ids[targets].tolist()))
+
+    def mysql_get_faculty_keyword_scores(self, faculty_ids=None):
+        rel = self.relation("faculty_keyword")
+        if faculty_ids is None:
+            sources, targets = _edges(rel.indptr, rel.indices)
+            scores = np.asarray(rel.data)
+        else:
+            sources, targets, scores = rel.gather(self._rows("faculty", faculty_ids))
+        return list(zip(np.asarray(self.column("faculty", "id"))[sources].tolist(),
+                        np.asarray(self.column("keyword", "id"))[targets].tolist(), scores.tolist()))
+
+    def mysql_get_keyword_table_signature(self):
+        return (self.meta["counts"]["keyword"], self.meta["max_ids"]["keyword"])
+
+    def _university_counts(self, keyword_rows):
+        """[(university name, publications)] for the keywords, most publications first."""
+        _, publications, _ = self.relation("publication_keyword_reverse").gather(keyword_rows)
+        publications = np.unique(publications)
+        pubs, faculty, _ = self.relation("faculty_publication_reverse").gather(publications)
+        universities = self._university_of(faculty)
+        known = universities >= 0
+        # COUNT(DISTINCT publication) per university
+        pairs = np.unique(pubs[known] * len(self.column("university", "id")) + universities[known])
+        counts = np.bincount(pairs % len(self.column("university", "id")),
+                             minlength=len(self.column("university", "id")))
+        ranked = np.flatnonzero(counts)
+        ids = np.asarray(self.column("university", "id"))[ranked]
+        ranked = ranked[np.lexsort((ids, -counts[ranked]))]
+        names = self.strings("university", "name")
+        return [(names[int(u)], int(counts[u])) for u in ranked]
+
+    def mysql_get_university_pub_counts_by_keyword(self, keyword, top_n=10):
+        return self._university_counts(self._keyword_rows_by_name([keyword]))[:top_n]
+
+    def mysql_get_university_pub_counts_by_keyword_id(self, keyword_id, top_n=10):
+        return self._university_counts(self._rows("keyword", [keyword_id]))[:top_n]
+
+    def mysql_get_university_rankings(self, keyword_id, top_n=10, offset=0):
+        return self._university_counts(self._rows("keyword", [keyword_id]))[offset:offset + top_n]
+
+    # mongodb_utils
+
+    def mongo_faculty_doc(self, row):
+        university = int(self.column("faculty", "university")[row])
+        keyword_names = self.strings("keyword", "name")
+        rel = self.relation("faculty_keyword")
+        return {
+            "id": int(self.column("faculty", "id")[row]),
+            "name": self._str("faculty", "name", row),
+            "position": self._str("faculty", "position", row),
+            "email": self._str("faculty", "email", row),
+            "photoUrl": self._str("faculty", "photo_url", row),
+            "affiliation": {
+                "id": int(self.column("university", "id")[university]) if university >= 0 else None,
+                "name": self._str("university", "name", university),
+                "photoUrl": self._str("university", "photo_url", university),
+            },
+            "keywords": [{"name": keyword_names[int(k)], "score": float(s)}
+                         for k, s in zip(rel.targets(row), rel.scores(row))],
+            "publications": np.asarray(self.column("publication", "id"))[
+                self.relation("faculty_publication").targets(row)].tolist(),
+        }
+
+    def mongo_publication_doc(self, row):
+        year = int(self.column("publication", "year")[row])
+        keyword_names = self.strings("keyword", "name")
+        rel = self.relation("publication_keyword")
+        return {
+            "id": int(self.column("publication", "id")[row]),
+            "title": self._str("publication", "title", row),
+            "venue": self._str("publication", "venue", row),
+            "year": year if year >= 0 else None,
+            "numCitations": int(self.column("publication", "citations")[row]),
+            "keywords": [{"name": keyword_names[int(k)], "score": float(s)}
+                         for k, s in zip(rel.targets(row), rel.scores(row))],
+        }
+
+    def mongo_get_all_universities(self):
+        universities = np.unique(np.asarray(self.column("faculty", "university")))
+        names = self.strings("university", "name")
+        return sorted({names[int(u)] for u in universities if u >= 0} - {None})
+
+    def mongo_get_faculty_by_university(self, univ_name):
+        names = self.strings("university", "name")
+        wanted = [u for u in range(len(names)) if names[u] == univ_name]
+        rows = np.flatnonzero(np.isin(np.asarray(self.column("faculty", "university")), wanted))
+        return [self.mongo_faculty_doc(row) for row in rows]
+
+    def mongo_get_all_faculty_names(self):
+        return sorted(name for name in self.strings("faculty", "name") if name is not None)
+
+    def mongo_get_faculty_by_name(self, name):
+        rows = self._lookup("faculty_exact", lambda: self._name_index("faculty", str)).get(name)
+        return self.mongo_faculty_doc(rows[0]) if rows else None
+
+    def mongo_get_faculty_by_id(self, fid):
+        row = self._row("faculty", fid)
+        return self.mongo_faculty_doc(row) if row is not None else None
+
+    def mongo_get_faculty_by_ids(self, fids, fields=("id", "name")):
+        if not fids:
+            return []
+        docs = []
+        for fid in fids:
+            row = self._row("faculty", fid)
+            if row is None:
+                continue
+            doc = self.mongo_faculty_doc(row)
+            projected = {}
+            for field in set(fields) | {"id"}:
+                head, _, rest = field.partition(".")
+                if head not in doc:
+                    continue
+                if rest:
+                    if isinstance(doc[head], dict) and rest in doc[head]:
+                        projected.setdefault(head, {})[rest] = doc[head][rest]
+                else:
+                    projected[head] = doc[head]
+            docs.append(projected)
+        return docs
+
+    def mongo_get_faculty_ids(self):
+        return self.mysql_get_faculty_ids()
+
+    def mongo_get_publications_by_ids(self, pub_ids, limit=5):
+        rows = self._rows("publication", pub_ids)
+        citations = np.asarray(self.column("publication", "citations"))[rows]
+        rows = rows[np.lexsort((rows, -citations))][:limit]
+        return [self.mongo_publication_doc(row) for row in rows]
+
+    def mongo_get_publication_counts_by_keyword(self, keyword, start_year, end_year=None):
+        if end_year is None:
+            end_year = datetime.utcnow().year
+        rows = self._keyword_rows_by_name([keyword], case_sensitive=True)
+        _, publications, _ = self.relation("publication_keyword_reverse").gather(rows)
+        years = np.asarray(self.column("publication", "year"))[np.unique(publications)]
+        years = years[(years >= start_year) & (years < end_year)]
+        counts = np.bincount(years - start_year, minlength=max(end_year - start_year, 0))
+        return counts.tolist(), list(range(start_year, end_year))
+
+    def mongo_get_all_publication_keywords(self):
+        used = np.flatnonzero(self.relation("publication_keyword_reverse").degree())
+        names = self.strings("keyword", "name")
+        return list(dict.fromkeys(names[int(k)] for k in used))
+
+    def mongo_get_keyword_year_counts(self):
+        rel = self.relation("publication_keyword_reverse")
+        keywords, publications = _edges(rel.indptr, rel.indices)
+        years = np.asarray(self.column("publication", "year"))[publications]
+        dated = years >= 0
+        keywords, years = keywords[dated], years[dated]
+        if not years.size:
+            return []
+        # Keywords with the same name are one keyword to MongoDB
+        names = self.strings("keyword", "name")
+        name_ids = {}
+        canonical = np.array([name_ids.setdefault(name, i) for i, name in enumerate(names)], dtype=np.int64)
+        span = int(years.max()) + 1
+        cells, counts = np.unique(canonical[keywords] * span + years, return_counts=True)
+        return [(names[int(c // span)], int(c % span), int(n)) for c, n in zip(cells, counts)]
+
+    # top_publications
+
+    def get_top_publications(self, faculty_id, offset=0, limit=5):
+        row = self._row("faculty", faculty_id)
+        if row is None:
+            return [], 0
+        publications = self.relation("faculty_publication").targets(row)
+        citations = np.asarray(self.column("publication", "citations"))[publications]
+        ids = np.asarray(self.column("publication", "id"))[publications]
+        order = np.lexsort((ids, -citations))[offset:offset + limit]
+        fields = ("id", "title", "venue", "year", "numCitations")
+        page = []
+        for i in order:
+            doc = self.mongo_publication_doc(publications[i])
+            page.append({field: doc[field] for field in fields})
+        return page, int(publications.size)
+
+    # neo4j_utils
+
+    def _network_rows(self, keyword_rows):
+        names = self.strings("keyword", "name")
+        faculty_names = self.strings("faculty", "name")
+        by_faculty = self.relation("faculty_keyword")
+        rows = []
+        for k in keyword_rows:
+            for f in self.relation("faculty_keyword_reverse").targets(k):
+                others = [names[int(o)] for o in by_faculty.targets(f) if o != k]
+                rows.append({"faculty": faculty_names[int(f)], "keyword": names[int(k)],
+                             "co_keywords": list(dict.fromkeys(others))})
+                if len(rows) == 20:
+                    return rows
+        return rows
+
+    def neo4j_get_keyword_faculty_network(self, selected_keyword):
+        return self._network_rows(self._keyword_rows_by_name([selected_keyword]))
+
+    def neo4j_get_keyword_faculty_network_by_id(self, keyword_node_id):
+        return self._network_rows(self._rows("keyword", [keyword_node_id]))
+
+    def neo4j_get_keyword_node_ids(self):
+        return self.mysql_get_keyword_ids()
+
+    def neo4j_get_faculty_node_ids(self):
+        return self.mysql_get_faculty_ids()
+
+    def neo4j_get_faculty_keyword_node_pairs(self):
+        return self.mysql_get_faculty_keyword_pairs()
+
+    def neo4j_get_all_neo4j_keywords(self):
+        used = np.flatnonzero(self.relation("faculty_keyword_reverse").degree())
+        names = self.strings("keyword", "name")
+        return sorted({names[int(k)] for k in used} - {None})
+
+    def ego_hop(self, frontier, faculty_limit):
+        """Rows of neo4j_utils.EGO_HOP_QUERY for one hop, node ids being MySQL ids."""
+        names = self.strings("keyword", "name")
+        faculty_names = self.strings("faculty", "name")
+        faculty_ids = np.asarray(self.column("faculty", "id"))
+        keyword_ids = np.asarray(self.column("keyword", "id"))
+        interested = self.relation("faculty_keyword_reverse")
+        by_faculty = self.relation("faculty_keyword")
+        sources, faculty = [], []
+        for k in self._rows("keyword", frontier):
+            candidates = interested.targets(k)
+            top = candidates[np.lexsort((faculty_ids[candidates], -interested.scores(k)))][:faculty_limit]
+            sources.append(np.full(top.size, k))
+            faculty.append(top)
+        if not sources:
+            return []
+        pair_rows, others, _ = by_faculty.gather(np.concatenate(faculty))
+        sources = np.repeat(np.concatenate(sources), by_faculty.degree()[np.concatenate(faculty)])
+        keep = others != sources
+        return [
+            {"source": int(keyword_ids[k]), "source_name": names[k],
+             "faculty_id": int(faculty_ids[f]), "faculty": faculty_names[f],
+             "other_id": int(keyword_ids[o]), "other": names[o]}
+            for k, f, o in zip(sources[keep].tolist(), pair_rows[keep].tolist(), others[keep].tolist())
+        ]
+
+# Which Snapshot method answers each served function
+SERVED = {
+    "mysql_utils.get_all_universities": Snapshot.mysql_get_all_universities,
+    "mysql_utils.get_faculty_by_keywords": Snapshot.mysql_get_faculty_by_keywords,
+    "mysql_utils.get_all_keywords": Snapshot.mysql_get_all_keywords,
+    "mysql_utils.get_keyword_ids": Snapshot.mysql_get_keyword_ids,
+    "mysql_utils.get_faculty_by_keyword_ids": Snapshot.mysql_get_faculty_by_keyword_ids,
+    "mysql_utils.search_faculty_by_keyword_ids": Snapshot.mysql_search_faculty_by_keyword_ids,
+    "mysql_utils.get_faculty_ids": Snapshot.mysql_get_faculty_ids,
+    "mysql_utils.get_faculty_keyword_pairs": Snapshot.mysql_get_faculty_keyword_pairs,
+    "mysql_utils.get_faculty_keyword_scores": Snapshot.mysql_get_faculty_keyword_scores,
+    "mysql_utils.get_keyword_table_signature": Snapshot.mysql_get_keyword_table_signature,
+    "mysql_utils.get_university_pub_counts_by_keyword": Snapshot.mysql_get_university_pub_counts_by_keyword,
+    "mysql_utils.get_university_pub_counts_by_keyword_id": Snapshot.mysql_get_university_pub_counts_by_keyword_id,
+    "mysql_utils.get_university_rankings": Snapshot.mysql_get_university_rankings,
+    "mongodb_utils.get_all_universities": Snapshot.mongo_get_all_universities,
+    "mongodb_utils.get_faculty_by_university": Snapshot.mongo_get_faculty_by_university,
+    "mongodb_utils.get_all_faculty_names": Snapshot.mongo_get_all_faculty_names,
+    "mongodb_utils.get_faculty_by_name": Snapshot.mongo_get_faculty_by_name,
+    "mongodb_utils.get_faculty_by_id": Snapshot.mongo_get_faculty_by_id,
+    "mongodb_utils.get_faculty_by_ids": Snapshot.mongo_get_faculty_by_ids,
+    "mongodb_utils.get_faculty_ids": Snapshot.mongo_get_faculty_ids,
+    "mongodb_utils.get_publications_by_ids": Snapshot.mongo_get_publications_by_ids,
+    "mongodb_utils.get_publication_counts_by_keyword": Snapshot.mongo_get_publication_counts_by_keyword,
+    "mongodb_utils.get_all_publication_keywords": Snapshot.mongo_get_all_publication_keywords,
+    "mongodb_utils.get_keyword_year_counts": Snapshot.mongo_get_keyword_year_counts,
+    "top_publications.get_top_publications": Snapshot.get_top_publications,
+    "neo4j_utils.get_keyword_faculty_network": Snapshot.neo4j_get_keyword_faculty_network,
+    "neo4j_utils.get_keyword_faculty_network_by_id": Snapshot.neo4j_get_keyword_faculty_network_by_id,
+    "neo4j_utils.get_keyword_node_ids": Snapshot.neo4j_get_keyword_node_ids,
+    "neo4j_utils.get_faculty_node_ids": Snapshot.neo4j_get_faculty_node_ids,
+    "neo4j_utils.get_faculty_keyword_node_pairs": Snapshot.neo4j_get_faculty_keyword_node_pairs,
+    "neo4j_utils.get_all_neo4j_keywords": Snapshot.neo4j_get_all_neo4j_keywords,
+}
+
+
+_current = None
+_current_lock = threading.Lock()
+_checked_at = 0.0
+
+
+def use(root):
+    """Serve from the snapshot under `root` (None to go back to the live servers)."""
+    global SNAPSHOT_PATH, _current, _checked_at
+    with _current_lock:
+        SNAPSHOT_PATH = root
+        _current = None
+        _checked_at = 0.0
+
+
+def active():
+    return bool(SNAPSHOT_PATH)
+
+
+def current():
+    """The published snapshot generation, reopened when a newer one is published; None if not configured."""
+    global _current, _checked_at
+    if not SNAPSHOT_PATH:
+        return None
+    now = time.monotonic()
+    if _current is not None and now - _checked_at < RELOAD_CHECK_SECONDS:
+        return _current
+    with _current_lock:
+        if _current is None or now - _checked_at >= RELOAD_CHECK_SECONDS:
+            generation = _current_generation(SNAPSHOT_PATH)
+            if generation is None:
+                raise FileNotFoundError(f"no snapshot published under {SNAPSHOT_PATH}; run snapshot.py export")
+            directory = os.path.join(SNAPSHOT_PATH, generation)
+            if _current is None or _current.directory != directory:
+                _current = Snapshot(directory)
+            _checked_at = now
+    return _current
+
+
+def served(fn):
+    """Decorator: answer `fn` from the snapshot when one is configured, else call it as usual."""
+    method = SERVED[f"{fn.__module__}.{fn.__name__}"]
+    from_snapshot = instrumented("snapshot")(method)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        snapshot = current()
+        if snapshot is not None:
+            return from_snapshot(snapshot, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    wrapper.from_snapshot = from_snapshot
+    return wrapper
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="export MySQL into a new snapshot generation")
+    export_parser.add_argument("root", help="snapshot directory (DASHBOARD_SNAPSHOT)")
+    export_parser.add_argument("--full", action="store_true", help="export everything, not just new rows")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    meta = export(args.root, full=args.full)
+    kind = "incremental" if meta["incremental"] else "full"
+    counts = ", ".join(f"{n} {table}" for table, n in meta["counts"].items())
+    print(f"Published {kind} snapshot ({counts}) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Shared fixtures: a small synthetic dataset loaded into the benchmark stand-ins."""
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Every test should see the stand-ins' current contents, not a cached answer
+os.environ.setdefault("QUERY_CACHE", "0")
+
+import pytest  # noqa: E402
+
+from benchmarks import standins as standins_module, synthetic  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def data():
+    return synthetic.generate(60, seed=0)
+
+
+@pytest.fixture(scope="session")
+def standins(data, tmp_path_factory):
+    """The stand-ins, loaded with `data`, with the app's clients pointed at them."""
+    return standins_module.install(data, str(tmp_path_factory.mktemp("standins")))
@@ -0,0 +1,94 @@
+import pytest
+
+from collaboration_paths import CollaborationGraph, build_collaboration_graph
+from neo4j_utils import NODE_FACULTY, NODE_KEYWORD
+
+# Faculty 1..6 and keywords 101..108. 1 and 2 share keyword 101; they are also
+# linked through 3 and through 4 (two keywords each), and through 5 then 3 (three)
+FACULTY = [(i, f"Faculty {i}") for i in range(1, 7)]
+KEYWORDS = [(i, f"keyword {i}") for i in range(101, 109)]
+PAIRS = [
+    (1, 101), (2, 101),
+    (1, 102), (3, 102), (3, 103), (2, 103),
+    (1, 104), (4, 104), (4, 105), (2, 105),
+    (1, 106), (5, 106), (5, 107), (3, 107),
+    (6, 108),
+    (1, 101), (1, 999),  # a duplicate and an unknown keyword are ignored
+]
+
+
+@pytest.fixture
+def graph():
+    return CollaborationGraph.from_pairs(PAIRS, FACULTY, KEYWORDS)
+
+
+def _simple_paths(graph, source, target, max_length):
+    """Every simple source-target path of at most max_length edges, by brute force."""
+    found = []
+
+    def walk(path):
+        if path[-1] == target:
+            found.append(path)
+            return
+        if len(path) > max_length:
+            return
+        node = path[-1]
+        for neighbour in graph.indices[graph.indptr[node]:graph.indptr[node + 1]]:
+            if int(neighbour) not in path:
+                walk(path + [int(neighbour)])
+
+    walk([source])
+    return found
+
+
+def _check_paths(graph, paths, source, target):
+    assert len({tuple(path) for path in paths}) == len(paths)
+    assert [len(path) for path in paths] == sorted(len(path) for path in paths)
+    for path in paths:
+        assert path[0] == source and path[-1] == target
+        assert len(set(path)) == len(path)
+        for a, b in zip(path, path[1:]):
+            assert b in graph.indices[graph.indptr[a]:graph.indptr[a + 1]]
+
+
+def test_k_shortest_distinct_and_by_length(graph):
+    a, b = graph._faculty_index[1], graph._faculty_index[2]
+    paths = graph.k_shortest(a, b, k=10)
+
+    _check_paths(graph, paths, a, b)
+    expected = sorted(len(path) for path in _simple_paths(graph, a, b, 8))
+    assert [len(path) for path in paths] == expected[:10]
+    # Keyword nodes follow the faculty, so keyword 101 is node len(graph)
+    assert paths[0] == [a, len(graph), b]
+
+
+def test_k_shortest_stops_at_k_and_max_length(graph):
+    a, b = graph._faculty_index[1], graph._faculty_index[2]
+    assert len(graph.k_shortest(a, b, k=2)) == 2
+    assert [len(path) for path in graph.k_shortest(a, b, k=10, max_length=4)] == [3, 5, 5]
+
+
+def test_paths_as_nodes(graph):
+    paths = graph.paths(1, 2, k=3)
+
+    assert [len(path) for path in paths] == [3, 5, 5]
+    assert paths[0][0] == (NODE_FACULTY, 1, "Faculty 1")
+    assert paths[0][1] == (NODE_KEYWORD, 101, "keyword 101")
+    assert [node.kind for node in paths[1]] == [NODE_FACULTY, NODE_KEYWORD] * 2 + [NODE_FACULTY]
+    assert graph.paths(1, 6) == []
+    assert graph.paths(1, 1) == []
+    assert graph.paths(1, 42) == []
+
+
+def test_k_shortest_on_standin_graph(standins):
+    graph = build_collaboration_graph()
+    faculty = sorted(graph._faculty_index.values())
+    checked = 0
+    for a, b in zip(faculty, faculty[1:]):
+        paths = graph.k_shortest(a, b, k=5)
+        if not paths:
+            continue
+        _check_paths(graph, paths, a, b)
+        assert len(paths[0]) == len(graph.shortest_path(a, b, 8))
+        checked += 1
+    assert checked
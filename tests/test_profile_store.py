@@ -0,0 +1,75 @@
+import pytest
+
+import profile_store
+from profile_store import ProfileConflict, ProfileStore
+
+
+def test_flush_writes_queued_changes(standins):
+    store = ProfileStore("single@example.edu")
+    start = store.version
+    store.add_interest("databases")
+    store.save_to_favorites(1, "Ada", "Example University")
+
+    assert store.flush() == 2
+    assert not store.dirty
+    reloaded = ProfileStore("single@example.edu")
+    assert reloaded.get_interests() == ["databases"]
+    assert reloaded.is_favorite(1)
+    assert reloaded.version == start + 2
+
+
+def test_conflicting_writes_are_replayed(standins):
+    first = ProfileStore("tabs@example.edu")
+    second = ProfileStore("tabs@example.edu")
+    start = first.version
+    first.add_interest("databases")
+    second.add_interest("graphs")
+    second.save_to_favorites(7, "Grace", "Example University")
+
+    assert first.flush() == 1
+    # second's guard expects the old version; it loses, reloads and replays on top
+    assert second.flush() == 2
+    assert second.get_interests() == ["databases", "graphs"]
+
+    stored = ProfileStore("tabs@example.edu")
+    assert stored.get_interests() == ["databases", "graphs"]
+    assert stored.is_favorite(7)
+    assert stored.version == start + 3
+
+
+def test_replay_drops_changes_already_made(standins):
+    first = ProfileStore("same@example.edu")
+    second = ProfileStore("same@example.edu")
+    first.add_interest("databases")
+    second.add_interest("databases")
+    second.add_interest("graphs")
+
+    first.flush()
+    assert second.flush() == 1
+    assert ProfileStore("same@example.edu").get_interests() == ["databases", "graphs"]
+
+
+class RacingCollection:
+    """A collection where another writer bumps the version before every bulk_write."""
+
+    def __init__(self, collection, email):
+        self._col = collection
+        self._email = email
+
+    def __getattr__(self, name):
+        return getattr(self._col, name)
+
+    def bulk_write(self, ops, **kwargs):
+        self._col.update_one({"email": self._email}, {"$inc": {"version": 1}})
+        return self._col.bulk_write(ops, **kwargs)
+
+
+def test_losing_every_race_raises(standins):
+    email = "busy@example.edu"
+    store = ProfileStore(email, RacingCollection(profile_store.user_profile_col, email))
+    store.add_interest("databases")
+
+    with pytest.raises(ProfileConflict):
+        store.flush()
+    assert store.dirty
+    assert ProfileStore(email).get_interests() == []
@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pytest
+
+import mysql_utils
+import snapshot
+
+
+@pytest.fixture
+def root(standins, tmp_path):
+    yield str(tmp_path / "snapshots")
+    snapshot.use(None)
+
+
+def test_old_generation_readable_after_publish(data, root):
+    snapshot.export(root, full=True)
+    old = snapshot.Snapshot(os.path.join(root, snapshot._current_generation(root)))
+    snapshot.export(root)
+    snapshot.export(root)
+
+    # Two newer generations are published, so the first one is deleted...
+    assert not os.path.exists(old.directory)
+    assert len([d for d in os.listdir(root) if d.startswith("gen-")]) == snapshot.GENERATIONS_KEPT
+    # ...but columns and relations it had not read yet still come back whole
+    assert old.column("publication", "title").tolist() == [p[1] for p in sorted(data.publications)]
+    assert old.strings("faculty", "name") == [f[1] for f in sorted(data.faculty)]
+    faculty_keyword = old.relation("faculty_keyword")
+    assert int(faculty_keyword.degree().sum()) == len(set((f, k) for f, k, _ in data.faculty_keyword))
+    assert np.asarray(faculty_keyword.data).size == faculty_keyword.indices.size
+
+
+def test_current_reopens_newer_generation(data, root, monkeypatch):
+    monkeypatch.setattr(snapshot, "RELOAD_CHECK_SECONDS", 0.0)
+    snapshot.export(root, full=True)
+    snapshot.use(root)
+    first = snapshot.current()
+    assert first.directory.endswith(snapshot._current_generation(root))
+
+    snapshot.export(root)
+    second = snapshot.current()
+    assert second is not first
+    assert second.directory.endswith(snapshot._current_generation(root))
+    # Served functions answer from the new generation
+    assert mysql_utils.get_all_universities() == sorted({u[1] for u in data.universities})
+    assert snapshot.current() is second
+
+
+def test_current_keeps_generation_between_checks(root, monkeypatch):
+    monkeypatch.setattr(snapshot, "RELOAD_CHECK_SECONDS", 3600.0)
+    snapshot.export(root, full=True)
+    snapshot.use(root)
+    first = snapshot.current()
+
+    snapshot.export(root)
+    assert snapshot.current() is first
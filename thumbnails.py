@@ -0,0 +1,329 @@
+"""Faculty photo and university logo thumbnails, cached on disk.
+
+Faculty cards used to hand st.image() the remote photo URLs, so every
+rerun made the browser download full-size originals from slow third-party
+hosts. thumbnail(url, width) instead returns a local copy downsized to the
+width it is displayed at. Thumbnails are stored under THUMBNAIL_DIR by the
+hash of their content, so the same picture behind several URLs is kept
+once. A small SQLite index maps (url, width) to its file and evicts the
+least recently used files once they exceed THUMBNAIL_DISK_BYTES. Every
+process pointed at the same directory shares them.
+
+prefetch() starts fetching a whole result page's images on a thread pool,
+so the cards rendered right after it wait for the slowest image rather
+than the sum of them. Missing URLs, placeholder hosts and images that
+failed within FAILURE_RETRY_SECONDS get the bundled default without a
+network request.
+
+    python thumbnails.py --stats
+    python thumbnails.py --clear
+"""
+import argparse
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from chart_cache import ByteLRU
+from metrics import register_cache
+
+THUMBNAIL_DIR = os.environ.get(
+    "THUMBNAIL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".thumbnails")
+)
+THUMBNAIL_DISK_BYTES = int(os.environ.get("THUMBNAIL_DISK_BYTES", 256 * 1024 * 1024))
+# Thumbnails read this process, kept in memory in front of the disk
+THUMBNAIL_MEMORY_BYTES = 16 * 1024 * 1024
+FETCH_TIMEOUT = 2.0
+# Cap on one downloaded original
+FETCH_MAX_BYTES = 8 * 1024 * 1024
+PREFETCH_WORKERS = 8
+# A URL that failed is not requested again for this long
+FAILURE_RETRY_SECONDS = 3600
+# Evict down to this fraction of THUMBNAIL_DISK_BYTES, so pruning doesn't run on every write
+PRUNE_TO = 0.9
+JPEG_QUALITY = 85
+# Hosts that only serve generic placeholders; the bundled defaults look the same
+PLACEHOLDER_HOSTS = ("via.placeholder.com", "placehold.it", "placeholder.com")
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnails (
+    url TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    digest TEXT,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (url, width)
+);
+CREATE TABLE IF NOT EXISTS files (
+    digest TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_used_at ON files (used_at);
+"""
+
+
+def _remote(url):
+    return bool(url) and url.startswith(("http://", "https://"))
+
+
+def _placeholder(url):
+    host = urllib.parse.urlsplit(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in PLACEHOLDER_HOSTS)
+
+
+def fetch(url):
+    request = urllib.request.Request(url, headers={"User-Agent": "academic-world-dashboard"})
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+        body = response.read(FETCH_MAX_BYTES + 1)
+    if len(body) > FETCH_MAX_BYTES:
+        raise ValueError(f"image larger than {FETCH_MAX_BYTES} bytes")
+    return body
+
+
+def resize(body, width):
+    """(thumbnail bytes, file extension): `body` scaled down to `width` px wide, never up."""
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(body)))
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+    out = io.BytesIO()
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image.save(out, format="PNG", optimize=True)
+        return out.getvalue(), "png"
+    image.convert("RGB").save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return out.getvalue(), "jpg"
+
+
+class ThumbnailCache:
+    """Content-addressed thumbnail files under `directory`, LRU-bounded to `max_bytes` in total."""
+
+    def __init__(self, directory, max_bytes, fetch=fetch, workers=PREFETCH_WORKERS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._fetch = fetch
+        os.makedirs(directory, exist_ok=True)
+        self._cnx = sqlite3.connect(os.path.join(directory, "index.sqlite"), timeout=5,
+                                    check_same_thread=False, isolation_level=None)
+        self._cnx.execute("PRAGMA journal_mode=WAL")
+        self._cnx.executescript(INDEX_SCHEMA)
+        self._lock = threading.Lock()
+        self._memory = ByteLRU(THUMBNAIL_MEMORY_BYTES)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self._pending = {}
+        self._counts = {"disk_hits": 0, "fetches": 0, "failures": 0, "skipped": 0, "evictions": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _path(self, name):
+        return os.path.join(self.directory, name[:2], name)
+
+    def _read(self, url, width):
+        """Cached bytes, b"" for a recent failure, or None if it has to be fetched."""
+        with self._lock:
+            row = self._cnx.execute(
+                "SELECT t.digest, t.checked_at, f.name FROM thumbnails t "
+                "LEFT JOIN files f ON f.digest = t.digest WHERE t.url = ? AND t.width = ?",
+                (url, width),
+            ).fetchone()
+        if row is None:
+            return None
+        digest, checked_at, name = row
+        if digest is None:
+            return b"" if time.time() - checked_at < FAILURE_RETRY_SECONDS else None
+        if name is None:
+            return None
+        try:
+            with open(self._path(name), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._cnx.execute("UPDATE files SET used_at = ? WHERE digest = ?", (time.time(), digest))
+        self._count("disk_hits")
+        return body
+
+    def _store(self, url, width, body):
+        now = time.time()
+        if body is None:
+            with self._lock:
+                self._cnx.execute("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, NULL, ?)", (url, width, now))
+            return
+        thumbnail, extension = body
+        digest = hashlib.sha256(thumbnail).hexdigest()
+        name = f"{digest}.{extension}"
+        path = self._path(name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a temporary name, so readers never see half a file
+            partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(partial, "wb") as f:
+                f.write(thumbnail)
+            os.replace(partial, path)
+        with self._lock:
+            self._cnx.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                              (digest, name, len(thumbnail), now))
+            self._cnx.execute("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?)", (url, width, digest, now))
+            total = self._cnx.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+        if total > self.max_bytes:
+            self._prune(total)
+
+    def _prune(self, total):
+        """Delete least recently used files until the total is under PRUNE_TO of the cap."""
+        target = self.max_bytes * PRUNE_TO
+        with self._lock:
+            victims = []
+            for digest, name, size in self._cnx.execute("SELECT digest, name, size FROM files ORDER BY used_at"):
+                if total <= target:
+                    break
+                victims.append((digest, name))
+                total -= size
+            self._cnx.executemany("DELETE FROM files WHERE digest = ?", [(d,) for d, _ in victims])
+            self._cnx.executemany("DELETE FROM thumbnails WHERE digest = ?", [(d,) for d, _ in victims])
+            self._counts["evictions"] += len(victims)
+        for _, name in victims:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+
+    def _load(self, url, width):
+        """Thumbnail bytes for (url, width) from disk or the network; b"" if it can't be loaded."""
+        body = self._read(url, width)
+        if body is not None:
+            return body
+        self._count("fetches")
+        try:
+            resized = resize(self._fetch(url), width)
+        except Exception:
+            self._count("failures")
+            self._store(url, width, None)
+            return b""
+        self._store(url, width, resized)
+        return resized[0]
+
+    def _future(self, url, width):
+        """The in-flight load of (url, width), started if there is none; concurrent callers share it."""
+        key = (url, width)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pool.submit(self._load, url, width)
+                self._pending[key] = future
+                future.add_done_callback(lambda done: self._done(key, done))
+        return future
+
+    def _done(self, key, future):
+        # A failure (b"") is left to the index, so it is retried after FAILURE_RETRY_SECONDS
+        if future.exception() is None and future.result():
+            self._memory.put(key, future.result())
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _wanted(self, url):
+        if not _remote(url) or _placeholder(url):
+            self._count("skipped")
+            return False
+        return True
+
+    def prefetch(self, items):
+        """Start loading the thumbnails for (url, width) pairs in the background."""
+        for url, width in items:
+            if self._wanted(url) and self._memory.get((url, width)) is None:
+                self._future(url, width)
+
+    def get(self, url, width, fallback):
+        """Thumbnail bytes for `url` at `width` px, or `fallback` when there is none.
+
+        Local paths are returned as they are, for st.image to read.
+        """
+        if not _remote(url):
+            return url or fallback
+        if _placeholder(url):
+            self._count("skipped")
+            return fallback
+        key = (url, width)
+        body = self._memory.get(key)
+        if body is None:
+            try:
+                body = self._future(url, width).result()
+            except Exception:
+                # The cache itself failed (e.g. a full disk); show the default and try again next time
+                return fallback
+        return body or fallback
+
+    def stats(self):
+        memory = self._memory.stats()
+        with self._lock:
+            entries, size = self._cnx.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+            failed = self._cnx.execute("SELECT COUNT(*) FROM thumbnails WHERE digest IS NULL").fetchone()[0]
+            counts = dict(self._counts)
+        return dict(counts, hits=memory["hits"], misses=memory["misses"], entries=entries, bytes=size,
+                    max_bytes=self.max_bytes, failed_urls=failed)
+
+    def clear(self):
+        with self._lock:
+            names = [name for (name,) in self._cnx.execute("SELECT name FROM files")]
+            self._cnx.execute("DELETE FROM files")
+            self._cnx.execute("DELETE FROM thumbnails")
+        for name in names:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+        self._memory.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The process-wide ThumbnailCache, opened on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ThumbnailCache(THUMBNAIL_DIR, THUMBNAIL_DISK_BYTES)
+    return _cache
+
+
+def thumbnail(url, width, fallback):
+    return get_cache().get(url, width, fallback)
+
+
+def prefetch(items):
+    get_cache().prefetch(items)
+
+
+def stats():
+    return get_cache().stats()
+
+
+register_cache("thumbnails", "app", stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the thumbnail cache.")
+    parser.add_argument("--stats", action="store_true", help="print entry counts and sizes")
+    parser.add_argument("--clear", action="store_true", help="delete every cached thumbnail")
+    args = parser.parse_args()
+
+    if args.clear:
+        get_cache().clear()
+        print(f"Cleared {THUMBNAIL_DIR}")
+    if args.stats or not args.clear:
+        for name, value in sorted(stats().items()):
+            print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Per-faculty top publications, kept in a small side collection.
+
+Faculty profiles used to load their top publications by sending the whole
+`publications` id list as an $in and sorting the matches by citations on
+the server, which for prolific faculty meant thousands of ids and an
+in-memory sort on every profile view. `faculty_top_publications` holds, for
+each faculty member, their TOP_PUBLICATIONS_KEPT most cited publications
+already sorted, with only the fields a profile shows, so a profile page is
+a single indexed read with a $slice.
+
+The collection is built in bulk once and then kept current by
+update_citations() as citation counts change. Pages past what is kept fall
+back to the $in query.
+
+    python top_publications.py   # (re)build the whole collection
+"""
+import heapq
+
+from pymongo import ReplaceOne, UpdateMany, UpdateOne
+
+from backends import LazyCollection
+from metrics import instrumented
+from mongodb_utils import faculty_col, pub_col
+from query_cache import invalidate
+from snapshot import served
+
+top_pub_col = LazyCollection("faculty_top_publications")
+
+TOP_PUBLICATIONS_KEPT = 50
+BULK_BATCH_SIZE = 1000
+
+PUBLICATION_FIELDS = ("id", "title", "venue", "year", "numCitations")
+# Most cited first; ties broken by id so the order is stable across rebuilds
+SORT_ORDER = {"numCitations": -1, "id": 1}
+
+
+def _entry(pub):
+    entry = {field: pub.get(field) for field in PUBLICATION_FIELDS}
+    entry["numCitations"] = entry["numCitations"] or 0
+    return entry
+
+
+def _top(entries):
+    return heapq.nsmallest(TOP_PUBLICATIONS_KEPT, entries,
+                           key=lambda e: (-e["numCitations"], e["id"]))
+
+
+def _index_doc(faculty_id, pub_ids, entries):
+    return {"faculty_id": faculty_id, "total": len(pub_ids), "publications": _top(entries)}
+
+
+def ensure_indexes():
+    top_pub_col.create_index("faculty_id", unique=True)
+    # update_citations() finds a publication's authors through this
+    faculty_col.create_index("publications")
+
+
+@instrumented("mongodb")
+def rebuild_all():
+    """Rebuild every faculty member's entry from one pass over publications.
+
+    Returns the number of faculty indexed.
+    """
+    ensure_indexes()
+    projection = {field: 1 for field in PUBLICATION_FIELDS}
+    projection["_id"] = 0
+    pubs = {pub["id"]: _entry(pub) for pub in pub_col.find({}, projection)}
+
+    count = 0
+    ops = []
+    for faculty in faculty_col.find({}, {"_id": 0, "id": 1, "publications": 1}):
+        pub_ids = faculty.get("publications") or []
+        entries = [pubs[pid] for pid in pub_ids if pid in pubs]
+        ops.append(ReplaceOne({"faculty_id": faculty["id"]},
+                              _index_doc(faculty["id"], pub_ids, entries), upsert=True))
+        count += 1
+        if len(ops) >= BULK_BATCH_SIZE:
+            top_pub_col.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        top_pub_col.bulk_write(ops, ordered=False)
+    return count
+
+
+@instrumented("mongodb")
+def rebuild_faculty(faculty_ids):
+    """Recompute the entries of a few faculty members from their publications."""
+    ops = []
+    for faculty in faculty_col.find({"id": {"$in": list(faculty_ids)}}, {"_id": 0, "id": 1, "publications": 1}):
+        pub_ids = faculty.get("publications") or []
+        entries = [_entry(pub) for pub in pub_col.find({"id": {"$in": pub_ids}}, {"_id": 0})]
+        ops.append(ReplaceOne({"faculty_id": faculty["id"]},
+                              _index_doc(faculty["id"], pub_ids, entries), upsert=True))
+    if ops:
+        top_pub_col.bulk_write(ops, ordered=False)
+
+
+@instrumented("mongodb")
+def update_citations(citations):
+    """Set new citation counts ({publication id: numCitations}) and patch the index.
+
+    A publication whose count went up only needs to be moved within (or
+    into) each author's kept list. One that went down can fall out of the
+    list in favour of a publication that isn't stored, so authors whose
+    list is truncated are recomputed instead.
+    """
+    if not citations:
+        return
+    pub_ids = list(citations)
+    previous = {
+        pub["id"]: pub
+        for pub in pub_col.find({"id": {"$in": pub_ids}}, {"_id": 0})
+    }
+    if not previous:
+        return
+    pub_col.bulk_write([
+        UpdateOne({"id": pid}, {"$set": {"numCitations": count}})
+        for pid, count in citations.items() if pid in previous
+    ], ordered=False)
+    invalidate("publications")
+
+    ops = []
+    rebuild = set()
+    for pid, count in citations.items():
+        pub = previous.get(pid)
+        if pub is None:
+            continue
+        authors = [f["id"] for f in faculty_col.find({"publications": pid}, {"_id": 0, "id": 1})]
+        if not authors:
+            continue
+        if count < (pub.get("numCitations") or 0):
+            truncated = top_pub_col.find(
+                {"faculty_id": {"$in": authors}, "publications.id": pid,
+                 "total": {"$gt": TOP_PUBLICATIONS_KEPT}},
+                {"_id": 0, "faculty_id": 1},
+            )
+            for doc in truncated:
+                rebuild.add(doc["faculty_id"])
+        entry = _entry({**pub, "numCitations": count})
+        # $pull and $push can't touch the same array in one update, hence two
+        ops.append(UpdateMany({"faculty_id": {"$in": authors}},
+                              {"$pull": {"publications": {"id": pid}}}))
+        ops.append(UpdateMany({"faculty_id": {"$in": authors}},
+                              {"$push": {"publications": {
+                                  "$each": [entry], "$sort": SORT_ORDER, "$slice": TOP_PUBLICATIONS_KEPT,
+                              }}}))
+    if ops:
+        top_pub_col.bulk_write(ops, ordered=True)
+    if rebuild:
+        rebuild_faculty(rebuild)
+
+
+@served
+@instrumented("mongodb", size=lambda page: len(page[0]))
+def get_top_publications(faculty_id, offset=0, limit=5):
+    """(publications on this page, total publications) for one faculty member.
+
+    Reads the kept list with a $slice; only pages past it, or faculty not yet
+    indexed, go back to the publications collection.
+    """
+    doc = top_pub_col.find_one(
+        {"faculty_id": faculty_id},
+        {"_id": 0, "total": 1, "publications": {"$slice": [offset, limit]}},
+    )
+    if doc is not None and (offset + limit <= TOP_PUBLICATIONS_KEPT or doc["total"] <= TOP_PUBLICATIONS_KEPT):
+        return doc["publications"], doc["total"]
+
+    faculty = faculty_col.find_one({"id": faculty_id}, {"_id": 0, "publications": 1}) or {}
+    pub_ids = faculty.get("publications") or []
+    pubs = (
+        pub_col.find({"id": {"$in": pub_ids}}, {"_id": 0})
+        .sort([("numCitations", -1), ("id", 1)])
+        .skip(offset)
+        .limit(limit)
+    )
+    return [_entry(pub) for pub in pubs], len(pub_ids)
+
+
+def main():
+    count = rebuild_all()
+    print(f"Indexed top publications for {count} faculty members")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import numpy as np
+
+from mongodb_utils import get_keyword_year_counts
+
+
+class TrendCube:
+    """Dense keyword x year publication count matrix.
+
+    Row i holds the yearly counts for `keywords[i]`, column j is year
+    `first_year + j`. Every trend is a row slice and growth rankings are
+    computed over the whole matrix at once, so neither needs a database call.
+    """
+
+    def __init__(self, keywords, first_year, counts):
+        self.keywords = list(keywords)
+        self.first_year = first_year
+        self.counts = counts
+        self._index = {name: i for i, name in enumerate(self.keywords)}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (keyword, year, count) rows such as get_keyword_year_counts() returns."""
+        rows = list(rows)
+        if not rows:
+            return cls([], datetime.utcnow().year, np.zeros((0, 0), dtype=np.int32))
+
+        names = sorted({keyword for keyword, _, _ in rows})
+        index = {name: i for i, name in enumerate(names)}
+        row_idx = np.fromiter((index[k] for k, _, _ in rows), dtype=np.int64, count=len(rows))
+        years = np.fromiter((y for _, y, _ in rows), dtype=np.int64, count=len(rows))
+        values = np.fromiter((c for _, _, c in rows), dtype=np.int32, count=len(rows))
+
+        first_year = int(years.min())
+        counts = np.zeros((len(names), int(years.max()) - first_year + 1), dtype=np.int32)
+        np.add.at(counts, (row_idx, years - first_year), values)
+        return cls(names, first_year, counts)
+
+    @property
+    def last_year(self):
+        return self.first_year + self.counts.shape[1] - 1
+
+    def __contains__(self, keyword):
+        return keyword in self._index
+
+    def _window(self, start_year, end_year):
+        """Column slice for [start_year, end_year) plus zero padding outside the cube."""
+        lo = start_year - self.first_year
+        hi = end_year - self.first_year
+        width = self.counts.shape[1]
+        start = min(max(lo, 0), width)
+        stop = max(min(max(hi, 0), width), start)
+        pad_left = max(0, min(hi, 0) - lo)
+        pad_right = (hi - lo) - pad_left - (stop - start)
+        return slice(start, stop), pad_left, pad_right
+
+    def trend(self, keyword, start_year, end_year=None):
+        """Same shape as mongodb_utils.get_publication_counts_by_keyword: (counts, years)."""
+        if end_year is None:
+            end_year = datetime.utcnow().year
+        years = list(range(start_year, end_year))
+        i = self._index.get(keyword)
+        if i is None or not years:
+            return [0] * len(years), years
+
+        cols, pad_left, pad_right = self._window(start_year, end_year)
+        row = np.pad(self.counts[i, cols], (pad_left, pad_right))
+        return row.tolist(), years
+
+    def overlay(self, keywords, start_year, end_year=None):
+        """Trends for several keywords over the same years: ({keyword: counts}, years)."""
+        series = {}
+        years = []
+        for keyword in keywords:
+            series[keyword], years = self.trend(keyword, start_year, end_year)
+        return series, years
+
+    def fastest_rising(self, top_n=10, window=5, end_year=None, min_recent=5):
+        """Keywords whose publication count grew most between the last two windows.
+
+        Compares the `window` years before `end_year` with the `window` years
+        before that. Growth is (recent + 1) / (previous + 1) - 1 so that
+        keywords appearing from nothing don't divide by zero, and keywords
+        with fewer than `min_recent` recent publications are skipped as noise.
+        Returns [(keyword, growth, previous, recent), ...].
+        """
+        if end_year is None:
+            end_year = datetime.utcnow().year
+        if not self.keywords:
+            return []
+
+        cols, pad_left, pad_right = self._window(end_year - 2 * window, end_year)
+        block = np.pad(self.counts[:, cols], ((0, 0), (pad_left, pad_right)))
+        previous = block[:, :window].sum(axis=1)
+        recent = block[:, window:].sum(axis=1)
+        growth = (recent + 1) / (previous + 1) - 1.0
+        growth[recent < min_recent] = -np.inf
+
+        top_n = min(top_n, len(self.keywords))
+        top = np.argpartition(-growth, top_n - 1)[:top_n]
+        top = top[np.argsort(-growth[top], kind="stable")]
+        return [
+            (self.keywords[i], float(growth[i]), int(previous[i]), int(recent[i]))
+            for i in top
+            if np.isfinite(growth[i])
+        ]
+
+    def save(self, path):
+        np.savez_compressed(path, keywords=np.array(self.keywords, dtype=object),
+                            first_year=self.first_year, counts=self.counts)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=True)
+        return cls(data["keywords"].tolist(), int(data["first_year"]), data["counts"])
+
+
+def build_trend_cube():
+    """Scan the publications collection once and return its TrendCube."""
+    return TrendCube.from_rows(get_keyword_year_counts())